@@ -1,14 +1,15 @@
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, g, jsonify, request, send_from_directory
 from flask_cors import CORS, cross_origin
 import threading
 import os
-import requests
 import logging
 import shutil
 import json
-from core import arxiv_fetcher, analyzer, email_sender
-from core.history_manager import save_processed_papers, PROCESSED_PAPERS_FILE
-from core.analysis_manager import process_paper_for_email, RESULTS_DIR, get_full_text_analysis
+import math
+from core import (accounting, analyzer, exporter, facets, job_store, llm_router, prefetcher, profiler, revisions, scheduler,
+                  settings, state_store, storage, task_queue, tasks, triage)
+from core.history_manager import clear_processed_papers
+from core.analysis_manager import RESULTS_DIR, forget_paper_checkpoints, select_stored_papers
 import re
 
 app = Flask(__name__)
@@ -16,34 +17,86 @@ CORS(app, resources={r"/api/*": {"origins": "http://localhost:3000"}})
 
 logging.basicConfig(level=logging.INFO)
 
-# --- Global Status and Cache Objects ---
-task_status = {"status": "idle", "message": "The service is idle."}
-results_cache = []
+# --- Pipeline Workers ---
+# "inline" runs queue consumers as threads in this process; "external" leaves the queue
+# to separate `python worker.py` processes so the web tier can scale independently.
+PIPELINE_MODE = settings.get().pipeline_mode
+
+def start_inline_workers():
+    for _ in range(settings.get().pipeline_inline_workers):
+        thread = threading.Thread(target=task_queue.run_worker, args=(tasks.HANDLERS,))
+        thread.daemon = True
+        thread.start()
+    thread = threading.Thread(target=tasks.schedule_compaction)
+    thread.daemon = True
+    thread.start()
 
-# --- Helper: Analysis Task Runner ---
-def run_analysis_for_paper(paper):
-    dummy_task_status = {'message': ''} 
-    get_full_text_analysis(paper, dummy_task_status, app.logger)
-    save_processed_papers([paper])
-    app.logger.info(f"Background analysis finished for {paper.get('entry_id')}")
+if PIPELINE_MODE == 'inline':
+    start_inline_workers()
+
+# --- Profiling ---
+# With PROFILING_ENABLED set, a request carrying "X-Profile: 1" or "?profile=1" is
+# profiled, and the flag is passed on to the pipeline jobs it enqueues. Without it
+# no hooks are installed at all.
+
+def profile_requested(data=None):
+    if not profiler.enabled():
+        return False
+    flag = request.headers.get('X-Profile') or request.args.get('profile') or (data or {}).get('profile')
+    return profiler.requested(flag)
+
+if profiler.enabled():
+    @app.before_request
+    def start_request_profile():
+        if profile_requested():
+            g.profile_capture = profiler.Capture(f"{request.method} {request.path}", kind='request').start()
+
+    @app.after_request
+    def finish_request_profile(response):
+        capture = g.pop('profile_capture', None)
+        if capture is not None:
+            capture.stop()
+            response.headers['X-Profile-Name'] = capture.name
+        return response
+
+# --- Request Parameters ---
+# Numeric query arguments and JSON fields are validated up front, so a malformed value
+# is answered with a 400 instead of an exception (500) or a silently used default.
+
+class InvalidParameter(ValueError):
+    pass
+
+@app.errorhandler(InvalidParameter)
+def invalid_parameter(e):
+    return jsonify({"error": str(e)}), 400
+
+def number_param(source, name, default, kind=int, minimum=None):
+    """`name` from request.args or a JSON body as `kind`, or `default` if it is absent."""
+    value = source.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        number = kind(value)
+    except (TypeError, ValueError):
+        raise InvalidParameter(f"'{name}' must be a number, got {value!r}.")
+    if not math.isfinite(number):
+        raise InvalidParameter(f"'{name}' must be a finite number, got {value!r}.")
+    if minimum is not None and number < minimum:
+        raise InvalidParameter(f"'{name}' must be at least {minimum}, got {value!r}.")
+    return number
 
 # --- API Endpoints ---
 
 @app.route('/api/run-fetch', methods=['POST'])
 def run_fetch():
-    global task_status, results_cache
-    if task_status['status'] == 'running':
+    data = request.json if request.json else {}
+    if state_store.try_start_task('Fetching papers...') is None:
         return jsonify({"message": "A task is already in progress."}), 409
 
-    results_cache = []
-    data = request.json if request.json else {}
-    
-    task_status['status'] = 'running'
-    task_status['message'] = 'Fetching papers...'
-    
-    thread = threading.Thread(target=fetch_task_wrapper, kwargs=data)
-    thread.daemon = True
-    thread.start()
+    # Speculative work for the previous results is no longer useful.
+    prefetcher.cancel()
+    state_store.clear_results()
+    task_queue.enqueue('fetch', dict(data, profile=profile_requested(data)))
     
     return jsonify({"message": "Fetch process started successfully."}), 202
 
@@ -55,33 +108,54 @@ def analyze_paper():
     if not paper:
         return jsonify({"error": "Paper data is required."}), 400
     
-    thread = threading.Thread(target=run_analysis_for_paper, args=(paper,))
-    thread.daemon = True
-    thread.start()
+    item_id = task_queue.enqueue('single_analysis', {'paper': paper, 'profile': profile_requested(request.json)},
+                                 label=paper['entry_id'].split('/')[-1])
     
     app.logger.info(f"Started background analysis for {paper.get('entry_id')}")
-    return jsonify({"message": "Analysis has been started."}), 202
+    return jsonify({"message": "Analysis has been started.", "job_id": item_id}), 202
 
 @app.route('/api/analysis-status/<path:paper_id>', methods=['GET'])
 def get_analysis_status(paper_id):
     file_path = os.path.join(RESULTS_DIR, paper_id, 'analysis.md')
     metadata_path = os.path.join(RESULTS_DIR, paper_id, 'metadata.json') # <-- 添加这一行
-    if os.path.exists(file_path):
+    if storage.exists(file_path):
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            content = storage.read_text(file_path)
+            storage.touch(paper_id)
             
             extracted_image_filenames = []
-            if os.path.exists(metadata_path):
-                with open(metadata_path, 'r', encoding='utf-8') as f_meta:
-                    metadata = json.load(f_meta)
-                    extracted_image_filenames = metadata.get('extracted_image_filenames', [])
+            if storage.exists(metadata_path):
+                metadata = storage.read_json(metadata_path)
+                extracted_image_filenames = metadata.get('extracted_image_filenames', [])
 
             return jsonify({"status": "success", "content": content, "extracted_image_filenames": extracted_image_filenames})
         except Exception as e:
             return jsonify({"status": "error", "message": str(e)}), 500
     else:
-        return jsonify({"status": "running"})
+        return jsonify({"status": "running", "queue": analysis_queue_info(paper_id)})
+
+def analysis_queue_info(paper_id):
+    """Where a running single-paper analysis waits: in the job queue, or for parser/LLM capacity."""
+    item_id = task_queue.find_queued('single_analysis', paper_id)
+    position = task_queue.queue_position(item_id) if item_id is not None else None
+    if position is not None:
+        return dict(position, stage='queued')
+    waiting = scheduler.locate(paper_id)
+    if waiting is not None:
+        return dict(waiting, stage='waiting_for_capacity')
+    return None
+
+@app.route('/api/versions/<path:paper_id>', methods=['GET'])
+def get_versions(paper_id):
+    """Stored versions of a paper, oldest first, with how each revision was analyzed."""
+    versions = []
+    for short_id, version in revisions.stored_versions(paper_id, RESULTS_DIR):
+        metadata_path = os.path.join(RESULTS_DIR, short_id, 'metadata.json')
+        metadata = storage.read_json(metadata_path) if storage.exists(metadata_path) else {}
+        versions.append({"short_id": short_id, "version": version, "revision": metadata.get('revision')})
+    if not versions:
+        return jsonify({"message": "No stored versions found."}), 404
+    return jsonify({"base_id": revisions.split_version(paper_id)[0], "versions": versions})
 
 @app.route('/api/images/<path:paper_id>/<path:filename>')
 def serve_image(paper_id, filename):
@@ -98,60 +172,26 @@ def email_result():
         return jsonify({"error": "Paper data and recipient email are required."}), 400
     entry_id_short = paper['entry_id'].split('/')[-1]
     file_path = os.path.join(RESULTS_DIR, entry_id_short, 'analysis.md')
-    if not os.path.exists(file_path):
+    if not storage.exists(file_path):
         return jsonify({"error": "Analysis result not found."}), 404
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        sanitized_title = re.sub(r'[\\/*?:"<>|]',"", paper['title'])
-        email_filename = f"{sanitized_title}.md"
-        file_to_send = {'filename': email_filename, 'content': content}
-        subject = paper.get('title', 'Single Paper Analysis')
-        email_sent = email_sender.send_email([file_to_send], 1, recipient_email, subject)
-        if email_sent:
-            return jsonify({"message": "Email sent successfully."})
-        else:
-            return jsonify({"error": "Failed to send email."}), 500
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    # Zipping and SMTP run on a pipeline worker, not in the web process.
+    item_id = task_queue.enqueue('email_result', {'paper': paper, 'email': recipient_email,
+                                                  'profile': profile_requested(data)})
+    return jsonify({"message": "Email has been queued.", "job_id": item_id}), 202
+
+@app.route('/api/jobs/<int:item_id>', methods=['GET'])
+def get_job_status(item_id):
+    item = task_queue.get_item(item_id)
+    if item is None:
+        return jsonify({"error": "Job not found."}), 404
+    job = {key: item[key] for key in ('id', 'kind', 'priority', 'status', 'error', 'enqueued', 'claimed', 'finished')}
+    job['queue'] = task_queue.queue_position(item_id)
+    return jsonify(job)
 
 # --- Bulk Analysis Workflow ---
 
-def analysis_task_wrapper(selected_papers, recipient_email=None):
-    global task_status
-    try:
-        files_to_zip = []
-        total_papers = len(selected_papers)
-        
-        for i, paper in enumerate(selected_papers):
-            task_status['message'] = f"Processing paper {i+1}/{total_papers}: {paper['title'][:40]}..."
-            files_to_zip.append(process_paper_for_email(paper, task_status, app.logger))
-
-        task_status['message'] = "Zipping and sending email..."
-        subject = f"Bulk Analysis Results for {total_papers} Papers"
-        email_sent = email_sender.send_email(files_to_zip, total_papers, recipient_email, subject)
-
-        if email_sent:
-            save_processed_papers(selected_papers)
-            task_status['status'] = 'success'
-            task_status['message'] = f"Process complete. Emailed {total_papers} analyzed papers."
-        else:
-            task_status['status'] = 'error'
-            task_status['message'] = "Email sending failed during bulk analysis stage."
-
-    except Exception as e:
-        task_status['status'] = 'error'
-        task_status['message'] = str(e)
-        app.logger.error("Exception in analysis_task_wrapper:", exc_info=e)
-    finally:
-        app.logger.info(f"Bulk analysis task finished with status: {task_status['status']}")
-
 @app.route('/api/analyze-and-email', methods=['POST'])
 def analyze_and_email():
-    global task_status
-    if task_status.get('status') == 'running':
-        return jsonify({"message": "A bulk analysis task is already in progress."}), 409
-
     data = request.json
     selected_papers = data.get('papers', [])
     recipient_email = data.get('email', None)
@@ -159,60 +199,100 @@ def analyze_and_email():
     if not selected_papers:
         return jsonify({"message": "No papers selected for analysis."}), 400
 
-    task_status = {'status': 'running', 'message': 'Bulk analysis task started...'}
-    thread = threading.Thread(target=analysis_task_wrapper, args=(selected_papers, recipient_email))
-    thread.daemon = True
-    thread.start()
+    # Cascade mode: the abstracts are triaged by a small model first, and only the papers
+    # passing it go through download, parsing and full-text analysis.
+    cascade = None
+    if data.get('cascade', triage.enabled()):
+        cascade = {"interests": (data.get('interests') or triage.default_interests()).strip(),
+                   "threshold": number_param(data, 'threshold', triage.default_threshold(), kind=float),
+                   "top_k": number_param(data, 'top_k', triage.default_top_k(), minimum=0)}
+        if not cascade['interests']:
+            return jsonify({"message": "Cascade mode needs the research interests to triage against."}), 400
+
+    # Predicted footprint, checked against the daily LLM budgets before anything starts.
+    estimate, admission = tasks.estimate_bulk_analysis(selected_papers, cascade)
+    if data.get('dry_run'):
+        return jsonify({"estimate": estimate, "admission": admission, "cascade": cascade})
+    if admission['decision'] == accounting.REJECTED:
+        return jsonify({"message": admission['reason'], "estimate": estimate, "admission": admission}), 429
+
+    if state_store.try_start_task('Bulk analysis task started...') is None:
+        return jsonify({"message": "A bulk analysis task is already in progress."}), 409
+
+    job_id = job_store.make_job_id('bulk_analysis', selected_papers, recipient_email or '')
+    task_queue.enqueue('bulk_analysis', {'papers': selected_papers, 'email': recipient_email, 'job_id': job_id,
+                                         'cascade': cascade, 'profile': profile_requested(data)})
     
-    return jsonify({"message": "Bulk analysis process started successfully."}), 202
+    return jsonify({"message": "Bulk analysis process started successfully.", "job_id": job_id,
+                    "cascade": cascade, "estimate": estimate, "admission": admission}), 202
+
+@app.route('/api/triage', methods=['GET'])
+def get_triage():
+    """Triage scores and reasons of a cascade bulk analysis (?job_id=..., the latest by default)."""
+    results = triage.get_results(request.args.get('job_id'))
+    if results is None:
+        return jsonify({"message": "No triage results found."}), 404
+    return jsonify(results)
+
+# --- Re-analysis Workflow ---
+
+@app.route('/api/reanalyze', methods=['POST'])
+def reanalyze():
+    """
+    Re-runs the LLM stage for stored papers matching the filters in the body
+    (short_ids, published_from, published_to, categories, prompt_version).
+    With "dry_run": true only the matching papers are returned.
+    """
+    data = request.json or {}
+    filters = {key: data[key] for key in ('short_ids', 'published_from', 'published_to', 'categories', 'prompt_version')
+               if data.get(key)}
+    selected = select_stored_papers(filters)
+    if data.get('dry_run'):
+        return jsonify({"count": len(selected), "short_ids": [short_id for short_id, _ in selected]})
+    if not selected:
+        return jsonify({"message": "No stored papers match the filters."}), 400
+
+    if state_store.try_start_task('Re-analysis task started...') is None:
+        return jsonify({"message": "A task is already in progress."}), 409
 
-# --- Other Endpoints ---
+    job_id = job_store.make_job_id('reanalysis', [metadata for _, metadata in selected], json.dumps(filters))
+    task_queue.enqueue('reanalysis', {'filters': filters, 'job_id': job_id, 'profile': profile_requested(data)})
+    return jsonify({"message": f"Re-analysis of {len(selected)} papers started.", "job_id": job_id}), 202
 
-def fetch_task_wrapper(date_range=None, categories=None, keywords=None):
-    global task_status, results_cache
-    try:
-        papers_by_category = arxiv_fetcher.fetch_papers(date_range, categories, keywords)
-        all_papers = [p for papers in papers_by_category.values() for p in papers]
-        unique_papers = list({p['entry_id']: p for p in all_papers}.values())
-        total_unique_papers = len(unique_papers)
-        app.logger.info(f"Found {total_unique_papers} papers.")
-
-        if total_unique_papers > 0:
-            results_cache = unique_papers
-            task_status['status'] = 'review_ready'
-            task_status['message'] = f"Found {total_unique_papers} papers. Ready for review."
-        else:
-            task_status['status'] = 'success'
-            task_status['message'] = "Process finished. No new papers found."
-    except Exception as e:
-        task_status['status'] = 'error'
-        task_status['message'] = str(e)
-        app.logger.error("Exception in fetch_task_wrapper:", exc_info=e)
-    finally:
-        app.logger.info(f"Fetch task finished with status: {task_status['status']}")
+@app.route('/api/reanalyze/progress', methods=['GET'])
+def get_reanalysis_progress():
+    return jsonify(state_store.get_value('reanalysis_progress', {}))
+
+# --- Other Endpoints ---
 
 @app.route('/api/status', methods=['GET'])
 def get_status():
-    global task_status
-    return jsonify(task_status)
+    return jsonify(state_store.get_task_status())
+
+@app.route('/api/usage', methods=['GET'])
+def get_usage():
+    """Today's token usage and cost, the daily budgets and per-stage history statistics."""
+    return jsonify(accounting.usage_report())
+
+@app.route('/api/scheduler', methods=['GET'])
+def get_scheduler_status():
+    """Queued jobs per priority class, and the capacity gates of this process (inline workers)."""
+    return jsonify({"queue": task_queue.class_counts(), "gates": scheduler.gates_status(),
+                    "weights": scheduler.weights()})
+
+@app.route('/api/prefetch/status', methods=['GET'])
+def get_prefetch_status():
+    return jsonify(prefetcher.get_status())
 
 @app.route('/api/results', methods=['GET'])
 def get_results():
-    global results_cache
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 50, type=int)
-    if not results_cache:
+    page = number_param(request.args, 'page', 1)
+    per_page = number_param(request.args, 'per_page', 50, minimum=1)
+    # Pages are served pre-serialized from the state store's page cache.
+    payload = state_store.get_results_page_payload(page, per_page)
+    if payload is None:
         return jsonify({"message": "No results available."}), 404
-    start = (page - 1) * per_page
-    end = start + per_page
-    paginated_results = results_cache[start:end]
-    response = {
-        "papers": paginated_results,
-        "total_papers": len(results_cache),
-        "page": page,
-        "per_page": per_page
-    }
-    return jsonify(response)
+    return app.response_class(payload, mimetype='application/json')
 
 # --- History/Warehouse Endpoints ---
 
@@ -226,8 +306,7 @@ def get_all_analyses():
         metadata_path = os.path.join(RESULTS_DIR, paper_id_dir, 'metadata.json')
         if os.path.exists(metadata_path):
             try:
-                with open(metadata_path, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
+                metadata = storage.read_json(metadata_path)
                 metadata['short_id'] = paper_id_dir
                 if not query or (query in metadata.get('title', '').lower()) or (query in metadata.get('entry_id', '').lower()):
                     all_metadata.append(metadata)
@@ -249,8 +328,7 @@ def get_recent_analyses():
         if os.path.exists(metadata_path):
             try:
                 mod_time = os.path.getmtime(dir_path)
-                with open(metadata_path, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
+                metadata = storage.read_json(metadata_path)
                 metadata['short_id'] = paper_id_dir
                 metadata['mod_time'] = mod_time
                 all_metadata.append(metadata)
@@ -259,6 +337,25 @@ def get_recent_analyses():
     all_metadata.sort(key=lambda x: x.get('mod_time', 0), reverse=True)
     return jsonify(all_metadata[:10])
 
+@app.route('/api/facets', methods=['GET'])
+def get_facets():
+    """
+    Facet counts (category, month, author, status, prompt_version) and the matching papers.
+    Each facet can be filtered with a comma-separated list of values, e.g.
+    ?category=cs.LG,cs.AI&month=2025-06; `query` searches titles and entry ids.
+    """
+    filters = {}
+    for facet in facets.FACETS:
+        values = [value.strip() for value in request.args.get(facet, '').split(',') if value.strip()]
+        if values:
+            filters[facet] = values
+    if request.args.get('query'):
+        filters['query'] = request.args['query']
+    return jsonify(facets.search(RESULTS_DIR, filters,
+                                 limit=number_param(request.args, 'limit', 20, minimum=1),
+                                 page=number_param(request.args, 'page', 1),
+                                 per_page=number_param(request.args, 'per_page', 50, minimum=1)))
+
 @app.route('/api/clear-cache', methods=['POST'])
 def clear_cache():
     app.logger.info("Received request to clear cache.")
@@ -274,9 +371,10 @@ def clear_cache():
                 except Exception as e:
                     app.logger.error(f'Failed to delete {file_path}. Reason: {e}')
         
-        processed_json = PROCESSED_PAPERS_FILE
-        if os.path.exists(processed_json):
-            os.remove(processed_json)
+        clear_processed_papers()
+        facets.clear()
+        job_store.clear_stages()
+        storage.forget()
 
         app.logger.info("Cache cleared successfully.")
         return jsonify({"message": "Cache cleared successfully."}), 200
@@ -284,6 +382,113 @@ def clear_cache():
         app.logger.error(f"Failed to clear cache. Reason: {e}")
         return jsonify({"message": "An error occurred while clearing the cache."}), 500
 
+# --- Export Endpoints ---
+
+@app.route('/api/export', methods=['GET'])
+def export_analyses():
+    """
+    Streams a zip or tar of stored analyses. Query parameters: format (zip, tar, tar.gz),
+    images (1 to include extracted images), published_from, published_to, query,
+    and comma-separated categories / short_ids.
+    """
+    fmt = request.args.get('format', 'zip')
+    if fmt not in exporter.FORMATS:
+        return jsonify({"error": f"Unsupported format. Use one of: {', '.join(exporter.FORMATS)}."}), 400
+    filters = {key: request.args[key] for key in ('published_from', 'published_to', 'query', 'prompt_version')
+               if request.args.get(key)}
+    for key in ('categories', 'short_ids'):
+        values = [value.strip() for value in request.args.get(key, '').split(',') if value.strip()]
+        if values:
+            filters[key] = values
+    include_images = request.args.get('images', '').lower() in ('1', 'true', 'yes')
+
+    response = app.response_class(exporter.stream_export(filters, fmt, include_images),
+                                  mimetype=exporter.FORMATS[fmt][0])
+    response.headers['Content-Disposition'] = f'attachment; filename="{exporter.archive_filename(fmt)}"'
+    return response
+
+# --- Storage Endpoints ---
+
+@app.route('/api/storage/report', methods=['GET'])
+def get_storage_report():
+    return jsonify({
+        "last_compaction": state_store.get_value('storage_last_compaction'),
+        "totals": state_store.get_value('storage_totals', {"files_compressed": 0, "bytes_saved": 0}),
+        "compaction_pending": task_queue.has_pending('compact_storage'),
+    })
+
+@app.route('/api/storage/compact', methods=['POST'])
+def compact_storage():
+    data = request.json if request.is_json and request.json else {}
+    cold_after_days = number_param(data, 'cold_after_days', None, kind=float, minimum=0)
+    item_id = task_queue.enqueue('compact_storage', {'cold_after_days': cold_after_days})
+    return jsonify({"message": "Storage compaction has been queued.", "job_id": item_id}), 202
+
+@app.route('/api/storage/usage', methods=['GET'])
+def get_storage_usage():
+    return jsonify(storage.usage(RESULTS_DIR))
+
+@app.route('/api/storage/evict', methods=['POST'])
+def evict_storage():
+    """
+    Selective eviction. Either evicts the given artifacts of the given papers
+    ({"short_ids": [...], "artifacts": ["images", "raw_content"]}), or evicts by
+    access time and size down to a target ({"target_mb": 500}).
+    """
+    data = request.json if request.is_json and request.json else {}
+    short_ids = data.get('short_ids')
+    if short_ids:
+        artifacts = data.get('artifacts') or list(storage.DERIVED_ARTIFACTS)
+        unknown = [a for a in artifacts if a not in storage.ARTIFACTS]
+        if unknown:
+            return jsonify({"error": f"Unknown artifacts: {', '.join(unknown)}"}), 400
+        if not isinstance(short_ids, list):
+            return jsonify({"error": "short_ids must be a list."}), 400
+        invalid = [short_id for short_id in short_ids if not storage.is_stored_paper(RESULTS_DIR, short_id)]
+        if invalid:
+            return jsonify({"error": f"Unknown paper ids: {', '.join(map(str, invalid))}"}), 400
+        report = {"evicted": [], "skipped_pinned": []}
+        for short_id in short_ids:
+            if storage.is_pinned(short_id):
+                report["skipped_pinned"].append(short_id)
+                continue
+            for artifact in artifacts:
+                freed = storage.evict_artifact(RESULTS_DIR, short_id, artifact, forget_paper_checkpoints)
+                report["evicted"].append({"short_id": short_id, "artifact": artifact, "bytes": freed})
+        return jsonify(report)
+
+    target_mb = number_param(data, 'target_mb', None, kind=float, minimum=0)
+    if target_mb is None:
+        return jsonify({"error": "Either short_ids or target_mb is required."}), 400
+    report = storage.evict(RESULTS_DIR, int(target_mb * 1024 * 1024), forget_paper_checkpoints)
+    return jsonify(report)
+
+@app.route('/api/storage/pin/<path:short_id>', methods=['POST', 'DELETE'])
+def pin_paper(short_id):
+    if not storage.is_stored_paper(RESULTS_DIR, short_id):
+        return jsonify({"error": f"Unknown paper id: {short_id}"}), 400
+    if request.method == 'POST':
+        storage.pin(short_id)
+        return jsonify({"message": f"{short_id} is pinned."})
+    storage.unpin(short_id)
+    return jsonify({"message": f"{short_id} is no longer pinned."})
+
+@app.route('/api/llm/health', methods=['GET'])
+def get_llm_health():
+    """Circuit breaker state of the LLM providers used so far by this process."""
+    return jsonify(llm_router.health())
+
+@app.route('/api/profiles', methods=['GET'])
+def get_profiles():
+    return jsonify(profiler.list_profiles())
+
+@app.route('/api/profiles/<filename>', methods=['GET'])
+def download_profile(filename):
+    """Downloads one capture file (.prof, .folded or .json)."""
+    if not profiler.PROFILE_FILE_RE.match(filename):
+        return jsonify({"error": "Invalid profile file name."}), 400
+    return send_from_directory(profiler.PROFILES_DIR, filename, as_attachment=True)
+
 @app.route('/api/translate', methods=['POST'])
 @cross_origin(origins="http://localhost:3000", methods=['POST'], headers=['Content-Type'])
 def translate_paper_content():
@@ -340,6 +545,5 @@ def translate_paper_content():
         return jsonify({"error": str(e)}), 500
 
 if __name__ == '__main__':
-    # Read port from environment variable, default to 5001 if not set
-    port = int(os.environ.get("BACKEND_PORT", 5001))
-    app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
+    # BACKEND_PORT from the environment or .env, 5001 if not set
+    app.run(host='0.0.0.0', port=settings.get().backend_port, debug=False)
\ No newline at end of file
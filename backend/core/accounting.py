@@ -0,0 +1,252 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import sqlite3
+from datetime import datetime, timedelta
+from core import aio, scheduler
+from core.db import get_connection
+from core.job_store import PIPELINE_DB_FILE
+
+# Token, time and cost accounting for the analysis pipeline.
+# Every LLM call records its prompt/completion tokens and every download/parse its
+# duration, per paper and stage. The history predicts the footprint of a proposed
+# bulk job, which is then admitted, throttled or rejected against daily budgets:
+#   * admitted: the estimate fits in what is left of today's budget;
+#   * throttled: it does not, but fits in a full day's budget, so it runs and pauses
+#     whenever the budget is exhausted until the next day;
+#   * rejected: it is larger than a full day's budget.
+
+STAGE_DOWNLOAD = 'download'
+STAGE_PARSE = 'parse'
+STAGE_ANALYSIS = 'analysis'
+STAGE_ABSTRACT_ANALYSIS = 'abstract_analysis'
+STAGE_TRANSLATION = 'translation'
+STAGE_TRIAGE = 'triage'
+STAGE_REVISION = 'revision_analysis'
+
+ADMITTED = 'admitted'
+THROTTLED = 'throttled'
+REJECTED = 'rejected'
+
+# Used until enough history has been recorded.
+DEFAULT_STAGE_STATS = {
+    STAGE_DOWNLOAD: {"seconds": 5.0, "prompt_tokens": 0, "completion_tokens": 0, "cost": None},
+    STAGE_PARSE: {"seconds": 60.0, "prompt_tokens": 0, "completion_tokens": 0, "cost": None},
+    STAGE_ANALYSIS: {"seconds": 120.0, "prompt_tokens": 20000, "completion_tokens": 3000, "cost": None},
+    # One request per batch of abstracts.
+    STAGE_TRIAGE: {"seconds": 15.0, "prompt_tokens": 4000, "completion_tokens": 600, "cost": None},
+}
+HISTORY_WINDOW = 200
+
+USAGE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    label TEXT,
+    stage TEXT NOT NULL,
+    model TEXT,
+    response_model TEXT,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    cost REAL NOT NULL DEFAULT 0,
+    seconds REAL NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_usage_created ON usage(created);
+CREATE INDEX IF NOT EXISTS idx_usage_stage ON usage(stage, id);
+"""
+
+logger = logging.getLogger(__name__)
+
+_columns_checked = False
+
+def _db():
+    global _columns_checked
+    conn = get_connection(PIPELINE_DB_FILE, USAGE_SCHEMA)
+    if not _columns_checked:
+        # Usage tables created before response_model existed lack the column.
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(usage)")}
+        if 'response_model' not in columns:
+            try:
+                conn.execute("ALTER TABLE usage ADD COLUMN response_model TEXT")
+            except sqlite3.OperationalError:
+                pass  # Added concurrently by another process.
+        _columns_checked = True
+    return conn
+
+# --- Prices and budgets ---
+
+def prices():
+    """
+    Per-model prices per 1K tokens from LLM_PRICES, a JSON object (or the path of a JSON
+    file) like {"qwen-plus": {"prompt": 0.0008, "completion": 0.002}}.
+    """
+    raw = os.getenv("LLM_PRICES", "").strip()
+    if not raw:
+        return {}
+    try:
+        if not raw.startswith('{'):
+            with open(raw, 'r', encoding='utf-8') as f:
+                raw = f.read()
+        return json.loads(raw)
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not read LLM_PRICES: {e}")
+        return {}
+
+def cost_of(model, prompt_tokens, completion_tokens, price_table=None):
+    price = (price_table if price_table is not None else prices()).get(model or '', {})
+    return (prompt_tokens * float(price.get('prompt', 0)) + completion_tokens * float(price.get('completion', 0))) / 1000.0
+
+def budgets():
+    """Daily budgets (None = unlimited): DAILY_TOKEN_BUDGET tokens and DAILY_COST_BUDGET in price units."""
+    tokens = int(os.getenv("DAILY_TOKEN_BUDGET", "0"))
+    cost = float(os.getenv("DAILY_COST_BUDGET", "0"))
+    return {"tokens": tokens or None, "cost": cost or None}
+
+def _start_of_day(now=None):
+    now = datetime.fromtimestamp(now or time.time())
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+# --- Recording ---
+
+def record(stage, seconds, model=None, prompt_tokens=0, completion_tokens=0, label=None, response_model=None):
+    """
+    Records one unit of pipeline work. `label` defaults to the current paper (see
+    scheduler.context). The cost is priced by `model`, a key of LLM_PRICES.
+    """
+    try:
+        _db().execute(
+            "INSERT INTO usage (label, stage, model, response_model, prompt_tokens, completion_tokens, cost, "
+            "seconds, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (label or scheduler.current_label(), stage, model, response_model, prompt_tokens, completion_tokens,
+             cost_of(model, prompt_tokens, completion_tokens), seconds, time.time())
+        )
+    except Exception as e:
+        logger.error(f"Could not record usage for stage {stage}: {e}")
+
+def record_completion(stage, completion, seconds, model=None):
+    """
+    Records the token usage reported with an OpenAI-compatible chat completion. `model`
+    is the configured model of the provider that served it (see llm_router), as the
+    id the API returns is often a dated variant that LLM_PRICES does not list; that
+    id is kept as response_model.
+    """
+    usage = getattr(completion, 'usage', None)
+    response_model = getattr(completion, 'model', None)
+    record(stage, seconds, model=model or response_model, response_model=response_model,
+           prompt_tokens=getattr(usage, 'prompt_tokens', None) or 0,
+           completion_tokens=getattr(usage, 'completion_tokens', None) or 0)
+
+# --- Statistics ---
+
+def used_today():
+    row = _db().execute(
+        "SELECT COALESCE(SUM(prompt_tokens), 0) AS prompt_tokens, COALESCE(SUM(completion_tokens), 0) AS completion_tokens, "
+        "COALESCE(SUM(cost), 0) AS cost FROM usage WHERE created >= ?",
+        (_start_of_day().timestamp(),)
+    ).fetchone()
+    return {"prompt_tokens": row['prompt_tokens'], "completion_tokens": row['completion_tokens'],
+            "tokens": row['prompt_tokens'] + row['completion_tokens'], "cost": round(row['cost'], 6)}
+
+def stage_stats(stage, window=HISTORY_WINDOW):
+    """Mean tokens and seconds of the last `window` records of a stage, with a p90 of the seconds."""
+    rows = _db().execute(
+        "SELECT prompt_tokens, completion_tokens, cost, seconds FROM usage WHERE stage = ? ORDER BY id DESC LIMIT ?",
+        (stage, window)
+    ).fetchall()
+    if not rows:
+        return dict(DEFAULT_STAGE_STATS.get(stage, {"seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0,
+                                                    "cost": None}), samples=0)
+    seconds = sorted(row['seconds'] for row in rows)
+    return {
+        "samples": len(rows),
+        "seconds": round(sum(seconds) / len(rows), 2),
+        "p90_seconds": round(seconds[min(len(seconds) - 1, int(0.9 * len(seconds)))], 2),
+        "prompt_tokens": round(sum(row['prompt_tokens'] for row in rows) / len(rows)),
+        "completion_tokens": round(sum(row['completion_tokens'] for row in rows) / len(rows)),
+        "cost": round(sum(row['cost'] for row in rows) / len(rows), 6),
+    }
+
+def usage_report():
+    return {
+        "today": used_today(),
+        "budgets": budgets(),
+        "stages": {stage: stage_stats(stage) for stage in
+                   (STAGE_DOWNLOAD, STAGE_PARSE, STAGE_ANALYSIS, STAGE_ABSTRACT_ANALYSIS, STAGE_TRANSLATION,
+                    STAGE_TRIAGE, STAGE_REVISION)},
+    }
+
+# --- Estimation and admission ---
+
+def estimate(stage_counts, concurrency=1, model=None):
+    """
+    Predicts the footprint of running `stage_counts` (stage -> number of papers that
+    still need it) at `concurrency` papers at a time, from the recorded history.
+    The cost is the historical cost per paper; without history it is priced at
+    `model` (or the only model in LLM_PRICES).
+    """
+    price_table = prices()
+    if model is None and len(price_table) == 1:
+        model = next(iter(price_table))
+    prompt_tokens = completion_tokens = work_seconds = cost = 0.0
+    samples = {}
+    for stage, count in stage_counts.items():
+        stats = stage_stats(stage)
+        samples[stage] = stats['samples']
+        prompt_tokens += count * stats['prompt_tokens']
+        completion_tokens += count * stats['completion_tokens']
+        work_seconds += count * stats['seconds']
+        if stats['cost'] is not None:
+            cost += count * stats['cost']
+        else:
+            cost += count * cost_of(model, stats['prompt_tokens'], stats['completion_tokens'], price_table)
+    return {
+        "stage_counts": dict(stage_counts),
+        "prompt_tokens": int(prompt_tokens),
+        "completion_tokens": int(completion_tokens),
+        "tokens": int(prompt_tokens + completion_tokens),
+        "cost": round(cost, 6),
+        "seconds": round(work_seconds / max(1, concurrency), 1),
+        "history_samples": samples,
+    }
+
+def admit(job_estimate):
+    """Decides whether a job with `job_estimate` may run under today's budgets."""
+    limits = budgets()
+    used = used_today()
+    decision = {"decision": ADMITTED, "used_today": used, "budgets": limits, "reason": ""}
+    for key in ('tokens', 'cost'):
+        limit = limits[key]
+        if limit is None:
+            continue
+        if job_estimate[key] > limit:
+            decision.update(decision=REJECTED,
+                            reason=f"Estimated {key} ({job_estimate[key]}) exceed the daily budget ({limit}).")
+            return decision
+        if used[key] + job_estimate[key] > limit:
+            decision.update(decision=THROTTLED,
+                            reason=f"Estimated {key} ({job_estimate[key]}) exceed what is left of today's budget "
+                                   f"({max(0, limit - used[key])}); the job pauses when the budget runs out.")
+    return decision
+
+def budget_exhausted():
+    limits = budgets()
+    used = used_today()
+    return any(limits[key] is not None and used[key] >= limits[key] for key in ('tokens', 'cost'))
+
+def wait_for_budget(task_status=None, poll_seconds=60):
+    """Blocks while today's budget is exhausted, i.e. until it resets at midnight."""
+    while budget_exhausted():
+        resume_at = _start_of_day() + timedelta(days=1)
+        if task_status is not None:
+            task_status['message'] = f"Daily LLM budget exhausted; paused until {resume_at.strftime('%Y-%m-%d %H:%M')}."
+        time.sleep(min(poll_seconds, max(1.0, resume_at.timestamp() - time.time())))
+
+async def wait_for_budget_async(task_status=None, poll_seconds=60):
+    """wait_for_budget() for coroutines."""
+    while await aio.to_thread(budget_exhausted):
+        resume_at = _start_of_day() + timedelta(days=1)
+        if task_status is not None:
+            task_status['message'] = f"Daily LLM budget exhausted; paused until {resume_at.strftime('%Y-%m-%d %H:%M')}."
+        await asyncio.sleep(min(poll_seconds, max(1.0, resume_at.timestamp() - time.time())))
@@ -0,0 +1,140 @@
+import os
+import asyncio
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+# Asynchronous I/O core. External calls (arXiv queries, PDF downloads, parser requests
+# and LLM completions) are coroutines on one event loop per process, run by a daemon
+# thread, and share one pooled HTTP client, so a paper in flight costs a task rather
+# than an OS thread. Synchronous callers (queue workers, CLI runs, Flask handlers) use
+# run(), which submits a coroutine to the loop and waits for its result; the caller's
+# context variables (priority class and label, see core/scheduler.py, or an active
+# profile capture) go with it.
+#
+# Nothing blocking runs inline on the loop: file and SQLite work (checkpoints, the
+# LLM cache, accounting, writing parser output and reports) goes through to_thread(),
+# which uses a bounded pool of AIO_BLOCKING_THREADS threads.
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_loop = None
+_loop_pid = None
+_loop_thread = None
+_http_client = None
+
+def max_connections():
+    """Connections the shared HTTP client keeps open at most, across all hosts."""
+    return int(os.getenv("HTTP_MAX_CONNECTIONS", "200"))
+
+def max_keepalive_connections():
+    return int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "50"))
+
+def connect_timeout():
+    return float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "10"))
+
+def read_timeout():
+    """Default timeout for each network operation (connect, read, write, pool wait)."""
+    return float(os.getenv("HTTP_TIMEOUT_SECONDS", "60"))
+
+def blocking_threads():
+    return max(1, int(os.getenv("AIO_BLOCKING_THREADS", "16")))
+
+def _run_loop(loop):
+    asyncio.set_event_loop(loop)
+    loop.run_forever()
+
+def get_loop():
+    """The process's I/O loop, started on first use (and again in a forked child)."""
+    global _loop, _loop_pid, _loop_thread, _http_client
+    with _lock:
+        if _loop is None or _loop_pid != os.getpid():
+            # A forked child inherits the loop object but not the thread running it.
+            _loop = asyncio.new_event_loop()
+            _loop.set_task_factory(_task_factory)
+            _loop.set_default_executor(ThreadPoolExecutor(max_workers=blocking_threads(),
+                                                          thread_name_prefix="aio-blocking"))
+            _loop_pid = os.getpid()
+            _http_client = None
+            _loop_thread = threading.Thread(target=_run_loop, args=(_loop,), daemon=True, name="aio-loop")
+            _loop_thread.start()
+        return _loop
+
+def in_loop_thread():
+    return _loop_thread is not None and threading.current_thread() is _loop_thread
+
+def is_io_thread(thread):
+    """True for the loop thread and the blocking pool, which run work of every caller."""
+    return thread.name == "aio-loop" or thread.name.startswith("aio-blocking")
+
+# --- Context markers ---
+# The loop and pool threads are shared, so whose work one of their stacks is doing
+# is only known from its context. Every task and blocking call runs below one of the
+# marker functions below, which receive that context as their `context` argument;
+# context_of() finds the innermost one. The profiler (see core/profiler.py) relies on
+# these functions and their `context` parameter to attribute loop and pool samples.
+
+async def _task_root(coro, context):
+    # Marker for every task on the loop; `context` is the snapshot the task starts from.
+    return await coro
+
+def _task_factory(loop, coro, **kwargs):
+    return asyncio.Task(_task_root(coro, kwargs.get('context') or contextvars.copy_context()), loop=loop, **kwargs)
+
+async def _in_context(coro, context):
+    # Marker for work submitted by run(): adopt the caller's context variables in this task.
+    for var, value in context.items():
+        var.set(value)
+    return await coro
+
+def _call_in_context(context, fn, args, kwargs):
+    # Marker for blocking calls made by to_thread(); `context` is the caller's, which
+    # asyncio.to_thread() also runs `fn` in.
+    return fn(*args, **kwargs)
+
+_MARKER_CODES = (_task_root.__code__, _in_context.__code__, _call_in_context.__code__)
+
+def context_of(frame):
+    """The context of the task or blocking call a frame of an I/O thread belongs to, or None."""
+    while frame is not None:
+        if frame.f_code in _MARKER_CODES:
+            return frame.f_locals['context']
+        frame = frame.f_back
+    return None
+
+def run(coro, timeout=None):
+    """
+    Runs a coroutine on the I/O loop and returns its result (or raises its exception).
+    For synchronous code only: coroutines must await each other instead, as waiting
+    here from the loop thread would block the loop forever.
+    """
+    if in_loop_thread():
+        coro.close()
+        raise RuntimeError("aio.run() called on the I/O loop; await the coroutine instead.")
+    future = asyncio.run_coroutine_threadsafe(_in_context(coro, contextvars.copy_context()), get_loop())
+    try:
+        return future.result(timeout)
+    except BaseException:
+        # Timed out or interrupted: do not leave the work running on the loop.
+        future.cancel()
+        raise
+
+async def to_thread(fn, *args, **kwargs):
+    """Runs blocking `fn` on the loop's thread pool; the caller's context variables go with it."""
+    return await asyncio.to_thread(_call_in_context, contextvars.copy_context(), fn, args, kwargs)
+
+def http_client():
+    """The shared, pooled HTTP client. Only usable from coroutines on the I/O loop."""
+    global _http_client
+    if _http_client is None:
+        # httpx is imported on first use, like the other network client libraries.
+        import httpx
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections(),
+                                max_keepalive_connections=max_keepalive_connections()),
+            timeout=httpx.Timeout(read_timeout(), connect=connect_timeout()),
+            follow_redirects=True,
+        )
+    return _http_client
@@ -1,169 +1,584 @@
 import os
 import re
+import time
 import json
+import asyncio
 import base64
-import requests
-import logging
-from core.history_manager import load_processed_papers
-from core import analyzer
+from core.history_manager import is_processed
+from core import (accounting, aio, analyzer, facets, job_store, markdown_reducer, paper_record, pdf_batcher, revisions,
+                  settings, storage)
+from core.storage import atomic_write
 
 # --- Constants ---
 BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
 RESULTS_DIR = os.path.join(BACKEND_DIR, '..', 'data', 'analysis_results')
 
-def get_full_text_analysis(paper, task_status, logger):
+# Download, parse and LLM calls are coroutines on the I/O loop (see core/aio.py), so a
+# paper in flight waits on the network without holding a thread; the synchronous
+# functions below are thin wrappers for callers outside the loop. File and SQLite
+# work of the coroutines (checkpoints, accounting, writing results) goes through
+# aio.to_thread(), so one slow disk does not stall every paper on the loop.
+
+def download_chunk_bytes():
+    return int(os.getenv("PDF_DOWNLOAD_CHUNK_KB", "256")) * 1024
+
+async def _download_stage_async(paper, paper_result_dir, task_status):
+    """Streams the paper's PDF into its result directory."""
+    pdf_path = os.path.join(paper_result_dir, 'source.pdf')
+    tmp_path = f"{pdf_path}.tmp"
+    task_status['message'] = f"Downloading PDF: {paper.get('title', '')[:30]}..."
+    started = time.monotonic()
+    try:
+        async with aio.http_client().stream('GET', paper['pdf_url']) as response:
+            response.raise_for_status()
+            f = await aio.to_thread(open, tmp_path, 'wb')
+            try:
+                async for chunk in response.aiter_bytes(download_chunk_bytes()):
+                    await aio.to_thread(f.write, chunk)
+                await aio.to_thread(_sync_file, f)
+            finally:
+                await aio.to_thread(f.close)
+    except BaseException:
+        # Do not leave a partial download behind; the next attempt starts over.
+        await aio.to_thread(_remove_file, tmp_path)
+        raise
+    await aio.to_thread(_finish_download, paper, tmp_path, pdf_path, paper_result_dir, time.monotonic() - started)
+    return pdf_path
+
+def _sync_file(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+def _remove_file(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+def _finish_download(paper, tmp_path, pdf_path, paper_result_dir, seconds):
+    """Moves a complete download into place and checkpoints the download stage."""
+    os.replace(tmp_path, pdf_path)
+    accounting.record(accounting.STAGE_DOWNLOAD, seconds)
+    storage.refresh_paper(paper_result_dir)
+    job_store.mark_stage(paper['entry_id'], job_store.STAGE_DOWNLOADED)
+
+def _download_stage(paper, paper_result_dir, task_status):
+    return aio.run(_download_stage_async(paper, paper_result_dir, task_status))
+
+def _save_parse_output(paper, pdf_path, paper_result_dir, paper_result, logger):
+    """Saves the parser's markdown and images to disk. Returns (markdown_content, extracted_image_filenames)."""
+    markdown_content = paper_result.get('md_content', '')
+    images_dict = paper_result.get('images', {})
+
+    if not markdown_content:
+        return markdown_content, []
+
+    # Save images to disk so they can be served by the API
+    extracted_image_filenames = []
+    if images_dict:
+        images_dir = os.path.join(paper_result_dir, 'images')
+        os.makedirs(images_dir, exist_ok=True)
+        for filename, data_uri in images_dict.items():
+            try:
+                header, encoded = data_uri.split(",", 1)
+                image_bytes = base64.b64decode(encoded)
+                atomic_write(os.path.join(images_dir, filename), image_bytes, 'wb')
+                extracted_image_filenames.append(filename)
+            except Exception as img_e:
+                logger.error(f"Could not save image {filename}: {img_e}")
+
+    raw_content_path = os.path.join(paper_result_dir, 'raw_content.md')
+    storage.write_text(raw_content_path, markdown_content)
+    logger.info(f"Saved raw parsed content to {raw_content_path}")
+
+    job_store.mark_stage(paper['entry_id'], job_store.STAGE_PARSED,
+                         {'extracted_image_filenames': extracted_image_filenames})
+    # The PDF is no longer needed once its parse output is durable.
+    if os.path.exists(pdf_path):
+        os.remove(pdf_path)
+    storage.refresh_paper(paper_result_dir)
+    return markdown_content, extracted_image_filenames
+
+async def _parse_stage_async(paper, pdf_path, paper_result_dir, pdf_parser_url, task_status, logger):
+    """
+    Sends the PDF to miner-u and saves the markdown and images to disk.
+    PDFs parsed concurrently are batched into one parser request (see pdf_batcher).
+    Returns (markdown_content, extracted_image_filenames).
+    """
+    entry_id_short = paper['entry_id'].split('/')[-1]
+    task_status['message'] = f"Parsing PDF with image extraction..."
+    started = time.monotonic()
+    paper_result = await pdf_batcher.parse_pdf_async(pdf_parser_url, pdf_path, f"{entry_id_short}.pdf")
+    await aio.to_thread(accounting.record, accounting.STAGE_PARSE, time.monotonic() - started)
+    return await aio.to_thread(_save_parse_output, paper, pdf_path, paper_result_dir, paper_result, logger)
+
+def _parse_stage(paper, pdf_path, paper_result_dir, pdf_parser_url, task_status, logger):
+    return aio.run(_parse_stage_async(paper, pdf_path, paper_result_dir, pdf_parser_url, task_status, logger))
+
+# Header blocks of a stored report, in front of the LLM's analysis.
+REPORT_HEADER_PREFIXES = ('**Authors:**', '**Link:**', '**Published:**', '**Categories:**', '**Previous Version:**')
+
+def _report_body(content, previous_short_id, image_filenames):
+    """
+    The LLM analysis inside a stored report: the header and the figures gallery are
+    stripped and absolute image URLs of the previous version are turned back into the
+    relative paths the LLM writes, for images that the new version still has.
+    """
+    blocks = content.split("\n\n")
+    if blocks and blocks[0].startswith("# "):
+        blocks = blocks[1:]
+    while blocks and blocks[0].startswith(REPORT_HEADER_PREFIXES):
+        blocks = blocks[1:]
+    body = "\n\n".join(blocks)
+    body = re.sub(r"\n*<!-- FIGURES_GALLERY_DATA: .*? -->\s*$", "", body, flags=re.DOTALL)
+    available = set(image_filenames or [])
+    def relative_path(match):
+        filename = match.group(1)
+        return f"![](images/{filename})" if filename in available else ""
+    return re.sub(r"\!\[\]\([^)\s]*/api/images/" + re.escape(previous_short_id) + r"/([^)\s]+)\)", relative_path, body)
+
+def _prepare_analysis(paper, markdown_content, extracted_image_filenames, incremental, logger):
+    """The LLM input: (reduced markdown, reduction report, revision plan or None, previous report body or None)."""
+    entry_id_short = paper['entry_id'].split('/')[-1]
+
+    # Drop references, acknowledgements etc. before they cost prompt tokens; figure references are kept.
+    reduced_content, reduction_report = markdown_reducer.reduce_markdown(markdown_content)
+    logger.info(f"Input reduction for {paper['entry_id']}: ~{reduction_report['tokens_saved']} of "
+                f"{reduction_report['tokens_before']} tokens saved "
+                f"(dropped: {', '.join(reduction_report['dropped_sections']) or 'none'}).")
+
+    # A revision of a stored paper only sends its changed sections with the previous report.
+    revision = revisions.plan(entry_id_short, reduced_content, RESULTS_DIR, logger) if incremental else None
+    previous_body = None
+    if revision and revision['mode'] != revisions.MODE_FULL:
+        previous_body = _report_body(revision['previous_analysis'], revision['previous_version'], extracted_image_filenames)
+    return reduced_content, reduction_report, revision, previous_body
+
+def _build_report(paper, analysis_text, extracted_image_filenames, paper_result_dir, reduction_report, revision):
+    """Builds the final report around the LLM's analysis and checkpoints it as a draft."""
+    entry_id_short = paper['entry_id'].split('/')[-1]
+    mode = revision['mode'] if revision else revisions.MODE_FULL
+
+    # Rewrite relative image paths in the LLM's response to absolute URLs
+    backend_url = settings.get().backend_public_url
+    def replace_path(match):
+        filename = match.group(1)
+        return f"![]({backend_url}/api/images/{entry_id_short}/{filename})"
+
+    # The regex looks for ![](images/some_image.jpg)
+    rewritten_analysis_text = re.sub(r"\!\[\]\(images/(.*?)\)", replace_path, analysis_text)
+
+    # Construct the final document
+    doc_lines = [
+        f"# {paper['title']}",
+        f"**Authors:** {', '.join(paper['authors'])}",
+        f"**Link:** {paper['pdf_url']}",
+        f"**Published:** {paper['published']}",
+        f"**Categories:** {', '.join(paper['categories'])}",
+    ]
+    if revision:
+        doc_lines.append(f"**Previous Version:** {revision['previous_version']} ({mode} update, "
+                         f"{len(revision['summary']['changed_sections'])} sections changed)")
+    doc_lines.append(rewritten_analysis_text)
+    full_content = "\n\n".join(doc_lines)
+
+    # Add a figures gallery at the end of the document
+    if extracted_image_filenames:
+        # Prepare image URLs for the frontend
+        gallery_images_data = []
+        for filename in extracted_image_filenames:
+            image_url = f"{backend_url}/api/images/{entry_id_short}/{filename}"
+            gallery_images_data.append({"src": image_url, "alt": filename}) # Include alt text
+
+        # Embed the image data as a JSON string within an HTML comment
+        # Frontend will parse this comment to render the collapsible gallery
+        gallery_json = json.dumps(gallery_images_data, ensure_ascii=False)
+        full_content += f"\n\n<!-- FIGURES_GALLERY_DATA: {gallery_json} -->"
+
+    atomic_write(os.path.join(paper_result_dir, 'analysis.draft.md'), full_content)
+    job_store.mark_stage(paper['entry_id'], job_store.STAGE_ANALYZED,
+                         {'extracted_image_filenames': extracted_image_filenames,
+                          'input_reduction': reduction_report,
+                          'prompt_version': analyzer.prompt_version(),
+                          'analysis_model': analyzer.analysis_model(),
+                          'revision': revision['summary'] if revision else None})
+    return full_content
+
+async def _analyze_stage_async(paper, markdown_content, extracted_image_filenames, paper_result_dir, task_status, logger,
+                               incremental=True):
+    """
+    Runs the LLM over the markdown and builds the final report. With `incremental`, a
+    revision of a stored paper is analyzed from its changes (see core/revisions.py).
+    Returns the report, or an analyzer failure marker.
+    """
+    reduced_content, reduction_report, revision, previous_body = await aio.to_thread(
+        _prepare_analysis, paper, markdown_content, extracted_image_filenames, incremental, logger)
+
+    # A revision of a stored paper only sends its changed sections with the previous report.
+    mode = revision['mode'] if revision else revisions.MODE_FULL
+    if mode == revisions.MODE_UNCHANGED:
+        task_status['message'] = f"Reusing the analysis of {revision['previous_version']} (no content changes)..."
+        analysis_text = previous_body
+    elif mode == revisions.MODE_INCREMENTAL:
+        task_status['message'] = f"Updating the analysis of {revision['previous_version']} with LLM..."
+        analysis_text = await analyzer.analyze_revision_async(
+            previous_body, revision['changes_markdown'], revision['removed_sections'])
+    else:
+        task_status['message'] = f"Analyzing full text with LLM..."
+        # The markdown_content passed to the LLM now contains the relative image paths.
+        analysis_text = await analyzer.analyze_full_text_async(reduced_content)
+    if analyzer.is_failed_result(analysis_text):
+        # Do not persist error markers as analyses; a later request will retry.
+        logger.error(f"LLM analysis failed for {paper['entry_id']}: {analysis_text}")
+        return analysis_text
+
+    return await aio.to_thread(_build_report, paper, analysis_text, extracted_image_filenames, paper_result_dir,
+                               reduction_report, revision)
+
+def _analyze_stage(paper, markdown_content, extracted_image_filenames, paper_result_dir, task_status, logger,
+                   incremental=True):
+    return aio.run(_analyze_stage_async(paper, markdown_content, extracted_image_filenames, paper_result_dir,
+                                        task_status, logger, incremental))
+
+def _read_cached_analysis(paper_id, stage, paper_result_dir):
+    """The persisted report of a paper, or None. A hit counts as a use of the paper's files."""
+    cached_analysis_path = os.path.join(paper_result_dir, 'analysis.md')
+    if not storage.exists(cached_analysis_path) or not (stage == job_store.STAGE_PERSISTED or is_processed(paper_id)):
+        return None
+    storage.touch(os.path.basename(paper_result_dir))
+    return storage.read_text(cached_analysis_path)
+
+async def _claim_paper_async(paper_id, task_status):
+    """job_store.claimed() for coroutines: waits for the paper's claim without holding a thread."""
+    claim = await aio.to_thread(job_store.try_claim, paper_id)
+    if claim is None:
+        task_status['message'] = f"Waiting for another run on {paper_id.split('/')[-1]} to finish its stage..."
+    while claim is None:
+        await asyncio.sleep(job_store.CLAIM_POLL_SECONDS)
+        claim = await aio.to_thread(job_store.try_claim, paper_id)
+    return claim
+
+async def get_full_text_analysis_async(paper, task_status, logger):
     """
-    New workflow: 
+    New workflow:
     1. Gets markdown and images from miner-u.
     2. Saves images to disk.
     3. Instructs LLM to analyze text and place image tags in its response.
     4. Rewrites relative image paths in the LLM response to absolute URLs.
+
+    Each stage (downloaded, parsed, analyzed, persisted) is checkpointed, so an
+    interrupted run resumes from the last completed stage of the paper. The stages
+    run under the paper's claim (see job_store), so a prefetch or another analysis
+    of the same paper is waited for and its checkpoints reused.
+    Returns the report content, or an "[Analysis Failed...]" marker.
     """
-    processed_papers = load_processed_papers()
+    paper_id = paper.get('entry_id')
+    paper_result_dir = os.path.join(RESULTS_DIR, paper_id.split('/')[-1])
+
+    # A persisted report is served without waiting for the claim.
+    stage, _ = await aio.to_thread(job_store.get_stage, paper_id)
+    cached_content = await aio.to_thread(_read_cached_analysis, paper_id, stage, paper_result_dir)
+    if cached_content is not None:
+        logger.info(f"Cache hit for paper {paper_id}.")
+        return cached_content
+
+    try:
+        claim = await _claim_paper_async(paper_id, task_status)
+    except Exception as e:
+        logger.error(f"Could not claim paper {paper_id}: {e}")
+        return f"[Analysis Failed due to an error: {e}]"
+    try:
+        return await _run_stages_async(paper, task_status, logger)
+    finally:
+        await aio.to_thread(job_store.release, claim)
+
+async def _run_stages_async(paper, task_status, logger):
+    """The stages of get_full_text_analysis_async(), run while holding the paper's claim."""
     paper_id = paper.get('entry_id')
     entry_id_short = paper_id.split('/')[-1]
-    
+
     paper_result_dir = os.path.join(RESULTS_DIR, entry_id_short)
-    cached_analysis_path = os.path.join(paper_result_dir, 'analysis.md')
+    raw_content_path = os.path.join(paper_result_dir, 'raw_content.md')
+    draft_analysis_path = os.path.join(paper_result_dir, 'analysis.draft.md')
 
-    if paper_id in processed_papers.keys() and os.path.exists(cached_analysis_path):
+    stage, stage_detail = await aio.to_thread(job_store.get_stage, paper_id)
+    cached_content = await aio.to_thread(_read_cached_analysis, paper_id, stage, paper_result_dir)
+    if cached_content is not None:
         logger.info(f"Cache hit for paper {paper_id}.")
-        with open(cached_analysis_path, 'r', encoding='utf-8') as f:
-            return f.read()
+        return cached_content
 
-    logger.info(f"Cache miss for paper {paper_id}. Starting full analysis.")
-    os.makedirs(paper_result_dir, exist_ok=True)
+    if stage:
+        logger.info(f"Resuming paper {paper_id} after stage '{stage}'.")
+    else:
+        logger.info(f"Cache miss for paper {paper_id}. Starting full analysis.")
+    await aio.to_thread(os.makedirs, paper_result_dir, exist_ok=True)
+    extracted_image_filenames = stage_detail.get('extracted_image_filenames', [])
 
-    pdf_parser_url = os.getenv("PDF_PARSER_URL")
-    if not pdf_parser_url:
-        return "[Analysis Failed: PDF_PARSER_URL not configured]"
+    try:
+        if stage == job_store.STAGE_ANALYZED and await aio.to_thread(os.path.exists, draft_analysis_path):
+            full_content = await aio.to_thread(storage.read_text, draft_analysis_path)
+        else:
+            if stage in (job_store.STAGE_PARSED, job_store.STAGE_ANALYZED) and \
+                    await aio.to_thread(storage.exists, raw_content_path):
+                markdown_content = await aio.to_thread(storage.read_text, raw_content_path)
+            else:
+                pdf_parser_url = settings.get().pdf_parser_url
+                if not pdf_parser_url:
+                    return "[Analysis Failed: PDF_PARSER_URL not configured]"
 
-    pdf_url = paper.get('pdf_url')
-    if not pdf_url:
-        return "[Analysis Failed: Paper has no PDF URL]"
+                if not paper.get('pdf_url'):
+                    return "[Analysis Failed: Paper has no PDF URL]"
 
-    local_pdf_filename = os.path.join(BACKEND_DIR, '..', f"{entry_id_short}.pdf")
-    
-    try:
-        task_status['message'] = f"Downloading PDF: {paper.get('title', '')[:30]}..."
-        response = requests.get(pdf_url)
-        response.raise_for_status()
-        with open(local_pdf_filename, 'wb') as f:
-            f.write(response.content)
-
-        task_status['message'] = f"Parsing PDF with image extraction..."
-        with open(local_pdf_filename, 'rb') as f:
-            files = {'files': (os.path.basename(local_pdf_filename), f, 'application/pdf')}
-            data = {'return_md': 'true', 'return_images': 'true'}
-            response = requests.post(pdf_parser_url, files=files, data=data)
-            response.raise_for_status()
-        
-        json_response = response.json()
-        paper_result_key = next(iter(json_response.get('results', {})), None)
-        paper_result = json_response.get('results', {}).get(paper_result_key, {})
-
-        markdown_content = paper_result.get('md_content', '')
-        images_dict = paper_result.get('images', {})
-
-        if not markdown_content:
-            return "[Analysis Failed: Markdown content was empty after parsing]"
-        
-        raw_content_path = os.path.join(paper_result_dir, 'raw_content.md')
-        with open(raw_content_path, 'w', encoding='utf-8') as f:
-            f.write(markdown_content)
-        logger.info(f"Saved raw parsed content to {raw_content_path}")
-
-        # Save images to disk so they can be served by the API
-        extracted_image_filenames = []
-        if images_dict:
-            images_dir = os.path.join(paper_result_dir, 'images')
-            os.makedirs(images_dir, exist_ok=True)
-            for filename, data_uri in images_dict.items():
-                try:
-                    header, encoded = data_uri.split(",", 1)
-                    image_bytes = base64.b64decode(encoded)
-                    with open(os.path.join(images_dir, filename), 'wb') as img_f:
-                        img_f.write(image_bytes)
-                    extracted_image_filenames.append(filename)
-                except Exception as img_e:
-                    logger.error(f"Could not save image {filename}: {img_e}")
+                pdf_path = os.path.join(paper_result_dir, 'source.pdf')
+                if stage != job_store.STAGE_DOWNLOADED or not await aio.to_thread(os.path.exists, pdf_path):
+                    pdf_path = await _download_stage_async(paper, paper_result_dir, task_status)
+                markdown_content, extracted_image_filenames = await _parse_stage_async(
+                    paper, pdf_path, paper_result_dir, pdf_parser_url, task_status, logger)
 
-        task_status['message'] = f"Analyzing full text with LLM..."
-        # The markdown_content passed to the LLM now contains the relative image paths.
-        analysis_text = analyzer.analyze_full_text(markdown_content)
-        
-        # Rewrite relative image paths in the LLM's response to absolute URLs
-        backend_url = os.getenv("BACKEND_PUBLIC_URL", "http://localhost:5001")
-        def replace_path(match):
-            filename = match.group(1)
-            return f"![]({backend_url}/api/images/{entry_id_short}/{filename})"
-
-        # The regex looks for ![](images/some_image.jpg)
-        rewritten_analysis_text = re.sub(r"\!\[\]\(images/(.*?)\)", replace_path, analysis_text)
-
-        # Construct the final document
-        doc_lines = [
-            f"# {paper['title']}",
-            f"**Authors:** {', '.join(paper['authors'])}",
-            f"**Link:** {paper['pdf_url']}",
-            f"**Published:** {paper['published']}",
-            f"**Categories:** {', '.join(paper['categories'])}",
-            rewritten_analysis_text
-        ]
-        full_content = "\n\n".join(doc_lines)
-
-        # Add a figures gallery at the end of the document
-        if extracted_image_filenames:
-            # Prepare image URLs for the frontend
-            gallery_images_data = []
-            for filename in extracted_image_filenames:
-                image_url = f"{backend_url}/api/images/{entry_id_short}/{filename}"
-                gallery_images_data.append({"src": image_url, "alt": filename}) # Include alt text
-
-            # Embed the image data as a JSON string within an HTML comment
-            # Frontend will parse this comment to render the collapsible gallery
-            gallery_json = json.dumps(gallery_images_data, ensure_ascii=False)
-            full_content += f"\n\n<!-- FIGURES_GALLERY_DATA: {gallery_json} -->"
-        
-        # Pass extracted_image_filenames to process_paper_for_email
-        return process_paper_for_email(paper, task_status, logger, full_content, extracted_image_filenames)
+                if not markdown_content:
+                    return "[Analysis Failed: Markdown content was empty after parsing]"
+
+            full_content = await _analyze_stage_async(paper, markdown_content, extracted_image_filenames,
+                                                      paper_result_dir, task_status, logger)
+            if analyzer.is_failed_result(full_content):
+                return full_content
+            stage_detail = (await aio.to_thread(job_store.get_stage, paper_id))[1]
+
+        await aio.to_thread(process_paper_for_email, paper, task_status, logger, full_content,
+                            extracted_image_filenames, extra_metadata=_analysis_metadata(stage_detail))
+        return full_content
 
     except Exception as e:
         logger.error(f"Exception in analysis pipeline for {paper.get('title')}:", exc_info=e)
         return f"[Analysis Failed due to an error: {e}]"
-    finally:
-        if os.path.exists(local_pdf_filename):
-            os.remove(local_pdf_filename)
+
+def get_full_text_analysis(paper, task_status, logger):
+    return aio.run(get_full_text_analysis_async(paper, task_status, logger))
+
+def pending_stage_counts(papers):
+    """How many of `papers` still need each costed stage (download, parse, analysis)."""
+    counts = {accounting.STAGE_DOWNLOAD: 0, accounting.STAGE_PARSE: 0, accounting.STAGE_ANALYSIS: 0}
+    for paper in papers:
+        paper_result_dir = os.path.join(RESULTS_DIR, paper['entry_id'].split('/')[-1])
+        if storage.exists(os.path.join(paper_result_dir, 'analysis.md')):
+            continue
+        stage, _ = job_store.get_stage(paper['entry_id'])
+        if stage in (job_store.STAGE_ANALYZED, job_store.STAGE_PERSISTED):
+            continue
+        counts[accounting.STAGE_ANALYSIS] += 1
+        if stage != job_store.STAGE_PARSED:
+            counts[accounting.STAGE_PARSE] += 1
+            if stage != job_store.STAGE_DOWNLOADED:
+                counts[accounting.STAGE_DOWNLOAD] += 1
+    return counts
+
+def _analysis_metadata(stage_detail):
+    """Metadata recorded by the analyze stage that is stored with the persisted analysis."""
+    metadata = {key: stage_detail[key] for key in ('input_reduction', 'prompt_version', 'analysis_model')
+                if stage_detail.get(key) is not None}
+    # Always recorded, so a run that was not an incremental update clears an earlier revision.
+    metadata['revision'] = stage_detail.get('revision')
+    return metadata
+
+def prefetch_paper(paper, logger, should_stop=None):
+    """
+    Speculatively runs the download and parse stages so that a later analysis of the
+    paper resumes straight at the LLM stage. `should_stop` is checked between stages.
+    Returns 'ready' (already parsed or analyzed), 'prefetched', 'cancelled' or 'failed'.
+    """
+    paper_id = paper['entry_id']
+    if _is_prefetched(paper_id):
+        return 'ready'
+
+    pdf_parser_url = settings.get().pdf_parser_url
+    if not pdf_parser_url or not paper.get('pdf_url'):
+        return 'failed'
+
+    # An analysis (or another prefetch) running on the paper is waited for, not duplicated.
+    try:
+        with job_store.claimed(paper_id, should_stop) as held:
+            if not held:
+                return 'cancelled'
+            if _is_prefetched(paper_id):
+                return 'ready'
+            return _prefetch_stages(paper, pdf_parser_url, logger, should_stop)
+    except OSError as e:
+        logger.warning(f"Could not claim {paper_id} for prefetching: {e}")
+        return 'failed'
+
+def _is_prefetched(paper_id):
+    """True if a paper was parsed (or analyzed) already, so a prefetch has nothing to do."""
+    stage, _ = job_store.get_stage(paper_id)
+    return stage in (job_store.STAGE_PARSED, job_store.STAGE_ANALYZED, job_store.STAGE_PERSISTED) or \
+        storage.exists(os.path.join(RESULTS_DIR, paper_id.split('/')[-1], 'analysis.md'))
+
+def _prefetch_stages(paper, pdf_parser_url, logger, should_stop):
+    """The download and parse stages of prefetch_paper(), run while holding the paper's claim."""
+    paper_id = paper['entry_id']
+    paper_result_dir = os.path.join(RESULTS_DIR, paper_id.split('/')[-1])
+    stage, _ = job_store.get_stage(paper_id)
+    task_status = {'message': ''}
+    try:
+        os.makedirs(paper_result_dir, exist_ok=True)
+        pdf_path = os.path.join(paper_result_dir, 'source.pdf')
+        if stage != job_store.STAGE_DOWNLOADED or not os.path.exists(pdf_path):
+            pdf_path = _download_stage(paper, paper_result_dir, task_status)
+        if should_stop and should_stop():
+            # The downloaded checkpoint stays usable by a later analysis.
+            return 'cancelled'
+        markdown_content, _ = _parse_stage(paper, pdf_path, paper_result_dir, pdf_parser_url, task_status, logger)
+        return 'prefetched' if markdown_content else 'failed'
+    except Exception as e:
+        logger.warning(f"Prefetch failed for {paper_id}: {e}")
+        return 'failed'
+
+# --- Re-analysis ---
+
+def select_stored_papers(filters=None):
+    """Returns the stored analyses matching `filters` as a list of (short_id, metadata) pairs."""
+    return list(iter_stored_papers(filters))
+
+def iter_stored_papers(filters=None):
+    """
+    Yields the stored analyses matching `filters` as (short_id, metadata) pairs, one at a time.
+    Supported filters: 'short_ids', 'published_from' / 'published_to' (ISO date prefixes),
+    'categories' (any match), 'query' (substring of the title or entry id, case-insensitive)
+    and 'prompt_version' ('outdated' = not produced by the current prompt and model, or an
+    explicit version; analyses from before versioning are 'unversioned').
+    """
+    filters = filters or {}
+    short_ids = set(filters.get('short_ids') or [])
+    categories = set(filters.get('categories') or [])
+    published_from = filters.get('published_from') or ''
+    published_to = filters.get('published_to') or ''
+    query = (filters.get('query') or '').lower()
+    wanted_version = filters.get('prompt_version')
+    current_version = analyzer.prompt_version() if wanted_version == 'outdated' else None
+    current_model = analyzer.analysis_model()
+
+    if not os.path.isdir(RESULTS_DIR):
+        return
+    for short_id in sorted(os.listdir(RESULTS_DIR)):
+        metadata_path = os.path.join(RESULTS_DIR, short_id, 'metadata.json')
+        if short_ids and short_id not in short_ids:
+            continue
+        if not os.path.exists(metadata_path):
+            continue
+        try:
+            metadata = storage.read_json(metadata_path)
+        except Exception:
+            continue
+        published = metadata.get('published', '')
+        if published_from and published[:len(published_from)] < published_from:
+            continue
+        if published_to and published[:len(published_to)] > published_to:
+            continue
+        if categories and not categories.intersection(metadata.get('categories', [])):
+            continue
+        if query and query not in metadata.get('title', '').lower() and query not in metadata.get('entry_id', '').lower():
+            continue
+        version = metadata.get('prompt_version', 'unversioned')
+        if wanted_version == 'outdated':
+            if version == current_version and metadata.get('analysis_model') == current_model:
+                continue
+        elif wanted_version and version != wanted_version:
+            continue
+        yield short_id, metadata
+
+def reanalyze_paper(short_id, task_status, logger):
+    """
+    Re-runs only the LLM stage for a stored paper from its saved raw_content.md and images.
+    The previous analysis is kept as analysis.<its prompt version>.md and the new one
+    replaces analysis.md atomically. Returns 'reanalyzed', 'unchanged', 'missing_raw_content'
+    or an analyzer failure marker.
+    """
+    paper_result_dir = os.path.join(RESULTS_DIR, short_id)
+    metadata = storage.read_json(os.path.join(paper_result_dir, 'metadata.json'))
+    # Only the paper itself is carried over; what the previous run recorded is rewritten from this one.
+    paper = {field: metadata.get(field) for field in paper_record.FIELDS}
+    # Rewrites the paper's report and draft, so it waits for any other run on the paper.
+    with job_store.claimed(paper['entry_id']):
+        return _reanalyze_claimed(paper, metadata, paper_result_dir, task_status, logger)
+
+def _reanalyze_claimed(paper, metadata, paper_result_dir, task_status, logger):
+    raw_content_path = os.path.join(paper_result_dir, 'raw_content.md')
+    analysis_path = os.path.join(paper_result_dir, 'analysis.md')
+    if not storage.exists(raw_content_path):
+        # Evicted to save space; only a full re-run (re-download and parse) can refresh it.
+        return 'missing_raw_content'
+
+    extracted_image_filenames = metadata.get('extracted_image_filenames', [])
+    full_content = _analyze_stage(paper, storage.read_text(raw_content_path), extracted_image_filenames,
+                                  paper_result_dir, task_status, logger, incremental=False)
+    if analyzer.is_failed_result(full_content):
+        return full_content
+
+    previous_version = metadata.get('prompt_version', 'unversioned')
+    history = list(metadata.get('analysis_history', []))
+    outcome = 'reanalyzed'
+    previous_content = storage.read_text(analysis_path) if storage.exists(analysis_path) else None
+    if previous_content == full_content:
+        outcome = 'unchanged'
+    elif previous_content is not None:
+        archive_name = f"analysis.{previous_version}.md"
+        if storage.exists(os.path.join(paper_result_dir, archive_name)):
+            archive_name = f"analysis.{previous_version}.{int(time.time())}.md"
+        storage.write_text(os.path.join(paper_result_dir, archive_name), previous_content)
+        history.append({"prompt_version": previous_version, "analysis_model": metadata.get('analysis_model'),
+                        "file": archive_name})
+
+    # Persisting also records the new prompt version, so the paper no longer counts as outdated.
+    extra_metadata = _analysis_metadata(job_store.get_stage(paper['entry_id'])[1])
+    extra_metadata['analysis_history'] = history
+    process_paper_for_email(paper, task_status, logger, full_content, extracted_image_filenames,
+                            extra_metadata=extra_metadata)
+    return outcome
+
+def forget_paper_checkpoints(paper_result_dir):
+    """Called before a paper's whole analysis is evicted, so it will be redone from scratch."""
+    facets.remove_paper(os.path.basename(os.path.normpath(paper_result_dir)))
+    metadata_path = os.path.join(paper_result_dir, 'metadata.json')
+    if os.path.exists(metadata_path):
+        job_store.clear_stages(storage.read_json(metadata_path).get('entry_id'))
+
+def build_email_file(paper, content):
+    """Builds the attachment entry used by email_sender for one paper's report."""
+    sanitized_title = re.sub(r'[\\/*?:"<>|]',"", paper['title'])
+    return {
+        'filename': f"{sanitized_title}.md",
+        'content': content
+    }
 
 # Modify process_paper_for_email signature
-def process_paper_for_email(paper, task_status, logger, full_content, extracted_image_filenames):
-    
+def process_paper_for_email(paper, task_status, logger, full_content, extracted_image_filenames, extra_metadata=None):
+
     entry_id_short = paper['entry_id'].split('/')[-1]
     paper_result_dir = os.path.join(RESULTS_DIR, entry_id_short)
     analysis_save_path = os.path.join(paper_result_dir, 'analysis.md')
     metadata_save_path = os.path.join(paper_result_dir, 'metadata.json')
+    draft_analysis_path = os.path.join(paper_result_dir, 'analysis.draft.md')
 
     logger.info(f"Attempting to save analysis to: {analysis_save_path}")
     try:
         os.makedirs(paper_result_dir, exist_ok=True)
-        
-        with open(analysis_save_path, 'w', encoding='utf-8') as f:
-            f.write(full_content)
+
+        storage.write_text(analysis_save_path, full_content)
         logger.info(f"Successfully saved analysis to {analysis_save_path}")
 
         paper_metadata = paper.copy()
         paper_metadata['extracted_image_filenames'] = extracted_image_filenames
-        with open(metadata_save_path, 'w', encoding='utf-8') as f:
-            json.dump(paper_metadata, f, ensure_ascii=False, indent=4)
+        paper_metadata.update(extra_metadata or {})
+        atomic_write(metadata_save_path, json.dumps(paper_metadata, ensure_ascii=False, indent=4))
         logger.info(f"Successfully saved metadata to {metadata_save_path}")
 
+        facets.index_paper(entry_id_short, paper_metadata)
+        storage.touch(entry_id_short)
+        job_store.mark_stage(paper['entry_id'], job_store.STAGE_PERSISTED,
+                             {'extracted_image_filenames': extracted_image_filenames})
+        if os.path.exists(draft_analysis_path):
+            os.remove(draft_analysis_path)
+        storage.refresh_paper(paper_result_dir)
+        storage.enforce_quota(RESULTS_DIR, on_analysis_evicted=forget_paper_checkpoints)
+
     except Exception as e:
         logger.error(f"Failed to save analysis files in {paper_result_dir} due to an exception.", exc_info=True)
 
-    sanitized_title = re.sub(r'[\/*?:"<>|]',"", paper['title'])
-    email_filename = f"{sanitized_title}.md"
-
-    return {
-        'filename': email_filename,
-        'content': full_content
-    }
\ No newline at end of file
+    return build_email_file(paper, full_content)
@@ -1,59 +1,100 @@
 import os
-from openai import OpenAI
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
+import time
+import hashlib
+from core import accounting, aio, llm_cache, llm_router, settings
+from core.rate_limiter import TransientLLMError
+
+# Load environment variables from .env file (once per process)
+settings.load_env()
+
+PROMPT_TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), '..', 'prompts', 'analyzer_prompt.txt')
+REVISION_PROMPT_PATH = os.path.join(os.path.dirname(__file__), '..', 'prompts', 'revision_prompt.txt')
+
+# Results starting with one of these prefixes are error markers, not real analyses,
+# and must never be persisted as if they were.
+FAILURE_PREFIXES = ("[Analysis Failed", "[Analysis Skipped")
+TRANSIENT_FAILURE_PREFIX = "[Analysis Failed (transient)"
+
+def load_prompt_template():
+    """Reads the analysis prompt template from disk."""
+    with open(PROMPT_TEMPLATE_PATH, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def load_revision_prompt_template():
+    """Reads the prompt for updating an analysis from a paper's changed sections."""
+    with open(REVISION_PROMPT_PATH, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def prompt_version():
+    """Short hash of the current analysis prompt, stored with every analysis."""
+    return hashlib.sha256(load_prompt_template().encode('utf-8')).hexdigest()[:12]
+
+def is_failed_result(text):
+    """Returns True if an analysis result is an error marker rather than an analysis."""
+    return not text or text.startswith(FAILURE_PREFIXES)
+
+def analysis_model():
+    """The configured analysis model(s), stored with every analysis."""
+    return llm_router.route_id('analysis')
+
+async def _complete_async(role, stage, messages, **kwargs):
+    """Runs a chat completion through the router and records its token usage for `stage`."""
+    started = time.monotonic()
+    completion, provider = await llm_router.complete_routed_async(role, messages, **kwargs)
+    # Priced by the model of the provider that answered; recording runs off the loop.
+    await aio.to_thread(accounting.record_completion, stage, completion, time.monotonic() - started,
+                        model=provider.model)
+    return completion
+
+def _complete(role, stage, messages, **kwargs):
+    return aio.run(_complete_async(role, stage, messages, **kwargs))
 
 def analyze_paper(title, abstract):
     """
     Calls an LLM to generate a detailed analysis of a paper based on its title and abstract.
     """
-    api_key = os.getenv("DASHSCOPE_ANALYSIS_API_KEY")
-    base_url = os.getenv("DASHSCOPE_ANALYSIS_BASE_URL")
-    model_name = os.getenv("DASHSCOPE_ANALYSIS_MODEL")
-
-    if not all([api_key, base_url, model_name]):
+    if not llm_router.get_providers('analysis'):
         return "[Analysis Skipped: Analysis API environment variables not fully configured]"
+    model_name = analysis_model()
 
-    client = OpenAI(api_key=api_key, base_url=base_url)
-
-    print(f"Analyzing paper (abstract only) with model {model_name}: {title[:50]}...")
-    
-    with open(os.path.join(os.path.dirname(__file__), '..', 'prompts', 'analyzer_prompt.txt'), 'r', encoding='utf-8') as f:
-        prompt_template = f.read()
-    
+    prompt_template = load_prompt_template()
     paper_content = f"Title: {title}\n\nAbstract: {abstract}"
+    instruction = "请基于以上要求, 对以下论文摘要内容进行分析:\n\n"
     prompt = (
-        prompt_template + 
+        prompt_template +
         "\n\n---\n\n" +
-        "请基于以上要求, 对以下论文摘要内容进行分析:\n\n" +
+        instruction +
         paper_content
     )
 
+    cache_key, prompt_hash = llm_cache.make_key(prompt_template, model_name, instruction + paper_content)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        print(f"LLM cache hit for abstract analysis: {title[:50]}...")
+        return cached
+
+    print(f"Analyzing paper (abstract only) with model {model_name}: {title[:50]}...")
+
     try:
         messages = [{"role": "user", "content": prompt}]
-        completion = client.chat.completions.create(
-            model=model_name,
-            messages=messages
-        )
-        return completion.choices[0].message.content
+        completion = _complete('analysis', accounting.STAGE_ABSTRACT_ANALYSIS, messages)
+        result = completion.choices[0].message.content
+        llm_cache.put(cache_key, prompt_hash, model_name, result)
+        return result
+    except TransientLLMError as e:
+        print(f"Transient error during analysis for '{title[:30]}...': {e}")
+        return f"{TRANSIENT_FAILURE_PREFIX}: {e}]"
     except Exception as e:
         print(f"Error during analysis for '{title[:30]}...': {e}")
         return f"[Analysis Failed]"
 
-def translate_text(text_to_translate):
+async def translate_text_async(text_to_translate):
     """
     Calls a specialized LLM for translation.
     """
-    api_key = os.getenv("DASHSCOPE_TRANSLATION_API_KEY")
-    base_url = os.getenv("DASHSCOPE_TRANSLATION_BASE_URL")
-    model_name = os.getenv("DASHSCOPE_TRANSLATION_MODEL")
-
-    if not all([api_key, base_url, model_name]):
+    if not llm_router.get_providers('translation'):
         return "[Translation Skipped: Translation API environment variables not fully configured]"
-
-    client = OpenAI(api_key=api_key, base_url=base_url)
+    model_name = llm_router.route_id('translation')
 
     print(f"Translating text via {model_name}: {text_to_translate[:50]}...")
 
@@ -62,16 +103,15 @@ def translate_text(text_to_translate):
             "role": "user",
             "content": text_to_translate
         }]
-        
+
         translation_options = {
             "source_lang": "auto",
             "target_lang": "Chinese",
             "domains": "academic paper, computer science, scientific research"
         }
 
-        completion = client.chat.completions.create(
-            model=model_name,
-            messages=messages,
+        completion = await _complete_async(
+            'translation', accounting.STAGE_TRANSLATION, messages,
             extra_body={
                 "translation_options": translation_options
             }
@@ -81,41 +121,92 @@ def translate_text(text_to_translate):
         print(f"Error during translation: {e}")
         return f"[Translation Failed: {e}]"
 
-def analyze_full_text(markdown_content: str):
+def translate_text(text_to_translate):
+    return aio.run(translate_text_async(text_to_translate))
+
+async def analyze_full_text_async(markdown_content: str):
     """
     Calls an LLM to generate a detailed analysis of a paper from its full markdown content.
     """
-    api_key = os.getenv("DASHSCOPE_ANALYSIS_API_KEY")
-    base_url = os.getenv("DASHSCOPE_ANALYSIS_BASE_URL")
-    model_name = os.getenv("DASHSCOPE_ANALYSIS_MODEL")
-
-    if not all([api_key, base_url, model_name]):
+    if not llm_router.get_providers('analysis'):
         return "[Analysis Skipped: Analysis API environment variables not fully configured]"
+    model_name = analysis_model()
 
-    client = OpenAI(api_key=api_key, base_url=base_url)
-
-    print(f"Analyzing full paper text with model {model_name} (length: {len(markdown_content)} chars)...")
-    
-    prompt_template_path = os.path.join(os.path.dirname(__file__), '..', 'prompts', 'analyzer_prompt.txt')
-    with open(prompt_template_path, 'r', encoding='utf-8') as f:
-        prompt_template = f.read()
-    
+    prompt_template = await aio.to_thread(load_prompt_template)
+    instruction = "请基于以上要求, 对以下论文全文内容进行分析:\n\n"
     prompt = (
-        prompt_template + 
+        prompt_template +
         "\n\n---\n\n" +
-        "请基于以上要求, 对以下论文全文内容进行分析:\n\n" +
+        instruction +
         markdown_content
     )
 
+    cache_key, prompt_hash = llm_cache.make_key(prompt_template, model_name, instruction + markdown_content)
+    cached = await aio.to_thread(llm_cache.get, cache_key)
+    if cached is not None:
+        print(f"LLM cache hit for full text analysis (length: {len(markdown_content)} chars).")
+        return cached
+
+    print(f"Analyzing full paper text with model {model_name} (length: {len(markdown_content)} chars)...")
+
     try:
         messages = [{"role": "user", "content": prompt}]
-        
+
         print("Sending full text analysis request to LLM API...")
-        completion = client.chat.completions.create(
-            model=model_name,
-            messages=messages
-        )
-        return completion.choices[0].message.content
+        completion = await _complete_async('analysis', accounting.STAGE_ANALYSIS, messages)
+        result = completion.choices[0].message.content
+        await aio.to_thread(llm_cache.put, cache_key, prompt_hash, model_name, result)
+        return result
+    except TransientLLMError as e:
+        print(f"Transient error during full text analysis: {e}")
+        return f"{TRANSIENT_FAILURE_PREFIX}: {e}]"
     except Exception as e:
         print(f"Error during full text analysis: {e}")
         return f"[Analysis Failed]"
+
+def analyze_full_text(markdown_content: str):
+    return aio.run(analyze_full_text_async(markdown_content))
+
+async def analyze_revision_async(previous_analysis: str, changed_sections: str, removed_sections=None):
+    """
+    Updates the analysis of a paper's previous version from the sections that changed in
+    the new version, instead of analyzing the whole paper again.
+    """
+    if not llm_router.get_providers('analysis'):
+        return "[Analysis Skipped: Analysis API environment variables not fully configured]"
+    model_name = analysis_model()
+
+    prompt_template = await aio.to_thread(load_revision_prompt_template)
+    analysis_prompt_template = await aio.to_thread(load_prompt_template)
+    paper_content = (
+        "## 旧版本分析报告\n\n" + previous_analysis +
+        "\n\n---\n\n## 新版本中变化的章节\n\n" + (changed_sections or "(无)") +
+        "\n\n---\n\n## 新版本中删除的章节\n\n" + ("\n".join(removed_sections) if removed_sections else "(无)")
+    )
+    prompt = prompt_template + "\n\n---\n\n" + paper_content
+
+    # The analysis prompt is part of the key: the previous report was written against it.
+    cache_key, prompt_hash = llm_cache.make_key(analysis_prompt_template + prompt_template, model_name, paper_content)
+    cached = await aio.to_thread(llm_cache.get, cache_key)
+    if cached is not None:
+        print("LLM cache hit for revision analysis.")
+        return cached
+
+    print(f"Updating the analysis of a revised paper with model {model_name} "
+          f"(changed sections: {len(changed_sections)} chars)...")
+
+    try:
+        messages = [{"role": "user", "content": prompt}]
+        completion = await _complete_async('analysis', accounting.STAGE_REVISION, messages)
+        result = completion.choices[0].message.content
+        await aio.to_thread(llm_cache.put, cache_key, prompt_hash, model_name, result)
+        return result
+    except TransientLLMError as e:
+        print(f"Transient error during revision analysis: {e}")
+        return f"{TRANSIENT_FAILURE_PREFIX}: {e}]"
+    except Exception as e:
+        print(f"Error during revision analysis: {e}")
+        return f"[Analysis Failed]"
+
+def analyze_revision(previous_analysis: str, changed_sections: str, removed_sections=None):
+    return aio.run(analyze_revision_async(previous_analysis, changed_sections, removed_sections))
@@ -1,13 +1,25 @@
-import arxiv
 import os
-from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta
+import asyncio
+from datetime import datetime, timezone
 import re
+import xml.etree.ElementTree as ET
+from core import aio
+from core.paper_record import PaperRecord
 
 PROCESSED_PAPERS_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'processed_papers.txt')
 CATEGORIES_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'arxiv_categories.txt')
 FETCH_LIMIT = 300
 
+# The arXiv API is queried directly over the shared HTTP client (see core/aio.py) and
+# its Atom feed parsed here, replacing the blocking `arxiv` client library. Requests
+# follow the API's usage rules: pages of at most 100 results, 3 seconds apart.
+ARXIV_API_URL = "https://export.arxiv.org/api/query"
+PAGE_SIZE = 100
+PAGE_DELAY_SECONDS = 3.0
+PAGE_RETRIES = 3
+ATOM = "{http://www.w3.org/2005/Atom}"
+OPENSEARCH = "{http://a9.com/-/spec/opensearch/1.1/}"
+
 def load_all_categories():
     """Loads all categories from the data file."""
     if not os.path.exists(CATEGORIES_FILE):
@@ -22,6 +34,7 @@ def get_date_query_from_range(date_range):
     if not date_range or date_range == "recent":
         return ""
     
+    from dateutil.relativedelta import relativedelta
     end_date = datetime.now()
     start_date = None
 
@@ -41,7 +54,39 @@ def get_date_query_from_range(date_range):
     print(f"Date Range Query: From {start_date.date()} to {end_date.date()}")
     return f" AND submittedDate:[{start_str} TO {end_str}]"
 
-def fetch_papers(date_range=None, categories=None, keywords=None):
+def _parse_entry(entry):
+    """A PaperRecord from an Atom <entry> of the arXiv API."""
+    def text(tag):
+        return entry.findtext(ATOM + tag, default='')
+    pdf_urls = [link.get('href') for link in entry.findall(ATOM + 'link') if link.get('title') == 'pdf']
+    published = datetime.strptime(text('published'), "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+    return PaperRecord(
+        entry_id=text('id'),
+        title=re.sub(r'\s+', ' ', text('title')).strip(),
+        summary=text('summary').strip(),
+        authors=[author.findtext(ATOM + 'name', default='') for author in entry.findall(ATOM + 'author')],
+        pdf_url=pdf_urls[0] if pdf_urls else None,
+        published=published.isoformat(),
+        categories=[category.get('term') for category in entry.findall(ATOM + 'category')],
+    )
+
+async def _fetch_page(query, start, max_results):
+    """One page of results as (entries, total results). Empty pages are retried, as the API sometimes returns them."""
+    params = {"search_query": query, "start": start, "max_results": max_results,
+              "sortBy": "submittedDate", "sortOrder": "descending"}
+    for attempt in range(PAGE_RETRIES + 1):
+        if attempt:
+            await asyncio.sleep(PAGE_DELAY_SECONDS)
+        response = await aio.http_client().get(ARXIV_API_URL, params=params)
+        response.raise_for_status()
+        feed = ET.fromstring(response.content)
+        total = int(feed.findtext(OPENSEARCH + 'totalResults', default='0'))
+        entries = feed.findall(ATOM + 'entry')
+        if entries or start >= total:
+            return entries, total
+    raise RuntimeError(f"arXiv returned an empty page at offset {start} of {total} results.")
+
+async def fetch_papers_async(date_range=None, categories=None, keywords=None):
     """
     Fetches papers from arXiv based on a date range, categories, and keywords.
     """
@@ -66,43 +111,32 @@ def fetch_papers(date_range=None, categories=None, keywords=None):
     final_query = f"({category_query}){keyword_query}{date_query}"
     print(f"Executing arXiv API query (limit: {FETCH_LIMIT}): {final_query}")
 
-    search = arxiv.Search(
-        query=final_query,
-        max_results=FETCH_LIMIT,
-        sort_by=arxiv.SortCriterion.SubmittedDate,
-        sort_order=arxiv.SortOrder.Descending
-    )
-    
-    client = arxiv.Client()
+    # Results are converted to compact records page by page, so the parsed feed
+    # entries are never all held at once.
     all_results = {}
     try:
-        results_generator = client.results(search)
-        for result in results_generator:
-            all_results[result.entry_id] = result
+        start = 0
+        while start < FETCH_LIMIT:
+            if start:
+                await asyncio.sleep(PAGE_DELAY_SECONDS)
+            entries, total = await _fetch_page(final_query, start, min(PAGE_SIZE, FETCH_LIMIT - start))
+            for entry in entries:
+                record = _parse_entry(entry)
+                all_results[record.entry_id] = record
+            start += len(entries)
+            if not entries or start >= total:
+                break
     except Exception as e:
         print(f"Error during search: {e}")
 
-    final_papers = list(all_results.values())
-
+    # Every category list that includes a paper shares the same record.
     papers_by_category = {category: [] for category in search_categories}
-    for paper in final_papers:
-        for category in paper.categories:
+    for record in all_results.values():
+        for category in record.categories:
             if category in papers_by_category:
-                papers_by_category[category].append(paper)
-
-    json_output = {}
-    for category, papers in papers_by_category.items():
-        if not papers: continue
-        json_output[category] = []
-        for paper in papers:
-            json_output[category].append({
-                "entry_id": paper.entry_id,
-                "title": paper.title,
-                "summary": paper.summary,
-                "authors": [author.name for author in paper.authors],
-                "pdf_url": paper.pdf_url,
-                "published": paper.published.isoformat(),
-                "categories": paper.categories
-            })
-
-    return json_output
\ No newline at end of file
+                papers_by_category[category].append(record)
+
+    return {category: papers for category, papers in papers_by_category.items() if papers}
+
+def fetch_papers(date_range=None, categories=None, keywords=None):
+    return aio.run(fetch_papers_async(date_range, categories, keywords))
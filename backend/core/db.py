@@ -0,0 +1,48 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+_local = threading.local()
+
+def get_connection(db_path, schema=None):
+    """
+    Returns a per-thread SQLite connection for the given database file.
+    Connections run in autocommit mode with WAL journaling so that several
+    threads (and processes) can read while one writes. `schema` is a script of
+    idempotent CREATE statements run once per connection.
+    """
+    connections = getattr(_local, 'connections', None)
+    if connections is None or _local.pid != os.getpid():
+        # Never reuse connections inherited across a fork.
+        connections = _local.connections = {}
+        _local.pid = os.getpid()
+
+    db_path = os.path.abspath(db_path)
+    entry = connections.get(db_path)
+    if entry is None:
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        entry = connections[db_path] = (conn, set())
+    conn, applied_schemas = entry
+    # Several modules share one database file, each with its own tables.
+    if schema and schema not in applied_schemas:
+        conn.executescript(schema)
+        applied_schemas.add(schema)
+    return conn
+
+@contextmanager
+def transaction(conn):
+    """Runs a block inside a write transaction (BEGIN IMMEDIATE), rolling back on error."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
@@ -1,36 +1,34 @@
 import re
-import os
-from openai import OpenAI
-from dotenv import load_dotenv
+import threading
+from core import settings
 
-# Load environment variables from .env file at the very beginning
-load_dotenv()
+# The translation client is created on first use, not at import time.
+_client = None
+_client_lock = threading.Lock()
+_client_checked = False
 
-# Initialize the OpenAI client for translation
-# This should be done once, so we do it at the module level.
-try:
-    # Check for the API key *after* loading .env
-    api_key = os.getenv("DASHSCOPE_API_KEY")
-    
-    if not api_key:
-        print("Warning: DASHSCOPE_API_KEY environment variable not set. Translation will be skipped.")
-        TRANSLATION_ENABLED = False
-        client = None
-    else:
-        client = OpenAI(
-            api_key=api_key,
-            base_url=os.getenv("DASHSCOPE_BASE_URL", "https://dashscope.aliyuncs.com/compatible-mode/v1"),
-        )
-        TRANSLATION_ENABLED = True
-except Exception as e:
-    print(f"Error initializing OpenAI client for translation: {e}")
-    TRANSLATION_ENABLED = False
-    client = None
+def _get_client():
+    """The OpenAI client for translation, or None if DASHSCOPE_API_KEY is not set."""
+    global _client, _client_checked
+    with _client_lock:
+        if not _client_checked:
+            _client_checked = True
+            config = settings.get()
+            if not config.doc_translation_api_key:
+                print("Warning: DASHSCOPE_API_KEY environment variable not set. Translation will be skipped.")
+            else:
+                try:
+                    from openai import OpenAI
+                    _client = OpenAI(api_key=config.doc_translation_api_key, base_url=config.doc_translation_base_url)
+                except Exception as e:
+                    print(f"Error initializing OpenAI client for translation: {e}")
+        return _client
 
 
 def _translate_text(text, target_lang="Chinese"):
     """Translates text using the DashScope API with a specific domain style."""
-    if not TRANSLATION_ENABLED or not text or not client:
+    client = _get_client() if text else None
+    if not client:
         return "[Translation Skipped]"
 
     try:
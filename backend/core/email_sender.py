@@ -1,14 +1,10 @@
-import smtplib
 import os
 import io
 import zipfile
 import re
 import logging
 from datetime import datetime
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.application import MIMEApplication
-from dotenv import load_dotenv
+from core import settings
 
 # Basic email validation regex
 EMAIL_REGEX = '^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
@@ -18,12 +14,17 @@ def send_email(files_to_zip, total_papers, recipient_email=None, subject=None):
     Creates a zip file in memory and sends it to a specified or default recipient.
     Returns True if successful, False otherwise.
     """
-    load_dotenv()
+    # The email and smtplib (ssl) packages are imported here: only processes that send mail pay for them.
+    import smtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.application import MIMEApplication
 
-    sender_email = os.getenv("SENDER_EMAIL")
-    sender_password = os.getenv("SENDER_PASSWORD")
-    smtp_server = os.getenv("SMTP_SERVER")
-    smtp_port = os.getenv("SMTP_PORT")
+    config = settings.get()
+    sender_email = config.sender_email
+    sender_password = config.sender_password
+    smtp_server = config.smtp_server
+    smtp_port = config.smtp_port
 
     if not all([sender_email, sender_password, smtp_server, smtp_port]):
         logging.error("Email credentials not found in .env file. Please check SENDER_EMAIL, SENDER_PASSWORD, SMTP_SERVER, SMTP_PORT.")
@@ -34,8 +35,7 @@ def send_email(files_to_zip, total_papers, recipient_email=None, subject=None):
         recipients = [recipient_email]
         logging.info(f"Sending email to custom address: {recipient_email}")
     else:
-        recipient_emails_str = os.getenv("RECIPIENT_EMAILS", "")
-        recipients = [email.strip() for email in recipient_emails_str.split(',') if email.strip()]
+        recipients = list(config.recipient_emails)
         if not recipients:
             logging.error("No recipient email addresses configured in .env file or provided in the request.")
             return False
@@ -44,8 +44,7 @@ def send_email(files_to_zip, total_papers, recipient_email=None, subject=None):
     message = MIMEMultipart()
     message["From"] = sender_email
     message["To"] = ", ".join(recipients)
-    email_subject = os.getenv("EMAIL_SUBJECT", "ArXiv Daily Papers")
-    message["Subject"] = subject if subject else f"{email_subject} - {total_papers} new papers"
+    message["Subject"] = subject if subject else f"{config.email_subject} - {total_papers} new papers"
 
     body = f"Attached is your requested paper analysis." if total_papers == 1 else f"Attached are {total_papers} new papers from your arXiv subscriptions."
     message.attach(MIMEText(body, "plain"))
@@ -76,12 +75,12 @@ def send_email(files_to_zip, total_papers, recipient_email=None, subject=None):
 
     try:
         logging.info(f"Connecting to SMTP server: {smtp_server}:{smtp_port}")
-        if int(smtp_port) == 465:
-            with smtplib.SMTP_SSL(smtp_server, int(smtp_port)) as server:
+        if smtp_port == 465:
+            with smtplib.SMTP_SSL(smtp_server, smtp_port) as server:
                 server.login(sender_email, sender_password)
                 server.send_message(message)
         else:
-            with smtplib.SMTP(smtp_server, int(smtp_port)) as server:
+            with smtplib.SMTP(smtp_server, smtp_port) as server:
                 server.starttls()
                 server.login(sender_email, sender_password)
                 server.send_message(message)
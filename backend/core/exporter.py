@@ -0,0 +1,146 @@
+import io
+import os
+import re
+import json
+import time
+import logging
+import tarfile
+import zipfile
+from core import storage
+from core.analysis_manager import RESULTS_DIR, iter_stored_papers
+
+# Streams a zip or tar archive of stored analyses while it is being built.
+# Papers are selected lazily (iter_stored_papers) and each file is written and
+# handed to the consumer before the next one is read, so memory stays bounded by
+# the largest single file no matter how many papers are exported.
+#
+# Archive layout, one directory per paper:
+#   <short_id>/analysis.md
+#   <short_id>/metadata.json
+#   <short_id>/images/...      (only with include_images)
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'zip': ('application/zip', '.zip'),
+    'tar': ('application/x-tar', '.tar'),
+    'tar.gz': ('application/gzip', '.tar.gz'),
+}
+CHUNK_SIZE = 256 * 1024
+
+class _ChunkSink(io.RawIOBase):
+    """Non-seekable write target that buffers archive bytes until they are drained."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def archive_filename(fmt):
+    return f"arxiv_analyses_{time.strftime('%Y-%m-%d')}{FORMATS[fmt][1]}"
+
+def _paper_files(short_id, metadata, include_images):
+    """Yields (archive name, bytes or a file path) for one paper."""
+    paper_dir = os.path.join(RESULTS_DIR, short_id)
+    analysis = storage.read_text(os.path.join(paper_dir, 'analysis.md'))
+    if include_images:
+        # Point image links at the exported copies instead of the backend.
+        analysis = re.sub(r"\]\([^)\s]*/api/images/" + re.escape(short_id) + r"/", "](images/", analysis)
+    yield f"{short_id}/analysis.md", analysis.encode('utf-8')
+    yield f"{short_id}/metadata.json", json.dumps(metadata, ensure_ascii=False, indent=4).encode('utf-8')
+    if include_images:
+        images_dir = os.path.join(paper_dir, 'images')
+        if os.path.isdir(images_dir):
+            for filename in sorted(os.listdir(images_dir)):
+                path = os.path.join(images_dir, filename)
+                if os.path.isfile(path):
+                    yield f"{short_id}/images/{filename}", path
+
+def _iter_files(filters, include_images, stats):
+    for short_id, metadata in iter_stored_papers(filters):
+        if not storage.exists(os.path.join(RESULTS_DIR, short_id, 'analysis.md')):
+            continue
+        try:
+            files = list(_paper_files(short_id, metadata, include_images))
+        except Exception as e:
+            logger.error(f"Skipping {short_id} in export: {e}")
+            stats['skipped'] += 1
+            continue
+        stats['papers'] += 1
+        yield from files
+
+def _add_to_zip(archive, name, content):
+    if isinstance(content, bytes):
+        archive.writestr(name, content, compress_type=zipfile.ZIP_DEFLATED)
+        return
+    # Images are already compressed; copy them in chunks.
+    info = zipfile.ZipInfo.from_file(content, name)
+    info.compress_type = zipfile.ZIP_STORED
+    with open(content, 'rb') as src, archive.open(info, 'w') as dst:
+        while True:
+            chunk = src.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            dst.write(chunk)
+
+def _add_to_tar(archive, name, content):
+    if isinstance(content, bytes):
+        info = tarfile.TarInfo(name)
+        info.size = len(content)
+        info.mtime = int(time.time())
+        archive.addfile(info, io.BytesIO(content))
+    else:
+        archive.add(content, arcname=name)
+
+def stream_export(filters=None, fmt='zip', include_images=False, stats=None):
+    """
+    Yields the archive of the analyses matching `filters` (see iter_stored_papers)
+    as chunks of bytes. `stats`, if given, is filled with the paper counts as it goes.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    stats = stats if stats is not None else {}
+    stats.update(papers=0, skipped=0)
+    sink = _ChunkSink()
+
+    if fmt == 'zip':
+        archive = zipfile.ZipFile(sink, 'w', allowZip64=True)
+        add = _add_to_zip
+    else:
+        archive = tarfile.open(fileobj=sink, mode='w|gz' if fmt == 'tar.gz' else 'w|')
+        add = _add_to_tar
+
+    with archive:
+        for name, content in _iter_files(filters, include_images, stats):
+            add(archive, name, content)
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data
+    logger.info(f"Exported {stats['papers']} analyses ({stats['skipped']} skipped) as {fmt}.")
+
+def export_to_file(path, filters=None, fmt='zip', include_images=False):
+    """Writes the archive to `path` (or stdout for '-'). Returns the export stats."""
+    stats = {}
+    if path == '-':
+        out = os.fdopen(os.dup(1), 'wb')
+    else:
+        out = open(f"{path}.tmp", 'wb')
+    with out:
+        for chunk in stream_export(filters, fmt, include_images, stats):
+            out.write(chunk)
+    if path != '-':
+        os.replace(f"{path}.tmp", path)
+    return stats
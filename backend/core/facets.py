@@ -0,0 +1,222 @@
+import os
+import time
+import logging
+from contextlib import contextmanager
+from core import storage
+from core.db import get_connection, transaction
+from core.storage import STORAGE_DB_FILE
+
+# Facet index of the analysis warehouse, for browsing by category, publication month,
+# author, analysis status and prompt version without reading any metadata.json.
+# It is updated whenever an analysis is persisted, re-analyzed or evicted:
+#   * facet_papers holds one row per stored analysis (for listing and title search),
+#   * facet_values maps each paper to its facet values,
+#   * facet_counts keeps the unfiltered count of every facet value, so the landing
+#     view is a plain read; filtered counts join the matching papers to facet_values.
+
+FACETS = ('category', 'month', 'author', 'status', 'prompt_version')
+STATUS_ANALYZED = 'analyzed'
+STATUS_REANALYZED = 'reanalyzed'
+
+FACETS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS facet_papers (
+    short_id TEXT PRIMARY KEY,
+    entry_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    published TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_facet_papers_published ON facet_papers(published);
+CREATE TABLE IF NOT EXISTS facet_values (
+    short_id TEXT NOT NULL,
+    facet TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (short_id, facet, value)
+);
+CREATE INDEX IF NOT EXISTS idx_facet_values_lookup ON facet_values(facet, value, short_id);
+CREATE TABLE IF NOT EXISTS facet_counts (
+    facet TEXT NOT NULL,
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (facet, value)
+);
+CREATE TABLE IF NOT EXISTS facet_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+logger = logging.getLogger(__name__)
+
+def _db():
+    return get_connection(STORAGE_DB_FILE, FACETS_SCHEMA)
+
+def facet_values(metadata):
+    """The (facet, value) pairs of one stored analysis."""
+    values = {('category', category) for category in metadata.get('categories') or []}
+    values.update(('author', author) for author in metadata.get('authors') or [])
+    published = metadata.get('published') or ''
+    if len(published) >= 7:
+        values.add(('month', published[:7]))
+    values.add(('status', STATUS_REANALYZED if metadata.get('analysis_history') else STATUS_ANALYZED))
+    values.add(('prompt_version', metadata.get('prompt_version') or 'unversioned'))
+    return values
+
+def _remove(conn, short_id):
+    for row in conn.execute("SELECT facet, value FROM facet_values WHERE short_id = ?", (short_id,)).fetchall():
+        conn.execute("UPDATE facet_counts SET count = count - 1 WHERE facet = ? AND value = ?",
+                     (row['facet'], row['value']))
+    conn.execute("DELETE FROM facet_counts WHERE count <= 0")
+    conn.execute("DELETE FROM facet_values WHERE short_id = ?", (short_id,))
+    conn.execute("DELETE FROM facet_papers WHERE short_id = ?", (short_id,))
+
+def _insert(conn, short_id, metadata):
+    _remove(conn, short_id)
+    conn.execute(
+        "INSERT INTO facet_papers (short_id, entry_id, title, published, updated) VALUES (?, ?, ?, ?, ?)",
+        (short_id, metadata.get('entry_id', ''), metadata.get('title', ''), metadata.get('published', ''), time.time())
+    )
+    values = facet_values(metadata)
+    conn.executemany("INSERT INTO facet_values (short_id, facet, value) VALUES (?, ?, ?)",
+                     ((short_id, facet, value) for facet, value in values))
+    conn.executemany(
+        "INSERT INTO facet_counts (facet, value, count) VALUES (?, ?, 1) "
+        "ON CONFLICT(facet, value) DO UPDATE SET count = count + 1",
+        values
+    )
+
+def index_paper(short_id, metadata):
+    """Adds or replaces one stored analysis in the facet index."""
+    try:
+        conn = _db()
+        with transaction(conn):
+            _insert(conn, short_id, metadata)
+    except Exception as e:
+        logger.error(f"Could not update the facet index for {short_id}: {e}")
+
+def remove_paper(short_id):
+    """Drops one analysis from the facet index (e.g. when it is evicted)."""
+    try:
+        conn = _db()
+        with transaction(conn):
+            _remove(conn, short_id)
+    except Exception as e:
+        logger.error(f"Could not remove {short_id} from the facet index: {e}")
+
+def clear():
+    conn = _db()
+    with transaction(conn):
+        for table in ('facet_papers', 'facet_values', 'facet_counts', 'facet_meta'):
+            conn.execute(f"DELETE FROM {table}")
+
+def ensure_index(results_dir, batch_size=500):
+    """Builds the facet index once for a warehouse created before it existed."""
+    conn = _db()
+    if conn.execute("SELECT 1 FROM facet_meta WHERE key = 'index_built'").fetchone():
+        return
+    logger.info("Building facet index for the existing warehouse...")
+    short_ids = sorted(os.listdir(results_dir)) if os.path.exists(results_dir) else []
+    for start in range(0, len(short_ids), batch_size):
+        with transaction(conn):
+            for short_id in short_ids[start:start + batch_size]:
+                metadata_path = os.path.join(results_dir, short_id, 'metadata.json')
+                if not os.path.exists(metadata_path):
+                    continue
+                try:
+                    _insert(conn, short_id, storage.read_json(metadata_path))
+                except Exception as e:
+                    logger.error(f"Could not index {short_id}: {e}")
+    conn.execute("INSERT OR REPLACE INTO facet_meta (key, value) VALUES ('index_built', ?)", (str(time.time()),))
+
+def _filter_clause(filters, skip_facet=None):
+    """SQL condition on facet_papers (alias p) for the filters, leaving out `skip_facet`."""
+    clauses, params = [], []
+    for facet in FACETS:
+        values = filters.get(facet)
+        if not values or facet == skip_facet:
+            continue
+        # Values of one facet are alternatives; different facets must all match.
+        clauses.append(f"p.short_id IN (SELECT short_id FROM facet_values WHERE facet = ? "
+                       f"AND value IN ({','.join('?' for _ in values)}))")
+        params.extend([facet, *values])
+    query = (filters.get('query') or '').strip()
+    if query:
+        clauses.append("(p.title LIKE ? ESCAPE '\\' OR p.entry_id LIKE ? ESCAPE '\\')")
+        pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        params.extend([pattern, pattern])
+    return (" AND ".join(clauses) or "1"), params
+
+@contextmanager
+def _read_snapshot(conn):
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.execute("COMMIT")
+
+def _match(conn, where, params):
+    """Fills the connection's temporary facet_match table with the papers matching `where`."""
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS facet_match (short_id TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM facet_match")
+    return conn.execute(f"INSERT INTO facet_match (short_id) SELECT p.short_id FROM facet_papers p WHERE {where}",
+                        params).rowcount
+
+def _counts(conn, facet, limit, matched):
+    if not matched:
+        rows = conn.execute("SELECT value, count FROM facet_counts WHERE facet = ? "
+                            "ORDER BY count DESC, value LIMIT ?", (facet, limit)).fetchall()
+    else:
+        # CROSS JOIN keeps SQLite from scanning every value of the facet for a small match set.
+        rows = conn.execute(
+            "SELECT v.value AS value, COUNT(*) AS count FROM facet_match m "
+            "CROSS JOIN facet_values v ON v.short_id = m.short_id AND v.facet = ? "
+            "GROUP BY v.value ORDER BY count DESC, v.value LIMIT ?",
+            (facet, limit)
+        ).fetchall()
+    return [{"value": row['value'], "count": row['count']} for row in rows]
+
+def search(results_dir, filters=None, limit=20, page=1, per_page=50):
+    """
+    Facet counts and matching papers for `filters` (facet name -> list of values, plus
+    'query' for a title/entry id substring). Counts of each facet ignore that facet's own
+    filter, so the alternatives stay visible. At most `limit` values are returned per facet.
+    """
+    ensure_index(results_dir)
+    filters = filters or {}
+    page, per_page = max(1, page), max(1, per_page)
+    conn = _db()
+    counts = {}
+    # One read snapshot for the whole page; the temporary table needs no write lock.
+    with _read_snapshot(conn):
+        where, params = _filter_clause(filters)
+        if where == "1":
+            total = conn.execute("SELECT COUNT(*) FROM facet_papers").fetchone()[0]
+            papers = conn.execute(
+                "SELECT short_id, entry_id, title, published FROM facet_papers "
+                "ORDER BY published DESC LIMIT ? OFFSET ?", (per_page, (page - 1) * per_page)
+            ).fetchall()
+        else:
+            total = _match(conn, where, params)
+            papers = conn.execute(
+                "SELECT p.short_id, p.entry_id, p.title, p.published FROM facet_match m "
+                "JOIN facet_papers p ON p.short_id = m.short_id "
+                "ORDER BY p.published DESC LIMIT ? OFFSET ?", (per_page, (page - 1) * per_page)
+            ).fetchall()
+        # Facets without a filter of their own share the matching set; each filtered facet needs its own.
+        for facet in FACETS:
+            if not filters.get(facet):
+                counts[facet] = _counts(conn, facet, limit, where != "1")
+        for facet in FACETS:
+            if filters.get(facet):
+                facet_where, facet_params = _filter_clause(filters, skip_facet=facet)
+                if facet_where != "1":
+                    _match(conn, facet_where, facet_params)
+                counts[facet] = _counts(conn, facet, limit, facet_where != "1")
+
+    return {
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "facets": {facet: counts[facet] for facet in FACETS},
+        "papers": [dict(row) for row in papers],
+    }
@@ -1,51 +1,172 @@
 import os
 import json
+import threading
+from contextlib import contextmanager
+from core.paper_record import PaperRecord
 
-# The processed papers file is now a JSON file to store metadata.
-PROCESSED_PAPERS_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'processed_papers.json')
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of this process are serialized.
+    fcntl = None
 
-def load_processed_papers():
-    """Loads the dictionary of processed papers from the JSON archive file."""
+# The processed papers archive is a compacted JSON snapshot (the original
+# processed_papers.json format) plus an append-only journal of JSON lines.
+# Saving appends to the journal under a file lock; membership checks are answered
+# from an in-memory index that is refreshed from the journal tail. Once the journal
+# grows past JOURNAL_COMPACT_ENTRIES it is folded into a new snapshot atomically.
+# An existing processed_papers.json simply becomes the first snapshot.
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+PROCESSED_PAPERS_FILE = os.path.join(DATA_DIR, 'processed_papers.json')
+PROCESSED_PAPERS_JOURNAL = os.path.join(DATA_DIR, 'processed_papers.journal')
+PROCESSED_PAPERS_LOCK = os.path.join(DATA_DIR, 'processed_papers.lock')
+JOURNAL_COMPACT_ENTRIES = 500
+
+_thread_lock = threading.RLock()
+_index = {}
+_snapshot_identity = None
+_journal_offset = 0
+_journal_entries = 0
+
+@contextmanager
+def _file_lock():
+    """Serializes writers across threads and processes."""
+    with _thread_lock:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        with open(PROCESSED_PAPERS_LOCK, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _identity(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+def _load_snapshot():
     if not os.path.exists(PROCESSED_PAPERS_FILE):
         return {}
     try:
         with open(PROCESSED_PAPERS_FILE, "r", encoding='utf-8') as f:
             return json.load(f)
     except (json.JSONDecodeError, IOError):
-        # If file is empty or corrupt, return an empty dictionary
+        # If file is empty or corrupt, start from an empty snapshot
         return {}
 
+def _refresh():
+    """Brings the in-memory index up to date with the snapshot and the journal tail."""
+    global _index, _snapshot_identity, _journal_offset, _journal_entries
+    with _thread_lock:
+        for _ in range(3):
+            snapshot_identity = _identity(PROCESSED_PAPERS_FILE)
+            journal_size = os.path.getsize(PROCESSED_PAPERS_JOURNAL) if os.path.exists(PROCESSED_PAPERS_JOURNAL) else 0
+            if snapshot_identity != _snapshot_identity or journal_size < _journal_offset:
+                # First load, or another process compacted: rebuild from the new snapshot.
+                _index = _load_snapshot()
+                _snapshot_identity = snapshot_identity
+                _journal_offset = 0
+                _journal_entries = 0
+            if journal_size > _journal_offset:
+                with open(PROCESSED_PAPERS_JOURNAL, 'rb') as f:
+                    f.seek(_journal_offset)
+                    tail = f.read(journal_size - _journal_offset)
+                # A line still being written has no newline yet; it is picked up next time.
+                complete = tail[:tail.rfind(b'\n') + 1]
+                for line in complete.splitlines():
+                    try:
+                        paper = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    _index.setdefault(paper['entry_id'], paper)
+                    _journal_entries += 1
+                _journal_offset += len(complete)
+            # A compaction between the stat and the read would have replaced the snapshot.
+            if _identity(PROCESSED_PAPERS_FILE) == _snapshot_identity:
+                return
+
+def _compact():
+    """Folds the journal into a new snapshot. Must hold the file lock."""
+    global _snapshot_identity, _journal_offset, _journal_entries
+    tmp_path = f"{PROCESSED_PAPERS_FILE}.tmp"
+    with open(tmp_path, "w", encoding='utf-8') as f:
+        json.dump(_index, f, ensure_ascii=False, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    # Replace the snapshot before truncating the journal: a crash in between only
+    # leaves journal entries that are already in the snapshot.
+    os.replace(tmp_path, PROCESSED_PAPERS_FILE)
+    open(PROCESSED_PAPERS_JOURNAL, 'wb').close()
+    _snapshot_identity = _identity(PROCESSED_PAPERS_FILE)
+    _journal_offset = 0
+    _journal_entries = 0
+    print(f"Compacted the processed papers journal into a snapshot of {len(_index)} papers.")
+
+def is_processed(entry_id):
+    """O(1) membership check against the processed papers archive."""
+    _refresh()
+    return entry_id in _index
+
+def load_processed_papers():
+    """Returns a copy of the dictionary of processed papers (entry_id -> paper)."""
+    _refresh()
+    with _thread_lock:
+        return dict(_index)
+
 def save_processed_papers(papers):
-    """Adds new papers to the JSON archive, ensuring uniqueness by entry_id."""
+    """Adds new papers to the archive, ensuring uniqueness by entry_id."""
     if not isinstance(papers, list):
         papers = [papers]
 
-    # Load the existing database of papers
-    processed_papers_db = load_processed_papers()
-    
-    new_papers_added = 0
-    for paper in papers:
-        if not isinstance(paper, dict):
-            # This case should ideally not happen with the new flow
-            continue 
-
-        entry_id = paper.get('entry_id')
-        if not entry_id:
-            continue
-
-        # Add or update the paper in the database, ensuring no duplicates
-        if entry_id not in processed_papers_db:
-            processed_papers_db[entry_id] = paper
-            new_papers_added += 1
-
-    if new_papers_added == 0:
-        print("No new papers to save to the processed papers database.")
-        return
-
-    # Write the entire updated database back to the JSON file
-    try:
-        with open(PROCESSED_PAPERS_FILE, "w", encoding='utf-8') as f:
-            json.dump(processed_papers_db, f, ensure_ascii=False, indent=4)
-        print(f"Saved {new_papers_added} new papers to the processed papers database.")
-    except IOError as e:
-        print(f"Error saving processed papers database: {e}")
\ No newline at end of file
+    with _file_lock():
+        _refresh()
+        lines = []
+        for paper in papers:
+            if isinstance(paper, PaperRecord):
+                paper = paper.to_dict()
+            if not isinstance(paper, dict):
+                # This case should ideally not happen with the new flow
+                continue
+
+            entry_id = paper.get('entry_id')
+            if not entry_id or entry_id in _index:
+                continue
+            lines.append(json.dumps(paper, ensure_ascii=False))
+
+        if not lines:
+            print("No new papers to save to the processed papers database.")
+            return
+
+        try:
+            with open(PROCESSED_PAPERS_JOURNAL, 'a', encoding='utf-8') as f:
+                f.write("\n".join(lines) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            print(f"Saved {len(lines)} new papers to the processed papers database.")
+            _refresh()
+            if _journal_entries >= JOURNAL_COMPACT_ENTRIES:
+                _compact()
+        except IOError as e:
+            print(f"Error saving processed papers database: {e}")
+
+def compact_processed_papers():
+    """Folds the journal into the snapshot now (e.g. before a backup)."""
+    with _file_lock():
+        _refresh()
+        _compact()
+
+def clear_processed_papers():
+    """Deletes the archive (snapshot and journal)."""
+    global _index, _snapshot_identity, _journal_offset, _journal_entries
+    with _file_lock():
+        for path in (PROCESSED_PAPERS_FILE, PROCESSED_PAPERS_JOURNAL):
+            if os.path.exists(path):
+                os.remove(path)
+        _index = {}
+        _snapshot_identity = None
+        _journal_offset = 0
+        _journal_entries = 0
@@ -0,0 +1,110 @@
+import os
+import json
+import time
+import fcntl
+import hashlib
+from contextlib import contextmanager
+from core.db import DATA_DIR, get_connection
+
+# Per-paper stage checkpoints, so that work survives a backend restart and
+# re-submitted paper sets reuse finished stages. A requeued job (see
+# task_queue.requeue_stale) resumes each paper after its last completed stage.
+PIPELINE_DB_FILE = os.path.join(DATA_DIR, 'pipeline.sqlite3')
+CLAIMS_DIR = os.path.join(DATA_DIR, 'claims')
+CLAIM_POLL_SECONDS = 0.2
+
+# Per-paper stages in pipeline order.
+STAGE_DOWNLOADED = 'downloaded'
+STAGE_PARSED = 'parsed'
+STAGE_ANALYZED = 'analyzed'
+STAGE_PERSISTED = 'persisted'
+STAGES = [STAGE_DOWNLOADED, STAGE_PARSED, STAGE_ANALYZED, STAGE_PERSISTED]
+
+PIPELINE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS paper_stages (
+    entry_id TEXT PRIMARY KEY,
+    stage TEXT NOT NULL,
+    detail TEXT NOT NULL DEFAULT '{}',
+    updated REAL NOT NULL
+);
+"""
+
+def _db():
+    return get_connection(PIPELINE_DB_FILE, PIPELINE_SCHEMA)
+
+# --- Paper stage checkpoints ---
+
+def get_stage(entry_id):
+    """Returns (last completed stage, detail dict) for a paper, or (None, {})."""
+    row = _db().execute("SELECT stage, detail FROM paper_stages WHERE entry_id = ?", (entry_id,)).fetchone()
+    if row is None:
+        return None, {}
+    return row['stage'], json.loads(row['detail'])
+
+def mark_stage(entry_id, stage, detail=None):
+    """Records that a paper completed `stage`. Call only after the stage's artifacts are on disk."""
+    _db().execute(
+        "INSERT OR REPLACE INTO paper_stages (entry_id, stage, detail, updated) VALUES (?, ?, ?, ?)",
+        (entry_id, stage, json.dumps(detail or {}, ensure_ascii=False), time.time())
+    )
+
+def clear_stages(entry_id=None):
+    """Forgets the checkpoints of one paper, or of every paper."""
+    if entry_id is None:
+        _db().execute("DELETE FROM paper_stages")
+    else:
+        _db().execute("DELETE FROM paper_stages WHERE entry_id = ?", (entry_id,))
+
+# --- Paper claims ---
+# Prefetches, single and bulk analyses and re-analyses of one paper share its files
+# (source.pdf.tmp, the parse output, the draft), so only one of them runs the paper's
+# stages at a time, across threads and processes. A claim is an flock on a per-paper
+# lock file, released by the kernel if its holder dies. A caller that had to wait
+# re-reads the stage checkpoint and resumes after what the holder completed.
+
+def _claim_path(entry_id):
+    return os.path.join(CLAIMS_DIR, f"{entry_id.split('/')[-1]}.lock")
+
+def try_claim(entry_id):
+    """Claims a paper if no one else holds it. Returns the claim (see release()) or None."""
+    os.makedirs(CLAIMS_DIR, exist_ok=True)
+    f = open(_claim_path(entry_id), 'a')
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        return None
+    return f
+
+def release(claim):
+    fcntl.flock(claim.fileno(), fcntl.LOCK_UN)
+    claim.close()
+
+@contextmanager
+def claimed(entry_id, should_stop=None):
+    """
+    Holds the paper's claim for the block, waiting for it if needed. Yields True, or
+    False without the claim if `should_stop()` turned true while waiting.
+    """
+    claim = try_claim(entry_id)
+    while claim is None:
+        if should_stop and should_stop():
+            yield False
+            return
+        time.sleep(CLAIM_POLL_SECONDS)
+        claim = try_claim(entry_id)
+    try:
+        yield True
+    finally:
+        release(claim)
+
+# --- Job ids ---
+
+def make_job_id(kind, papers, extra=''):
+    """
+    Deterministic job id, so re-submitting the same paper set maps onto the same job
+    (e.g. its triage results). The jobs themselves live in core/task_queue.py.
+    """
+    entry_ids = sorted(p.get('entry_id', '') for p in papers)
+    digest = hashlib.sha256(json.dumps([kind, entry_ids, extra]).encode('utf-8')).hexdigest()
+    return f"{kind}-{digest[:16]}"
@@ -0,0 +1,101 @@
+import os
+import time
+import zlib
+import hashlib
+import logging
+from core.db import DATA_DIR, get_connection
+
+# Content-addressed cache of LLM responses.
+# Entries are keyed by (prompt template hash, model name, input hash), so editing
+# the prompt template or switching models invalidates old entries automatically.
+LLM_CACHE_FILE = os.path.join(DATA_DIR, 'llm_cache.sqlite3')
+
+LLM_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    prompt_hash TEXT NOT NULL,
+    model TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access);
+"""
+
+logger = logging.getLogger(__name__)
+
+def _db():
+    return get_connection(LLM_CACHE_FILE, LLM_CACHE_SCHEMA)
+
+def _enabled():
+    return os.getenv("LLM_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+
+def _max_bytes():
+    return int(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+def _sha256(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def make_key(prompt_template, model_name, input_text):
+    """Builds the cache key for a prompt template, model and input combination."""
+    prompt_hash = _sha256(prompt_template)
+    key = _sha256(f"{prompt_hash}\0{model_name}\0{_sha256(input_text)}")
+    return key, prompt_hash
+
+def get(key):
+    """Returns the cached response for a key, or None on a miss."""
+    if not _enabled():
+        return None
+    try:
+        conn = _db()
+        row = conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+        return zlib.decompress(row['value']).decode('utf-8')
+    except Exception as e:
+        logger.error(f"LLM cache lookup failed: {e}")
+        return None
+
+def put(key, prompt_hash, model_name, response_text):
+    """Stores a response compressed on disk and evicts least recently used entries over the cap."""
+    if not _enabled() or not response_text:
+        return
+    try:
+        value = zlib.compress(response_text.encode('utf-8'), 9)
+        now = time.time()
+        conn = _db()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, prompt_hash, model, value, size, created, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, prompt_hash, model_name, value, len(value), now, now)
+        )
+        _evict(conn)
+    except Exception as e:
+        logger.error(f"LLM cache store failed: {e}")
+
+def _evict(conn):
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    max_bytes = _max_bytes()
+    if total <= max_bytes:
+        return
+    # Evict down to 90% of the cap so that we do not evict on every insert.
+    target = int(max_bytes * 0.9)
+    evicted = 0
+    for row in conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC").fetchall():
+        if total <= target:
+            break
+        conn.execute("DELETE FROM responses WHERE key = ?", (row['key'],))
+        total -= row['size']
+        evicted += 1
+    logger.info(f"LLM cache evicted {evicted} entries (now {total} bytes).")
+
+def stats():
+    """Returns entry count and compressed size of the cache."""
+    row = _db().execute("SELECT COUNT(*) AS entries, COALESCE(SUM(size), 0) AS bytes FROM responses").fetchone()
+    return {"entries": row['entries'], "bytes": row['bytes'], "max_bytes": _max_bytes()}
+
+def clear():
+    """Removes every cached response."""
+    _db().execute("DELETE FROM responses")
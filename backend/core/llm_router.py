@@ -0,0 +1,241 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from core import aio
+from core.rate_limiter import get_governor, estimate_tokens, TransientLLMError
+
+# Routes chat completions over an ordered list of OpenAI-compatible providers.
+#   * Each provider has its own timeout budget (retries included).
+#   * If the current request is still running after `hedge_after` seconds, a hedged
+#     duplicate goes to the next provider; the first answer wins and the others are
+#     cancelled.
+#   * A provider that fails repeatedly trips a circuit breaker and is skipped until
+#     its cooldown has passed; one trial request then decides whether it recovers.
+#
+# Providers are configured per role ("analysis", "translation", "triage") with
+# LLM_<ROLE>_PROVIDERS: a JSON list, or the path of a JSON file, of objects like
+#   {"name": "dashscope", "base_url": "...", "api_key_env": "DASHSCOPE_ANALYSIS_API_KEY",
+#    "model": "qwen-plus", "timeout": 300, "hedge_after": 60}
+# Without it, the role's single DASHSCOPE_<ROLE>_* provider is used as before.
+#
+# Requests are coroutines on the I/O loop (see core/aio.py) and share its HTTP
+# connection pool; complete() is the synchronous entry point.
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and allows one trial after `cooldown` seconds."""
+
+    def __init__(self, failure_threshold=3, cooldown=60.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """True if a request may be sent now. In half-open state only one trial is let through."""
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def release_trial(self):
+        """Gives back a half-open trial whose outcome says nothing (cancelled or rejected request)."""
+        with self.lock:
+            if self.state == HALF_OPEN:
+                self.state = OPEN
+                self.opened_at = time.monotonic() - self.cooldown
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+class Provider:
+    def __init__(self, name, base_url, api_key, model, timeout, hedge_after):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv("LLM_CIRCUIT_FAILURES", "3")),
+            cooldown=float(os.getenv("LLM_CIRCUIT_COOLDOWN_SECONDS", "60")),
+        )
+        self._client = None
+
+    def client(self):
+        """The provider's AsyncOpenAI client on the shared HTTP client. Only usable on the I/O loop."""
+        if self._client is None:
+            # Imported on first use: the OpenAI SDK is slow to import and most processes
+            # (CLI runs, workers handling other job kinds) never call an LLM.
+            from openai import AsyncOpenAI
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0,
+                                       timeout=self.timeout, http_client=aio.http_client())
+        return self._client
+
+    def __repr__(self):
+        return f"Provider({self.name!r}, {self.model!r})"
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+def _load_provider_config(role):
+    raw = os.getenv(f"LLM_{role.upper()}_PROVIDERS", "").strip()
+    if raw:
+        if not raw.startswith('['):
+            with open(raw, 'r', encoding='utf-8') as f:
+                raw = f.read()
+        return json.loads(raw)
+    prefix = f"DASHSCOPE_{role.upper()}_"
+    if not all(os.getenv(prefix + key) for key in ("API_KEY", "BASE_URL", "MODEL")):
+        return []
+    return [{"name": "default", "base_url": os.getenv(prefix + "BASE_URL"),
+             "api_key_env": prefix + "API_KEY", "model": os.getenv(prefix + "MODEL")}]
+
+def get_providers(role):
+    """The ordered providers for a role (empty if nothing is configured)."""
+    with _providers_lock:
+        if role not in _providers:
+            default_timeout = float(os.getenv("LLM_REQUEST_TIMEOUT", "600"))
+            default_hedge = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "0"))
+            _providers[role] = [
+                Provider(
+                    name=entry.get("name", f"provider-{i + 1}"),
+                    base_url=entry["base_url"],
+                    api_key=entry.get("api_key") or os.getenv(entry.get("api_key_env", ""), ""),
+                    model=entry["model"],
+                    timeout=float(entry.get("timeout", default_timeout)),
+                    hedge_after=float(entry.get("hedge_after", default_hedge)),
+                )
+                for i, entry in enumerate(_load_provider_config(role))
+            ]
+        return _providers[role]
+
+def route_id(role):
+    """Identifies the configured models of a role, e.g. for cache keys ('qwen-plus|deepseek-v3')."""
+    return "|".join(provider.model for provider in get_providers(role))
+
+async def _request(provider, messages, kwargs):
+    """One request to `provider` under its API key's governor, within the provider's timeout budget."""
+    client = provider.client()
+    deadline = time.monotonic() + provider.timeout
+    estimated = sum(estimate_tokens(m['content']) for m in messages)
+
+    async def request_fn():
+        remaining = max(1.0, deadline - time.monotonic())
+        return await client.with_options(timeout=remaining).chat.completions.create(
+            model=provider.model, messages=messages, **kwargs)
+
+    return await get_governor(provider.api_key).call(request_fn, estimated_tokens=estimated, deadline=deadline)
+
+async def complete_routed_async(role, messages, **kwargs):
+    """
+    Sends a chat completion for `role`, hedging and failing over across its providers.
+    Returns (completion, provider) for the first successful completion; raises the last
+    error if every provider failed, or TransientLLMError if all of them are behind an
+    open circuit breaker.
+    """
+    providers = iter(get_providers(role))
+
+    def next_provider():
+        for provider in providers:
+            if provider.breaker.allow():
+                return provider
+            logger.info(f"Skipping LLM provider {provider.name}: circuit open.")
+        return None
+
+    # Request task -> provider. Tasks inherit the caller's priority class and label.
+    in_flight = {}
+
+    def launch(provider):
+        in_flight[asyncio.ensure_future(_request(provider, messages, kwargs))] = provider
+        return provider.hedge_after
+
+    provider = next_provider()
+    if provider is None:
+        raise TransientLLMError(f"No available LLM provider for '{role}' (all circuits open or none configured).")
+    hedge_after = launch(provider)
+    exhausted = False
+    last_error = None
+
+    try:
+        while in_flight:
+            wait = hedge_after if hedge_after > 0 and not exhausted else None
+            done, _ = await asyncio.wait(in_flight, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                hedge = next_provider()
+                if hedge is None:
+                    exhausted = True
+                    continue
+                logger.info(f"LLM request still running after {hedge_after:.0f}s; hedging to {hedge.name}.")
+                hedge_after = launch(hedge)
+                continue
+
+            for task in done:
+                provider = in_flight.pop(task)
+                error = task.exception()
+                if error is None:
+                    provider.breaker.record_success()
+                    return task.result(), provider
+                last_error = error
+                if isinstance(error, TransientLLMError):
+                    provider.breaker.record_failure()
+                else:
+                    # Terminal errors (e.g. a rejected request) are not the endpoint's fault.
+                    provider.breaker.release_trial()
+                logger.warning(f"LLM provider {provider.name} failed: {error}")
+            if not in_flight:
+                # Fail over right away instead of waiting for the hedge delay.
+                fallback = next_provider()
+                if fallback is None:
+                    break
+                hedge_after = launch(fallback)
+    finally:
+        # Losing hedges, or every request if the caller itself was cancelled.
+        for task, loser in in_flight.items():
+            task.cancel()
+            loser.breaker.release_trial()
+
+    raise last_error
+
+async def complete_async(role, messages, **kwargs):
+    """complete_routed_async() without the provider: returns the completion only."""
+    completion, _ = await complete_routed_async(role, messages, **kwargs)
+    return completion
+
+def complete_routed(role, messages, **kwargs):
+    """Synchronous complete_routed_async(), for callers outside the I/O loop."""
+    return aio.run(complete_routed_async(role, messages, **kwargs))
+
+def complete(role, messages, **kwargs):
+    """Synchronous complete_async(), for callers outside the I/O loop."""
+    return aio.run(complete_async(role, messages, **kwargs))
+
+def health():
+    """Circuit breaker state of every configured provider, by role."""
+    return {
+        role: [{"name": p.name, "model": p.model, "state": p.breaker.state, "failures": p.breaker.failures}
+               for p in providers]
+        for role, providers in _providers.items()
+    }
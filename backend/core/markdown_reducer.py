@@ -0,0 +1,192 @@
+import os
+import re
+import json
+import logging
+from core.rate_limiter import estimate_tokens
+
+# Reduces MinerU markdown before it is sent to the LLM: low-value sections
+# (references, acknowledgements, ...) are dropped, appendices are cut down to
+# their opening, and huge tables are collapsed. Figure references such as
+# ![](images/x.jpg) are always kept, because the analysis prompt places them
+# in its output and analysis_manager rewrites them into image URLs.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES = {
+    "enabled": True,
+    # Sections whose (normalised) heading starts with one of these are dropped. Keep the
+    # entries specific: "contributions" alone would also drop a paper's own contributions.
+    "drop_sections": [
+        "references", "bibliography", "acknowledgement", "acknowledgment", "funding",
+        "author contributions", "competing interests", "conflict of interest",
+        "ethics statement", "ethical statement", "broader impact", "reproducibility statement",
+        "neurips paper checklist", "data availability", "code availability",
+    ],
+    # Sections whose heading starts with one of these are cut to `summary_max_chars`.
+    "summarize_sections": ["appendix", "appendices", "supplementary", "supplemental"],
+    # Everything after the references section is treated as appendix material.
+    "summarize_after_references": True,
+    "summary_max_chars": 1200,
+    # Tables with more rows than this keep only their first rows.
+    "table_max_rows": 8,
+}
+
+HEADING_RE = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+IMAGE_RE = re.compile(r'!\[[^\]]*\]\(images/[^)]+\)')
+HTML_TABLE_RE = re.compile(r'<table\b.*?</table>', re.IGNORECASE | re.DOTALL)
+HTML_ROW_RE = re.compile(r'<tr\b.*?</tr>', re.IGNORECASE | re.DOTALL)
+# Leading section numbers like "7", "7.2.", "IV.", "A", "B.3"
+SECTION_NUMBER_RE = re.compile(r'^(?:[0-9]+|[IVXLC]+|[A-Z])(?:\.[0-9]+)*\.?\s+')
+
+def load_rules():
+    """Default rules, overridden by the JSON file named in INPUT_REDUCTION_RULES (if any)."""
+    rules = dict(DEFAULT_RULES)
+    rules_path = os.getenv("INPUT_REDUCTION_RULES")
+    if rules_path:
+        try:
+            with open(rules_path, 'r', encoding='utf-8') as f:
+                rules.update(json.load(f))
+        except (IOError, json.JSONDecodeError) as e:
+            logger.error(f"Could not load input reduction rules from {rules_path}: {e}")
+    if os.getenv("INPUT_REDUCTION_ENABLED", "true").lower() in ("0", "false", "no"):
+        rules["enabled"] = False
+    return rules
+
+def normalize_heading(title):
+    """'7.2 Acknowledgements:' -> 'acknowledgements'"""
+    title = re.sub(r'[*_`]', '', title).strip()
+    title = SECTION_NUMBER_RE.sub('', title)
+    return re.sub(r'[^\w\s]', '', title).strip().lower()
+
+def split_sections(markdown_content):
+    """
+    Splits markdown into sections at headings.
+    Returns a list of dicts with 'heading' (None for the preamble), 'title' (normalised) and 'body'.
+    """
+    sections = [{"heading": None, "title": "", "lines": []}]
+    for line in markdown_content.split('\n'):
+        match = HEADING_RE.match(line)
+        if match:
+            sections.append({"heading": line, "title": normalize_heading(match.group(2)), "lines": []})
+        else:
+            sections[-1]["lines"].append(line)
+    for section in sections:
+        section["body"] = "\n".join(section.pop("lines"))
+    return sections
+
+def join_sections(sections):
+    parts = []
+    for section in sections:
+        if section["heading"] is not None:
+            parts.append(section["heading"])
+        if section["body"]:
+            parts.append(section["body"])
+    return "\n".join(parts)
+
+def _matches(title, prefixes):
+    return any(title.startswith(prefix) for prefix in prefixes)
+
+def _collapse_tables(text, max_rows):
+    """Keeps the first `max_rows` rows of long HTML and pipe tables. Returns (text, tables_collapsed)."""
+    collapsed = 0
+
+    def collapse_html(match):
+        nonlocal collapsed
+        table = match.group(0)
+        rows = HTML_ROW_RE.findall(table)
+        if len(rows) <= max_rows:
+            return table
+        collapsed += 1
+        return f"<table>{''.join(rows[:max_rows])}</table>\n[Table truncated: {len(rows) - max_rows} more rows omitted]"
+
+    text = HTML_TABLE_RE.sub(collapse_html, text)
+
+    out_lines, table_lines = [], []
+    def flush_pipe_table():
+        nonlocal collapsed
+        # Header + separator + max_rows data rows
+        if len(table_lines) > max_rows + 2:
+            collapsed += 1
+            out_lines.extend(table_lines[:max_rows + 2])
+            out_lines.append(f"[Table truncated: {len(table_lines) - max_rows - 2} more rows omitted]")
+        else:
+            out_lines.extend(table_lines)
+        table_lines.clear()
+
+    for line in text.split('\n'):
+        if line.lstrip().startswith('|'):
+            table_lines.append(line)
+            continue
+        if table_lines:
+            flush_pipe_table()
+        out_lines.append(line)
+    if table_lines:
+        flush_pipe_table()
+    return "\n".join(out_lines), collapsed
+
+def _summarize(body, max_chars):
+    """Keeps the opening of a section (cut at a paragraph boundary where possible)."""
+    if len(body) <= max_chars:
+        return body
+    cut = body.rfind('\n\n', 0, max_chars)
+    if cut < max_chars // 2:
+        cut = max_chars
+    return body[:cut].rstrip() + "\n\n[Section truncated for analysis]"
+
+def reduce_markdown(markdown_content, rules=None):
+    """
+    Applies the reduction rules to a paper's markdown.
+    Returns (reduced_markdown, report) where the report lists what was removed and
+    the estimated prompt tokens saved.
+    """
+    rules = rules or load_rules()
+    tokens_before = estimate_tokens(markdown_content)
+    report = {
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_before,
+        "tokens_saved": 0,
+        "dropped_sections": [],
+        "summarized_sections": [],
+        "tables_collapsed": 0,
+    }
+    if not rules.get("enabled", True) or not markdown_content:
+        return markdown_content, report
+
+    kept_sections = []
+    orphaned_figures = []
+    after_references = False
+    for section in split_sections(markdown_content):
+        title = section["title"]
+        is_references = _matches(title, ("references", "bibliography"))
+
+        if section["heading"] is not None and _matches(title, rules["drop_sections"]):
+            report["dropped_sections"].append(title)
+            orphaned_figures.extend(IMAGE_RE.findall(section["body"]))
+            after_references = after_references or is_references
+            continue
+
+        summarize = section["heading"] is not None and (
+            _matches(title, rules["summarize_sections"]) or
+            (after_references and rules.get("summarize_after_references", True))
+        )
+        if summarize:
+            summarized = _summarize(section["body"], rules["summary_max_chars"])
+            if summarized != section["body"]:
+                report["summarized_sections"].append(title)
+                kept_figures = set(IMAGE_RE.findall(summarized))
+                orphaned_figures.extend(f for f in IMAGE_RE.findall(section["body"]) if f not in kept_figures)
+                section = dict(section, body=summarized)
+
+        body, collapsed = _collapse_tables(section["body"], rules["table_max_rows"])
+        report["tables_collapsed"] += collapsed
+        kept_sections.append(dict(section, body=body))
+        after_references = after_references or is_references
+
+    reduced = join_sections(kept_sections)
+    if orphaned_figures:
+        # Keep figure references from removed text so the analysis can still place them.
+        reduced += "\n\n# Other Figures\n" + "\n".join(dict.fromkeys(orphaned_figures))
+
+    report["tokens_after"] = estimate_tokens(reduced)
+    report["tokens_saved"] = tokens_before - report["tokens_after"]
+    return reduced, report
@@ -0,0 +1,56 @@
+import sys
+import json
+
+# Compact in-memory representation of a fetched paper. Author and category strings
+# repeat across thousands of papers, so they are interned, and each paper exists as
+# one record no matter how many categories list it.
+
+FIELDS = ('entry_id', 'title', 'summary', 'authors', 'pdf_url', 'published', 'categories')
+
+class PaperRecord:
+    """
+    An immutable fetched paper. Reads like the paper dicts used elsewhere
+    (paper['title'], paper.get('summary')) and converts with to_dict() / to_json().
+    """
+    __slots__ = FIELDS + ('_json',)
+
+    def __init__(self, entry_id, title, summary, authors, pdf_url, published, categories):
+        setattr_ = object.__setattr__
+        setattr_(self, 'entry_id', entry_id)
+        setattr_(self, 'title', title)
+        setattr_(self, 'summary', summary)
+        setattr_(self, 'authors', tuple(sys.intern(name) for name in authors))
+        setattr_(self, 'pdf_url', pdf_url)
+        setattr_(self, 'published', sys.intern(published))
+        setattr_(self, 'categories', tuple(sys.intern(category) for category in categories))
+        setattr_(self, '_json', None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PaperRecord is immutable")
+
+    def __getitem__(self, key):
+        if key not in FIELDS:
+            raise KeyError(key)
+        value = getattr(self, key)
+        return list(value) if isinstance(value, tuple) else value
+
+    def __contains__(self, key):
+        return key in FIELDS
+
+    def get(self, key, default=None):
+        return self[key] if key in FIELDS else default
+
+    def to_dict(self):
+        return {field: self[field] for field in FIELDS}
+
+    def copy(self):
+        return self.to_dict()
+
+    def to_json(self):
+        """The record serialized once; later calls reuse the same string."""
+        if self._json is None:
+            object.__setattr__(self, '_json', json.dumps(self.to_dict(), ensure_ascii=False))
+        return self._json
+
+    def __repr__(self):
+        return f"PaperRecord({self.entry_id!r})"
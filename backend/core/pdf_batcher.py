@@ -0,0 +1,183 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from core import aio, scheduler
+
+# Coalesces PDF parse requests into batched calls to the miner-u parser. The parser
+# accepts a list of `files` and returns a `results` dict keyed per file, so papers
+# parsed around the same time (e.g. by a bulk job) share one request and one
+# model-load instead of paying the per-request overhead each.
+# Interactive submissions (see core/scheduler.py) skip the batching window and go
+# to the front of the next batch, so a single paper never waits behind bulk files.
+# Up to `max_batches` batches are in flight at once, each sent by its own dispatcher
+# thread, so an interactive batch is not held back by a bulk batch still at the parser.
+
+logger = logging.getLogger(__name__)
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+class _PendingFile:
+    def __init__(self, pdf_path, upload_name, size):
+        self.pdf_path = pdf_path
+        self.upload_name = upload_name
+        self.size = size
+        self.future = Future()
+        self.interactive = scheduler.current_class() == scheduler.INTERACTIVE
+
+class ParseBatcher:
+    """
+    Collects submitted PDFs for up to `window_seconds` (or until `max_files` /
+    `max_bytes` is reached) and sends them to the parser in one request, with at
+    most `max_batches` requests in flight.
+    """
+
+    def __init__(self, parser_url, window_seconds=1.0, max_files=4, max_bytes=64 * 1024 * 1024, max_batches=2):
+        self.parser_url = parser_url
+        self.window_seconds = window_seconds
+        self.max_files = max(1, max_files)
+        self.max_bytes = max_bytes
+        self._pending = []
+        self._condition = threading.Condition()
+        self._dispatchers = [threading.Thread(target=self._dispatch_loop, daemon=True)
+                             for _ in range(max(1, max_batches))]
+        for dispatcher in self._dispatchers:
+            dispatcher.start()
+
+    def submit(self, pdf_path, upload_name, size=None):
+        """
+        Queues a PDF for parsing. `upload_name` must be unique within the batch
+        (e.g. '<short id>.pdf'). `size` is the file's size in bytes, read from disk
+        if not given. Returns a Future resolving to the file's result dict.
+        """
+        item = _PendingFile(pdf_path, upload_name, os.path.getsize(pdf_path) if size is None else size)
+        with self._condition:
+            if item.interactive:
+                position = sum(1 for pending in self._pending if pending.interactive)
+                self._pending.insert(position, item)
+            else:
+                self._pending.append(item)
+            self._condition.notify()
+        return item.future
+
+    def _batch_is_full(self):
+        return (len(self._pending) >= self.max_files or
+                sum(item.size for item in self._pending) >= self.max_bytes)
+
+    def _take_batch(self):
+        """
+        Pops the next batch: as many files as fit in the limits. Files whose caller
+        gave up waiting are dropped; the others can no longer be cancelled.
+        """
+        batch, batch_bytes = [], 0
+        while self._pending and len(batch) < self.max_files:
+            item = self._pending[0]
+            if batch and batch_bytes + item.size > self.max_bytes:
+                break
+            self._pending.pop(0)
+            if not item.future.set_running_or_notify_cancel():
+                continue
+            batch.append(item)
+            batch_bytes += item.size
+        return batch
+
+    def _dispatch_loop(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                # Wait for more files to join the batch, but no longer than the window
+                # (another dispatcher may take the files meanwhile).
+                deadline = time.monotonic() + self.window_seconds
+                while self._pending and not self._batch_is_full() and not self._pending[0].interactive:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = self._take_batch()
+            if not batch:
+                continue
+            try:
+                self._send(batch)
+            except Exception as e:
+                # The dispatchers serve every later file too, so one batch must not end one.
+                logger.error(f"Could not complete a batch of {len(batch)} PDFs: {e}")
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+
+    def _post(self, batch):
+        # The request goes through the shared HTTP client on the I/O loop.
+        return aio.run(self._post_async(batch))
+
+    async def _post_async(self, batch):
+        # The files are read off the loop; the batch is bounded by max_bytes.
+        contents = await aio.to_thread(_read_files, [item.pdf_path for item in batch])
+        files = [('files', (item.upload_name, content, 'application/pdf')) for item, content in zip(batch, contents)]
+        data = {'return_md': 'true', 'return_images': 'true'}
+        response = await aio.http_client().post(self.parser_url, files=files, data=data, timeout=parser_timeout())
+        response.raise_for_status()
+        return response.json().get('results', {})
+
+    def _send(self, batch):
+        try:
+            started = time.monotonic()
+            results = self._post(batch)
+            logger.info(f"Parsed batch of {len(batch)} PDFs in {time.monotonic() - started:.1f}s.")
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0].future.set_exception(e)
+                return
+            # One bad PDF should not fail its neighbours: retry the files one by one.
+            logger.warning(f"Batched parse of {len(batch)} PDFs failed ({e}); retrying individually.")
+            for item in batch:
+                self._send([item])
+            return
+
+        for item in batch:
+            stem = os.path.splitext(item.upload_name)[0]
+            result = results.get(stem) or results.get(item.upload_name)
+            if result is None and len(batch) == 1 and results:
+                # Single-file request: accept whatever key the parser used.
+                result = next(iter(results.values()))
+            if result is None:
+                item.future.set_exception(RuntimeError(f"Parser returned no result for {item.upload_name}"))
+            else:
+                item.future.set_result(result)
+
+def _read_files(paths):
+    contents = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            contents.append(f.read())
+    return contents
+
+def parser_timeout():
+    """Seconds a batch may take at the parser (it parses every file before answering)."""
+    return float(os.getenv("PDF_PARSER_TIMEOUT_SECONDS", "900"))
+
+def get_batcher(parser_url):
+    """Returns the process-wide batcher for a parser URL, configured from the environment."""
+    with _batchers_lock:
+        if parser_url not in _batchers:
+            _batchers[parser_url] = ParseBatcher(
+                parser_url,
+                window_seconds=float(os.getenv("PDF_PARSER_BATCH_WINDOW_SECONDS", "1.0")),
+                max_files=int(os.getenv("PDF_PARSER_BATCH_MAX_FILES", "4")),
+                max_bytes=int(float(os.getenv("PDF_PARSER_BATCH_MAX_MB", "64")) * 1024 * 1024),
+                max_batches=int(os.getenv("PDF_PARSER_MAX_CONCURRENT_BATCHES", "2")),
+            )
+        return _batchers[parser_url]
+
+def parse_pdf(parser_url, pdf_path, upload_name):
+    """Parses one PDF through the shared batcher and returns the parser's result dict for it."""
+    return get_batcher(parser_url).submit(pdf_path, upload_name).result()
+
+async def parse_pdf_async(parser_url, pdf_path, upload_name):
+    """parse_pdf() for coroutines: waits for the batch without holding a thread."""
+    # The file's size is read off the loop, like every other file access.
+    size = await aio.to_thread(os.path.getsize, pdf_path)
+    return await asyncio.wrap_future(get_batcher(parser_url).submit(pdf_path, upload_name, size))
@@ -0,0 +1,123 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from core import scheduler, state_store, task_queue
+from core.analysis_manager import RESULTS_DIR, prefetch_paper
+
+# Speculative download + parse of the papers a user is most likely to analyze, run
+# while they review the fetch results. Every fetch bumps a generation counter; a
+# prefetch job belongs to one generation and stops as soon as a newer fetch starts.
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = 'fetch_generation'
+STATUS_KEY = 'prefetch_status'
+
+def enabled():
+    return os.getenv("PREFETCH_ENABLED", "false").lower() in ("1", "true", "yes")
+
+def current_generation():
+    return state_store.get_value(GENERATION_KEY, 0)
+
+def cancel():
+    """Invalidates any running or queued prefetch. Called when a new fetch starts."""
+    generation = state_store.increment_value(GENERATION_KEY)
+    status = state_store.get_value(STATUS_KEY)
+    if status and status.get('status') in ('queued', 'running'):
+        status.update(status='cancelled')
+        state_store.set_value(STATUS_KEY, status)
+    return generation
+
+def schedule(keywords=None):
+    """Enqueues a prefetch job for the current fetch results if prefetching is enabled."""
+    if not enabled():
+        return None
+    generation = current_generation()
+    state_store.set_value(STATUS_KEY, {"status": "queued", "generation": generation})
+    return task_queue.enqueue('prefetch', {'generation': generation, 'keywords': keywords or []})
+
+def rank_papers(papers, keywords=None):
+    """
+    Orders papers by how likely the user is to analyze them: keyword hits in the title
+    count double those in the abstract; ties keep arXiv's ranking.
+    """
+    keywords = [kw.lower() for kw in (keywords or []) if kw]
+    if not keywords:
+        return list(papers)
+
+    def score(paper):
+        title = paper.get('title', '').lower()
+        abstract = paper.get('summary', '').lower()
+        return sum(2 * (kw in title) + (kw in abstract) for kw in keywords)
+
+    return sorted(papers, key=score, reverse=True)
+
+def _dir_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def run_prefetch(generation, keywords=None):
+    """
+    Prefetches the top PREFETCH_MAX_PAPERS results, at most PREFETCH_CONCURRENCY at a
+    time, until PREFETCH_MAX_DISK_MB of new files were written or the fetch is superseded.
+    """
+    if generation != current_generation():
+        logger.info(f"Skipping prefetch for superseded fetch generation {generation}.")
+        return
+
+    max_papers = int(os.getenv("PREFETCH_MAX_PAPERS", "10"))
+    concurrency = max(1, int(os.getenv("PREFETCH_CONCURRENCY", "2")))
+    max_disk_bytes = float(os.getenv("PREFETCH_MAX_DISK_MB", "500")) * 1024 * 1024
+
+    papers = state_store.get_results_page(0, state_store.count_results())
+    candidates = rank_papers(papers, keywords)[:max_papers]
+    status = {
+        "status": "running", "generation": generation, "total": len(candidates),
+        "prefetched": 0, "ready": 0, "failed": 0, "disk_bytes": 0, "started": time.time(),
+    }
+    state_store.set_value(STATUS_KEY, status)
+    lock = threading.Lock()
+
+    def should_stop():
+        return generation != current_generation() or status["disk_bytes"] >= max_disk_bytes
+
+    def prefetch_one(paper):
+        if should_stop():
+            return
+        short_id = paper['entry_id'].split('/')[-1]
+        paper_dir = os.path.join(RESULTS_DIR, short_id)
+        bytes_before = _dir_bytes(paper_dir)
+        with scheduler.context(scheduler.BACKGROUND, short_id):
+            outcome = prefetch_paper(paper, logger, should_stop)
+        with lock:
+            status["disk_bytes"] += max(0, _dir_bytes(paper_dir) - bytes_before)
+            if outcome in ('prefetched', 'ready', 'failed'):
+                status[outcome] += 1
+            if generation == current_generation():
+                state_store.set_value(STATUS_KEY, status)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(prefetch_one, candidates))
+
+    if generation != current_generation():
+        status["status"] = "cancelled"
+    elif status["disk_bytes"] >= max_disk_bytes:
+        status["status"] = "budget_exhausted"
+    else:
+        status["status"] = "done"
+    status["finished"] = time.time()
+    if generation == current_generation():
+        state_store.set_value(STATUS_KEY, status)
+    logger.info(f"Prefetch for generation {generation} {status['status']}: "
+                f"{status['prefetched']} prefetched, {status['ready']} already ready, {status['failed']} failed.")
+
+def get_status():
+    return state_store.get_value(STATUS_KEY, {"status": "disabled" if not enabled() else "idle"})
@@ -0,0 +1,178 @@
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import cProfile
+import logging
+import contextvars
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from core import aio, scheduler
+
+# Opt-in profiling of single requests and pipeline jobs. A capture runs cProfile on
+# the calling thread and, alongside it, samples the stacks of that thread and every
+# thread it starts (e.g. the bulk-analysis pool), so work fanned out to other
+# threads still shows up. The I/O loop and its blocking pool (see core/aio.py) run
+# work of every caller, so their stacks are only sampled while they run a task or
+# call made within the capture, and are rooted at that work's label. Each capture is stored under data/profiles as:
+#   <name>.prof    cProfile stats (pstats / snakeviz)
+#   <name>.folded  sampled stacks in collapsed format (flamegraph.pl, speedscope)
+#   <name>.json    metadata listed by /api/profiles
+# Nothing is installed or sampled unless PROFILING_ENABLED is set.
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILES_DIR = os.path.join(BACKEND_DIR, '..', 'data', 'profiles')
+PROFILE_FILE_RE = re.compile(r'^[\w.-]+\.(prof|folded|json)$')
+
+logger = logging.getLogger(__name__)
+
+_sampler_idents = set()
+# The capture active in the calling thread; aio.run() and aio.to_thread() carry it along.
+_current_capture = contextvars.ContextVar('profile_capture', default=None)
+
+def enabled():
+    return os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+
+def requested(value):
+    """True if a header, query or job flag value asks for a profile."""
+    return str(value).lower() in ("1", "true", "yes")
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _fold(frame):
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+class Capture:
+    """One profiling capture. Use via capture() or start()/stop()."""
+
+    def __init__(self, label, kind='manual'):
+        self.label = label
+        self.kind = kind
+        slug = re.sub(r'[^\w.-]+', '-', label).strip('-')[:60]
+        self.name = f"{time.strftime('%Y%m%d-%H%M%S')}-{kind}-{slug}-{uuid.uuid4().hex[:6]}"
+        self.interval = float(os.getenv("PROFILING_SAMPLE_INTERVAL_MS", "5")) / 1000
+        self._samples = Counter()
+        self._stop_event = threading.Event()
+        self._profile = None
+
+    def start(self):
+        self.started = time.time()
+        self._owner = threading.get_ident()
+        # Threads that already exist belong to someone else; threads started from now on are ours.
+        self._foreign = {t.ident for t in threading.enumerate()} - {self._owner}
+        self._token = _current_capture.set(self)
+        self._sampler = threading.Thread(target=self._sample_loop, daemon=True, name='profile-sampler')
+        self._sampler.start()
+        self._profile = cProfile.Profile()
+        try:
+            self._profile.enable()
+        except ValueError:
+            # Another profiler is already active on this thread; keep the sampled stacks only.
+            self._profile = None
+        return self
+
+    def _sample_loop(self):
+        _sampler_idents.add(threading.get_ident())
+        try:
+            while not self._stop_event.wait(self.interval):
+                io_idents = {t.ident for t in threading.enumerate() if aio.is_io_thread(t)}
+                for ident, frame in sys._current_frames().items():
+                    if ident in _sampler_idents:
+                        continue
+                    if ident in io_idents:
+                        stack = self._io_stack(frame)
+                        if stack is not None:
+                            self._samples[stack] += 1
+                    elif ident not in self._foreign:
+                        self._samples[_fold(frame)] += 1
+        finally:
+            _sampler_idents.discard(threading.get_ident())
+
+    def _io_stack(self, frame):
+        context = aio.context_of(frame)
+        if context is None or context.get(_current_capture) is not self:
+            return None
+        label = scheduler.label_in(context)
+        return f"[{label}];{_fold(frame)}" if label is not None else _fold(frame)
+
+    def stop(self):
+        if self._profile is not None:
+            self._profile.disable()
+        try:
+            _current_capture.reset(self._token)
+        except ValueError:
+            # Stopped from another context than the one it was started in.
+            _current_capture.set(None)
+        self._stop_event.set()
+        self._sampler.join()
+        self.duration = time.time() - self.started
+        try:
+            self._save()
+        except Exception as e:
+            logger.error(f"Could not save profile {self.name}: {e}")
+
+    def _save(self):
+        os.makedirs(PROFILES_DIR, exist_ok=True)
+        base = os.path.join(PROFILES_DIR, self.name)
+        files = []
+        if self._profile is not None:
+            self._profile.dump_stats(base + '.prof')
+            files.append(self.name + '.prof')
+        with open(base + '.folded', 'w', encoding='utf-8') as f:
+            for stack, count in self._samples.most_common():
+                f.write(f"{stack} {count}\n")
+        files.append(self.name + '.folded')
+        metadata = {
+            "name": self.name,
+            "label": self.label,
+            "kind": self.kind,
+            "started": self.started,
+            "duration_seconds": round(self.duration, 4),
+            "samples": sum(self._samples.values()),
+            "sample_interval_ms": self.interval * 1000,
+            "files": files,
+        }
+        with open(base + '.json', 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=4)
+        logger.info(f"Saved profile {self.name} ({metadata['duration_seconds']}s, {metadata['samples']} samples).")
+        _prune()
+
+@contextmanager
+def capture(label, kind='manual'):
+    """Profiles the enclosed block and saves the capture when it exits."""
+    current = Capture(label, kind).start()
+    try:
+        yield current
+    finally:
+        current.stop()
+
+def list_profiles():
+    """Metadata of stored captures, newest first."""
+    if not os.path.isdir(PROFILES_DIR):
+        return []
+    profiles = []
+    for filename in os.listdir(PROFILES_DIR):
+        if filename.endswith('.json'):
+            try:
+                with open(os.path.join(PROFILES_DIR, filename), 'r', encoding='utf-8') as f:
+                    profiles.append(json.load(f))
+            except (IOError, json.JSONDecodeError):
+                continue
+    return sorted(profiles, key=lambda p: p.get('started', 0), reverse=True)
+
+def _prune():
+    """Keeps only the newest PROFILING_MAX_CAPTURES captures."""
+    max_captures = int(os.getenv("PROFILING_MAX_CAPTURES", "50"))
+    for profile in list_profiles()[max_captures:]:
+        for filename in profile.get('files', []) + [profile['name'] + '.json']:
+            path = os.path.join(PROFILES_DIR, filename)
+            if os.path.exists(path):
+                os.remove(path)
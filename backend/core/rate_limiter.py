@@ -0,0 +1,240 @@
+import os
+import re
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import threading
+from core.scheduler import PriorityGate
+
+# Client-side governor for the OpenAI-compatible LLM endpoints.
+# One governor exists per API key and combines:
+#   * token buckets for requests/minute and tokens/minute,
+#   * AIMD concurrency control that halves on 429/5xx and grows slowly on success,
+#     handing free slots to waiters by priority class (see core/scheduler.py),
+#   * a shared cooldown honouring Retry-After,
+#   * jittered exponential backoff for transient failures.
+
+logger = logging.getLogger(__name__)
+
+TRANSIENT_STATUS_CODES = {408, 409, 425, 429}
+TRANSIENT_EXCEPTION_NAMES = {
+    'APITimeoutError', 'APIConnectionError', 'Timeout', 'ReadTimeout',
+    'ConnectTimeout', 'ConnectionError', 'RemoteProtocolError',
+}
+
+class TransientLLMError(Exception):
+    """Raised when a request kept failing with retryable errors (throttling, 5xx, timeouts)."""
+
+class TerminalLLMError(Exception):
+    """Raised when a request failed with an error that retrying cannot fix."""
+
+def estimate_tokens(text):
+    """Cheap token estimate: one token per CJK character, roughly four characters per token otherwise."""
+    if not text:
+        return 0
+    cjk_chars = len(re.findall(r'[\u3000-\u9fff\uac00-\ud7af\uff00-\uffef]', text))
+    return cjk_chars + (len(text) - cjk_chars) // 4 + 1
+
+class TokenBucket:
+    """A thread-safe token bucket refilled continuously at `rate_per_minute`."""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate_per_second)
+        self.updated = now
+
+    def _take(self, amount):
+        """Takes `amount` tokens if available (returns 0), else returns the seconds until they are."""
+        if self.rate_per_second <= 0:
+            return 0.0
+        amount = min(amount, self.capacity)
+        with self.lock:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            return (amount - self.tokens) / self.rate_per_second
+
+    async def acquire_async(self, amount=1):
+        """Waits until `amount` tokens are available and takes them."""
+        while True:
+            wait = self._take(amount)
+            if wait <= 0:
+                return
+            await asyncio.sleep(min(wait, 5.0))
+
+    def adjust(self, delta):
+        """Returns (positive) or charges (negative) tokens once the real cost is known."""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + delta)
+
+class AdaptiveConcurrency(PriorityGate):
+    """AIMD concurrency limit: +1 per window of successes, halved on throttling. Waiters are served by priority class."""
+
+    def __init__(self, initial, minimum=1, maximum=None):
+        super().__init__('llm', initial)
+        self.minimum = minimum
+        self.maximum = maximum if maximum is not None else initial
+
+    def on_success(self):
+        with self.condition:
+            self.limit = min(self.maximum, self.limit + 1.0 / max(self.limit, 1.0))
+            self._notify()
+
+    def on_throttle(self):
+        with self.condition:
+            self.limit = max(self.minimum, self.limit / 2.0)
+
+def _retry_after_seconds(exc):
+    response = getattr(exc, 'response', None)
+    headers = getattr(response, 'headers', None) or getattr(exc, 'headers', None)
+    if not headers:
+        return None
+    retry_after_ms = headers.get('retry-after-ms')
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000.0
+        except ValueError:
+            pass
+    retry_after = headers.get('retry-after')
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    # An HTTP date; email.utils is only imported for this rare form.
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def classify_error(exc):
+    """Returns (is_transient, retry_after_seconds) for an exception raised by an LLM request."""
+    status = getattr(exc, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(exc, 'response', None), 'status_code', None)
+    if status is None and isinstance(getattr(exc, 'code', None), int):
+        # urllib.error.HTTPError
+        status = exc.code
+    if status is not None:
+        transient = status in TRANSIENT_STATUS_CODES or status >= 500
+        return transient, _retry_after_seconds(exc) if transient else None
+    if isinstance(exc, (TimeoutError, ConnectionError)) or type(exc).__name__ in TRANSIENT_EXCEPTION_NAMES:
+        return True, None
+    return False, None
+
+class Governor:
+    """Shared rate and concurrency governor for every request made with one API key."""
+
+    def __init__(self, requests_per_minute, tokens_per_minute, max_concurrency, max_retries,
+                 backoff_base=1.0, backoff_cap=60.0):
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.concurrency = AdaptiveConcurrency(max_concurrency, minimum=1, maximum=max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.cooldown_until = 0.0
+        self.lock = threading.Lock()
+
+    async def _wait_for_cooldown(self):
+        while True:
+            with self.lock:
+                remaining = self.cooldown_until - time.monotonic()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(remaining)
+
+    def _set_cooldown(self, seconds):
+        with self.lock:
+            self.cooldown_until = max(self.cooldown_until, time.monotonic() + seconds)
+
+    def _backoff(self, attempt):
+        # "Full jitter" exponential backoff.
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    def _retry_delay(self, error, attempt, deadline):
+        """
+        Seconds to wait before retrying a request whose `attempt`-th try failed with `error`.
+        Raises TerminalLLMError if the error is not retryable and TransientLLMError once the
+        retries are exhausted or no retry fits before `deadline`.
+        """
+        transient, retry_after = classify_error(error)
+        if not transient:
+            raise TerminalLLMError(str(error)) from error
+
+        self.concurrency.on_throttle()
+        if retry_after is not None:
+            self._set_cooldown(retry_after)
+        if attempt > self.max_retries:
+            raise TransientLLMError(f"Gave up after {attempt} attempts: {error}") from error
+
+        delay = retry_after if retry_after is not None else self._backoff(attempt)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            raise TransientLLMError(f"Deadline exceeded after {attempt} attempts: {error}") from error
+        logger.warning(f"Transient LLM error ({error}); retry {attempt}/{self.max_retries} in {delay:.1f}s "
+                       f"(concurrency limit now {int(self.concurrency.limit)}).")
+        return delay
+
+    async def call(self, request_fn, estimated_tokens=0, deadline=None):
+        """
+        Awaits `request_fn()` under the rate and concurrency limits, retrying transient failures.
+        Raises TransientLLMError once retries are exhausted (or no retry fits before the
+        monotonic `deadline`) and TerminalLLMError for non-retryable errors. Cancelling the
+        calling task cancels the request, wherever it is waiting.
+        """
+        attempt = 0
+        while True:
+            await self._wait_for_cooldown()
+            # The slot is taken first so that rate-limited waiters are also served by priority class.
+            ticket = await self.concurrency.acquire_async()
+            error = None
+            try:
+                await self.request_bucket.acquire_async(1)
+                await self.token_bucket.acquire_async(estimated_tokens)
+                result = await request_fn()
+            except Exception as e:
+                error = e
+            finally:
+                self.concurrency.release(ticket)
+
+            if error is None:
+                self.concurrency.on_success()
+                usage = getattr(result, 'usage', None)
+                actual_tokens = getattr(usage, 'total_tokens', None)
+                if actual_tokens is not None:
+                    self.token_bucket.adjust(estimated_tokens - actual_tokens)
+                return result
+
+            attempt += 1
+            await asyncio.sleep(self._retry_delay(error, attempt, deadline))
+
+_governors = {}
+_governors_lock = threading.Lock()
+
+def get_governor(api_key):
+    """Returns the process-wide governor for an API key, creating it from the environment on first use."""
+    key_id = hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()[:16]
+    with _governors_lock:
+        governor = _governors.get(key_id)
+        if governor is None:
+            governor = Governor(
+                requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "60")),
+                tokens_per_minute=float(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000")),
+                max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "4")),
+                max_retries=int(os.getenv("LLM_MAX_RETRIES", "5")),
+            )
+            _governors[key_id] = governor
+        return governor
@@ -0,0 +1,136 @@
+import os
+import re
+import logging
+from core import markdown_reducer, storage
+from core.rate_limiter import estimate_tokens
+
+# Version-aware analysis of revised arXiv papers. Results are stored per versioned
+# short id (2401.01234v2), so a revision used to be analyzed from scratch. Revisions of
+# the same base id are now linked: the reduced markdown of the new version is diffed
+# section by section against the stored raw_content.md of the newest earlier version,
+# and only the changed sections are sent to the LLM together with the previous report
+# (see analyzer.analyze_revision). A revision with no changed section reuses the
+# previous report without any LLM call; one that changed too much is analyzed in full.
+
+logger = logging.getLogger(__name__)
+
+VERSION_RE = re.compile(r'^(?P<base>.+?)v(?P<version>\d+)$')
+
+MODE_UNCHANGED = 'unchanged'
+MODE_INCREMENTAL = 'incremental'
+MODE_FULL = 'full'
+
+def enabled():
+    return os.getenv("REVISION_INCREMENTAL_ENABLED", "true").lower() not in ("0", "false", "no")
+
+def max_changed_fraction():
+    """Above this share of changed tokens a revision is analyzed in full."""
+    return float(os.getenv("REVISION_MAX_CHANGED_FRACTION", "0.6"))
+
+def split_version(short_id):
+    """'2401.01234v2' -> ('2401.01234', 2); ids without a version -> (short_id, None)."""
+    match = VERSION_RE.match(short_id)
+    if not match:
+        return short_id, None
+    return match.group('base'), int(match.group('version'))
+
+def stored_versions(short_id, results_dir):
+    """Stored analyses of every version of the paper, oldest first, as (short_id, version) pairs."""
+    base_id, _ = split_version(short_id)
+    prefix = base_id + 'v'
+    if not os.path.isdir(results_dir):
+        return []
+    versions = []
+    for name in os.listdir(results_dir):
+        if name.startswith(prefix) and name[len(prefix):].isdigit() and \
+                storage.exists(os.path.join(results_dir, name, 'analysis.md')):
+            versions.append((name, int(name[len(prefix):])))
+    return sorted(versions, key=lambda item: item[1])
+
+def previous_version(short_id, results_dir):
+    """The newest earlier version whose analysis and raw_content.md are both stored, or None."""
+    _, version = split_version(short_id)
+    if version is None:
+        return None
+    for candidate, candidate_version in reversed(stored_versions(short_id, results_dir)):
+        if candidate_version < version and storage.exists(os.path.join(results_dir, candidate, 'raw_content.md')):
+            return candidate
+    return None
+
+def _section_key(sections):
+    """Sections keyed by (normalised title, occurrence), so repeated headings still line up."""
+    keyed, seen = {}, {}
+    for section in sections:
+        occurrence = seen.get(section['title'], 0)
+        seen[section['title']] = occurrence + 1
+        keyed[(section['title'], occurrence)] = section
+    return keyed
+
+def _normalized(text):
+    # Reflowed lines and changed spacing are not revisions.
+    return " ".join(text.split())
+
+def diff_sections(old_markdown, new_markdown):
+    """
+    Compares two versions of a paper section by section. Returns the changed (new or
+    edited) sections of the new version in document order, the titles of removed
+    sections, and the changed share of the new version's tokens.
+    """
+    old_sections = _section_key(markdown_reducer.split_sections(old_markdown))
+    new_sections = _section_key(markdown_reducer.split_sections(new_markdown))
+    changed = []
+    for key, section in new_sections.items():
+        previous = old_sections.get(key)
+        if previous is None or _normalized(previous['body']) != _normalized(section['body']):
+            if section['heading'] is None and not section['body'].strip():
+                continue
+            changed.append(section)
+    removed = [section['heading'] or '(preamble)' for key, section in old_sections.items()
+               if key not in new_sections and (section['heading'] or section['body'].strip())]
+    tokens_total = max(1, estimate_tokens(new_markdown))
+    tokens_changed = sum(estimate_tokens((section['heading'] or '') + "\n" + section['body']) for section in changed)
+    return {
+        "changed": changed,
+        "removed": removed,
+        "tokens_changed": tokens_changed,
+        "tokens_total": tokens_total,
+        "changed_fraction": round(min(1.0, tokens_changed / tokens_total), 3),
+    }
+
+def plan(short_id, reduced_markdown, results_dir, logger=logger):
+    """
+    Decides how to analyze `short_id` given its reduced markdown. Returns None when there
+    is no earlier version, otherwise a dict with the previous version, the mode
+    (unchanged/incremental/full), the changed sections as markdown and a summary that is
+    stored in the metadata.
+    """
+    if not enabled():
+        return None
+    previous = previous_version(short_id, results_dir)
+    if previous is None:
+        return None
+    previous_dir = os.path.join(results_dir, previous)
+    # Reduce the old version with the current rules, so that only real content changes count.
+    old_reduced, _ = markdown_reducer.reduce_markdown(storage.read_text(os.path.join(previous_dir, 'raw_content.md')))
+    diff = diff_sections(old_reduced, reduced_markdown)
+    summary = {
+        "previous_version": previous,
+        "changed_sections": [section['heading'] or '(preamble)' for section in diff['changed']],
+        "removed_sections": diff['removed'],
+        "changed_fraction": diff['changed_fraction'],
+    }
+    if diff['changed_fraction'] > max_changed_fraction():
+        mode = MODE_FULL
+        logger.info(f"{short_id} changed {diff['changed_fraction']:.0%} since {previous}; analyzing in full.")
+    else:
+        mode = MODE_INCREMENTAL if diff['changed'] or diff['removed'] else MODE_UNCHANGED
+        logger.info(f"{short_id} is a revision of {previous}: {len(diff['changed'])} sections changed, "
+                    f"{len(diff['removed'])} removed ({diff['changed_fraction']:.0%} of the text); {mode} update.")
+    return {
+        "previous_version": previous,
+        "previous_analysis": storage.read_text(os.path.join(previous_dir, 'analysis.md')),
+        "mode": mode,
+        "changes_markdown": markdown_reducer.join_sections(diff['changed']),
+        "removed_sections": diff['removed'],
+        "summary": dict(summary, mode=mode),
+    }
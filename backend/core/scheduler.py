@@ -0,0 +1,266 @@
+import os
+import time
+import asyncio
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+# Priority classes for pipeline work and a weighted fair gate for shared capacity.
+#
+# Work runs in one of three classes: interactive (a user waiting on a single paper),
+# bulk (bulk analysis, re-analysis) and background (prefetch, storage compaction).
+# The class is attached to the running thread (or asyncio task) with `context()`,
+# so the shared resources deeper down (LLM concurrency, PDF parser batches) can
+# order waiters without threading it through every call.
+#
+# PriorityGate hands out a limited number of slots by stride scheduling: each class
+# advances a virtual "pass" by 1/weight per slot it receives, and the waiting class
+# whose next pass (pass + 1/weight) is smallest goes next. A class returning from
+# idle starts at the current virtual time, so it cannot bank credit. Any waiter older
+# than SCHEDULER_MAX_WAIT_SECONDS is served first, which bounds starvation.
+
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+BACKGROUND = 'background'
+CLASSES = (INTERACTIVE, BULK, BACKGROUND)
+DEFAULT_WEIGHTS = {INTERACTIVE: 8.0, BULK: 2.0, BACKGROUND: 1.0}
+
+# Queue job kind -> priority class.
+KIND_CLASSES = {
+    'fetch': INTERACTIVE,
+    'single_analysis': INTERACTIVE,
+    'email_result': INTERACTIVE,
+    'bulk_analysis': BULK,
+    'reanalysis': BULK,
+    'prefetch': BACKGROUND,
+    'compact_storage': BACKGROUND,
+}
+
+_priority_class = contextvars.ContextVar('priority_class', default=INTERACTIVE)
+_label = contextvars.ContextVar('label', default=None)
+_gates = []
+_gates_lock = threading.Lock()
+
+def weights():
+    """Class weights from SCHEDULER_WEIGHTS, e.g. 'interactive=8,bulk=2,background=1'."""
+    configured = dict(DEFAULT_WEIGHTS)
+    for part in os.getenv("SCHEDULER_WEIGHTS", "").split(','):
+        name, _, value = part.partition('=')
+        if name.strip() in configured and value.strip():
+            configured[name.strip()] = max(0.01, float(value))
+    return configured
+
+def max_wait_seconds():
+    return float(os.getenv("SCHEDULER_MAX_WAIT_SECONDS", "300"))
+
+def class_for_kind(kind):
+    return KIND_CLASSES.get(kind, BULK)
+
+def current_class():
+    """The priority class of the calling thread or task (interactive unless set otherwise)."""
+    return _priority_class.get()
+
+def current_label():
+    return _label.get()
+
+def label_in(context):
+    """The label set in another thread's or task's context (see aio.context_of())."""
+    return context.get(_label)
+
+@contextmanager
+def context(priority_class, label=None):
+    """Runs the block with the given priority class (and an optional label, e.g. a paper id)."""
+    class_token = _priority_class.set(priority_class)
+    label_token = _label.set(label if label is not None else current_label())
+    try:
+        yield
+    finally:
+        _label.reset(label_token)
+        _priority_class.reset(class_token)
+
+def stride_order(heads, passes, class_weights, virtual_time):
+    """
+    Returns the classes in `heads` (class -> number of waiters) in the order their waiters
+    would be served, as a generator of class names. `passes` is not modified.
+    """
+    passes = {cls: max(passes.get(cls, 0.0), virtual_time) for cls in heads}
+    remaining = dict(heads)
+    while any(remaining.values()):
+        cls = min((c for c in CLASSES if remaining.get(c)), key=lambda c: passes[c] + 1.0 / class_weights[c])
+        yield cls
+        remaining[cls] -= 1
+        passes[cls] += 1.0 / class_weights[cls]
+
+class _Ticket:
+    __slots__ = ('priority_class', 'label', 'enqueued', 'granted', 'wake')
+
+    def __init__(self, priority_class, label):
+        self.priority_class = priority_class
+        self.label = label
+        self.enqueued = time.monotonic()
+        self.granted = None
+        # Set for waiters in a coroutine, which cannot wait on the condition.
+        self.wake = None
+
+class PriorityGate:
+    """Up to `limit` concurrent holders; waiters are served by weighted fair sharing with aging."""
+
+    def __init__(self, name, limit):
+        self.name = name
+        self.limit = float(limit)
+        self.in_flight = 0
+        self.condition = threading.Condition()
+        self.waiting = {cls: deque() for cls in CLASSES}
+        self.passes = dict.fromkeys(CLASSES, 0.0)
+        self.virtual_time = 0.0
+        self.hold_seconds = None
+        self.weights = weights()
+        with _gates_lock:
+            _gates.append(self)
+
+    def _next(self):
+        """The ticket to serve next. Must hold the condition."""
+        heads = [queue[0] for queue in self.waiting.values() if queue]
+        if not heads:
+            return None
+        oldest = min(heads, key=lambda ticket: ticket.enqueued)
+        if time.monotonic() - oldest.enqueued >= max_wait_seconds():
+            return oldest
+        cls = min((t.priority_class for t in heads),
+                  key=lambda c: (self.passes[c] + 1.0 / self.weights[c], CLASSES.index(c)))
+        return self.waiting[cls][0]
+
+    def _notify(self):
+        """Wakes every waiter, threads and coroutines alike. Must hold the condition."""
+        self.condition.notify_all()
+        for queue in self.waiting.values():
+            for ticket in queue:
+                if ticket.wake is not None:
+                    ticket.wake()
+
+    def _enqueue(self):
+        """Queues a ticket for the caller's class. Must hold the condition."""
+        ticket = _Ticket(current_class(), current_label())
+        queue = self.waiting[ticket.priority_class]
+        if not queue:
+            self.passes[ticket.priority_class] = max(self.passes[ticket.priority_class], self.virtual_time)
+        queue.append(ticket)
+        return ticket
+
+    def _ready(self, ticket):
+        return self.in_flight < max(1, int(self.limit)) and self._next() is ticket
+
+    def _grant(self, ticket):
+        """Hands a slot to `ticket`, the next waiter. Must hold the condition."""
+        self.waiting[ticket.priority_class].popleft()
+        self.virtual_time = self.passes[ticket.priority_class]
+        self.passes[ticket.priority_class] += 1.0 / self.weights[ticket.priority_class]
+        self.in_flight += 1
+        ticket.granted = time.monotonic()
+        # Another slot may still be free for the next waiter.
+        self._notify()
+
+    def acquire(self):
+        """Blocks until the calling thread's turn and returns a ticket to pass to release()."""
+        with self.condition:
+            ticket = self._enqueue()
+            while not self._ready(ticket):
+                self.condition.wait()
+            self._grant(ticket)
+        return ticket
+
+    async def acquire_async(self):
+        """acquire() for coroutines: waits for the caller's turn without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        woken = asyncio.Event()
+        with self.condition:
+            ticket = self._enqueue()
+            ticket.wake = lambda: loop.call_soon_threadsafe(woken.set)
+        try:
+            while True:
+                with self.condition:
+                    if self._ready(ticket):
+                        self._grant(ticket)
+                        return ticket
+                    woken.clear()
+                await woken.wait()
+        except asyncio.CancelledError:
+            with self.condition:
+                self.waiting[ticket.priority_class].remove(ticket)
+                self._notify()
+            raise
+
+    def release(self, ticket):
+        with self.condition:
+            self.in_flight -= 1
+            held = time.monotonic() - ticket.granted
+            self.hold_seconds = held if self.hold_seconds is None else 0.8 * self.hold_seconds + 0.2 * held
+            self._notify()
+
+    @contextmanager
+    def slot(self):
+        ticket = self.acquire()
+        try:
+            yield
+        finally:
+            self.release(ticket)
+
+    def _estimate(self, position):
+        if self.hold_seconds is None:
+            return None
+        return round(position * self.hold_seconds / max(1, int(self.limit)), 1)
+
+    def locate(self, label):
+        """Queue position and estimated wait (seconds) of the first waiter with `label`, or None."""
+        with self.condition:
+            for cls in CLASSES:
+                for index, ticket in enumerate(self.waiting[cls]):
+                    if ticket.label == label:
+                        break
+                else:
+                    continue
+                break
+            else:
+                return None
+            ahead_in_class = index
+            heads = {c: len(q) for c, q in self.waiting.items() if q}
+            position = 0
+            for served in stride_order(heads, self.passes, self.weights, self.virtual_time):
+                if served == cls:
+                    if ahead_in_class == 0:
+                        break
+                    ahead_in_class -= 1
+                position += 1
+            return {"gate": self.name, "class": cls, "position": position,
+                    "estimated_wait_seconds": self._estimate(position)}
+
+    def status(self):
+        with self.condition:
+            now = time.monotonic()
+            return {
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "waiting": {cls: len(queue) for cls, queue in self.waiting.items()},
+                "oldest_wait_seconds": {cls: round(now - queue[0].enqueued, 1)
+                                        for cls, queue in self.waiting.items() if queue},
+                "avg_hold_seconds": round(self.hold_seconds, 2) if self.hold_seconds is not None else None,
+            }
+
+def locate(label):
+    """Where work labelled `label` waits in this process's gates (first match), or None."""
+    with _gates_lock:
+        gates = list(_gates)
+    for gate in gates:
+        found = gate.locate(label)
+        if found is not None:
+            return found
+    return None
+
+def gates_status():
+    with _gates_lock:
+        gates = list(_gates)
+    status = {}
+    for gate in gates:
+        status.setdefault(gate.name, []).append(gate.status())
+    return status
@@ -0,0 +1,85 @@
+import os
+import threading
+
+# Process configuration, parsed once. backend/.env is loaded into the environment the
+# first time it is needed (entry points do it at startup), then the service settings are
+# read into an immutable Settings object. Tuning knobs that tests and operators change
+# at runtime (rate limits, batch sizes, ...) are still read with os.getenv where used.
+
+ENV_FILE = os.path.join(os.path.dirname(__file__), '..', '.env')
+
+def _str(value):
+    return value
+
+def _optional_int(value):
+    return int(value) if value else None
+
+def _csv(value):
+    return tuple(part.strip() for part in value.split(',') if part.strip())
+
+# Setting -> (environment variable, default, parser)
+FIELDS = {
+    'sender_email': ("SENDER_EMAIL", "", _str),
+    'sender_password': ("SENDER_PASSWORD", "", _str),
+    'smtp_server': ("SMTP_SERVER", "", _str),
+    'smtp_port': ("SMTP_PORT", "", _optional_int),
+    'recipient_emails': ("RECIPIENT_EMAILS", "", _csv),
+    'email_subject': ("EMAIL_SUBJECT", "ArXiv Daily Papers", _str),
+    'backend_port': ("BACKEND_PORT", "5001", int),
+    'backend_public_url': ("BACKEND_PUBLIC_URL", "http://localhost:5001", _str),
+    'pdf_parser_url': ("PDF_PARSER_URL", "", _str),
+    'pipeline_mode': ("PIPELINE_MODE", "inline", _str),
+    'pipeline_inline_workers': ("PIPELINE_INLINE_WORKERS", "4", int),
+    'doc_translation_api_key': ("DASHSCOPE_API_KEY", "", _str),
+    'doc_translation_base_url': ("DASHSCOPE_BASE_URL", "https://dashscope.aliyuncs.com/compatible-mode/v1", _str),
+}
+
+class Settings:
+    """Immutable snapshot of the process configuration. Build with from_env() or get()."""
+    __slots__ = tuple(FIELDS)
+
+    def __init__(self, **values):
+        for name in FIELDS:
+            object.__setattr__(self, name, values[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Settings are immutable")
+
+    @classmethod
+    def from_env(cls, environ=None):
+        environ = os.environ if environ is None else environ
+        return cls(**{name: parse(environ.get(var) or default) for name, (var, default, parse) in FIELDS.items()})
+
+    def replace(self, **changes):
+        """A copy with some settings changed (e.g. for tests)."""
+        return Settings(**{name: changes.get(name, getattr(self, name)) for name in FIELDS})
+
+    def __repr__(self):
+        shown = {name: ('***' if 'password' in name or 'api_key' in name else getattr(self, name)) for name in FIELDS}
+        return f"Settings({shown})"
+
+_lock = threading.Lock()
+_env_loaded = False
+_settings = None
+
+def load_env():
+    """Loads backend/.env into the environment once per process (existing variables win)."""
+    global _env_loaded
+    with _lock:
+        if _env_loaded:
+            return
+        if os.path.exists(ENV_FILE):
+            # python-dotenv is only imported when there is a file to read.
+            from dotenv import load_dotenv
+            load_dotenv(ENV_FILE)
+        _env_loaded = True
+
+def get():
+    """The process settings, parsed on first use."""
+    global _settings
+    if _settings is None:
+        load_env()
+        with _lock:
+            if _settings is None:
+                _settings = Settings.from_env()
+    return _settings
@@ -0,0 +1,197 @@
+import json
+import threading
+from collections import OrderedDict
+from core import aio
+from core.paper_record import PaperRecord
+from core.db import get_connection, transaction
+from core.job_store import PIPELINE_DB_FILE
+
+# Shared state (task status and fetch results) that every web worker and pipeline
+# worker process can read, instead of per-process globals.
+
+STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fetch_results (
+    position INTEGER PRIMARY KEY,
+    payload TEXT NOT NULL
+);
+"""
+
+IDLE_STATUS = {"status": "idle", "message": "The service is idle."}
+
+# Serialized /api/results pages, keyed by (results_version, page, per_page). The version
+# lives in the shared state table, so a new fetch in any process invalidates every cache.
+PAGE_CACHE_SIZE = 64
+_page_cache = OrderedDict()
+_page_cache_lock = threading.Lock()
+
+def _db():
+    return get_connection(PIPELINE_DB_FILE, STATE_SCHEMA)
+
+def get_value(key, default=None):
+    """Returns a JSON value stored under `key`."""
+    row = _db().execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+    return json.loads(row['value']) if row else default
+
+def set_value(key, value):
+    _db().execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+                  (key, json.dumps(value, ensure_ascii=False)))
+
+def increment_value(key):
+    """Atomically increments an integer value (missing counts as 0) and returns the new value."""
+    conn = _db()
+    with transaction(conn):
+        row = conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        value = (json.loads(row['value']) if row else 0) + 1
+        conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+    return value
+
+# --- Task status ---
+
+def get_task_status():
+    """Returns the current task status dict."""
+    row = _db().execute("SELECT value FROM state WHERE key = 'task_status'").fetchone()
+    return json.loads(row['value']) if row else dict(IDLE_STATUS)
+
+def set_task_status(status):
+    _db().execute("INSERT OR REPLACE INTO state (key, value) VALUES ('task_status', ?)",
+                  (json.dumps(status, ensure_ascii=False),))
+
+def try_start_task(message):
+    """
+    Atomically moves the task status to 'running' unless a task is already running.
+    Returns a TaskStatus for the new task, or None if one is in progress.
+    """
+    conn = _db()
+    with transaction(conn):
+        row = conn.execute("SELECT value FROM state WHERE key = 'task_status'").fetchone()
+        if row and json.loads(row['value']).get('status') == 'running':
+            return None
+        status = {"status": "running", "message": message}
+        conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('task_status', ?)",
+                     (json.dumps(status, ensure_ascii=False),))
+    return TaskStatus(status, persist=False)
+
+class TaskStatus(dict):
+    """
+    A task_status dict that writes every change through to the shared store.
+    Changes made by coroutines on the I/O loop are written from its blocking pool
+    instead; changes made while a write is under way are coalesced into one more.
+    """
+
+    def __init__(self, initial=None, persist=True):
+        super().__init__(initial or get_task_status())
+        self._lock = threading.Lock()
+        self._pending = None
+        self._flushing = False
+        if persist:
+            self._persist()
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._persist()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._persist()
+
+    def _persist(self):
+        with self._lock:
+            self._pending = dict(self)
+            if self._flushing:
+                # The write under way picks up this change as well.
+                return
+            self._flushing = True
+        if aio.in_loop_thread():
+            aio.get_loop().run_in_executor(None, self._flush)
+        else:
+            self._flush()
+
+    def _flush(self):
+        while True:
+            with self._lock:
+                status, self._pending = self._pending, None
+                if status is None:
+                    self._flushing = False
+                    return
+            try:
+                set_task_status(status)
+            except BaseException:
+                with self._lock:
+                    self._flushing = False
+                raise
+
+# --- Fetch results ---
+
+def _paper_json(paper):
+    if isinstance(paper, PaperRecord):
+        return paper.to_json()
+    return json.dumps(paper, ensure_ascii=False)
+
+def _bump_results_version(conn):
+    row = conn.execute("SELECT value FROM state WHERE key = 'results_version'").fetchone()
+    version = (json.loads(row['value']) if row else 0) + 1
+    conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('results_version', ?)", (json.dumps(version),))
+
+def set_results(papers):
+    """Replaces the fetched paper list for review. Accepts PaperRecords or paper dicts."""
+    conn = _db()
+    with transaction(conn):
+        conn.execute("DELETE FROM fetch_results")
+        conn.executemany(
+            "INSERT INTO fetch_results (position, payload) VALUES (?, ?)",
+            ((i, _paper_json(p)) for i, p in enumerate(papers))
+        )
+        _bump_results_version(conn)
+
+def clear_results():
+    conn = _db()
+    with transaction(conn):
+        conn.execute("DELETE FROM fetch_results")
+        _bump_results_version(conn)
+
+def count_results():
+    return _db().execute("SELECT COUNT(*) FROM fetch_results").fetchone()[0]
+
+def get_results_page(start, count):
+    """Returns fetched papers [start, start + count) in fetch order."""
+    rows = _db().execute(
+        "SELECT payload FROM fetch_results WHERE position >= ? ORDER BY position LIMIT ?",
+        (start, count)
+    ).fetchall()
+    return [json.loads(row['payload']) for row in rows]
+
+def get_results_page_payload(page, per_page):
+    """
+    Returns the UTF-8 JSON body of one /api/results page, or None if there are no results.
+    Stored paper JSON is spliced in without re-parsing, and pages are cached until the
+    results change. Pages before the first are served as the first.
+    """
+    page, per_page = max(1, page), max(1, per_page)
+    version = get_value('results_version', 0)
+    cache_key = (version, page, per_page)
+    with _page_cache_lock:
+        if cache_key in _page_cache:
+            _page_cache.move_to_end(cache_key)
+            return _page_cache[cache_key]
+
+    total_papers = count_results()
+    if not total_papers:
+        return None
+    rows = _db().execute(
+        "SELECT payload FROM fetch_results WHERE position >= ? ORDER BY position LIMIT ?",
+        ((page - 1) * per_page, per_page)
+    ).fetchall()
+
+    body = (
+        '{"papers": [' + ", ".join(row['payload'] for row in rows) + '], '
+        f'"total_papers": {total_papers}, "page": {page}, "per_page": {per_page}}}'
+    ).encode('utf-8')
+    with _page_cache_lock:
+        _page_cache[cache_key] = body
+        while len(_page_cache) > PAGE_CACHE_SIZE:
+            _page_cache.popitem(last=False)
+    return body
@@ -0,0 +1,350 @@
+import os
+import re
+import gzip
+import json
+import time
+import shutil
+import logging
+from core.db import DATA_DIR, get_connection
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency; gzip is used when it is missing.
+    zstandard = None
+
+# Storage layer for the per-paper files under RESULTS_DIR.
+# Recently used ("hot") files stay as plain files; the compaction pass compresses
+# cold markdown with zstd (or gzip) next to the original name, e.g. raw_content.md.zst.
+# Reads go through read_text()/read_json(), which transparently decompress.
+
+STORAGE_DB_FILE = os.path.join(DATA_DIR, 'storage.sqlite3')
+COMPRESSIBLE_FILENAMES = ('raw_content.md', 'analysis.md')
+COMPRESSED_SUFFIXES = ('.zst', '.gz')
+
+# Artifacts per paper, in eviction order: derived artifacts first, the analysis itself last.
+DERIVED_ARTIFACTS = ('source', 'images', 'raw_content')
+ARTIFACT_ANALYSIS = 'analysis'
+ARTIFACTS = DERIVED_ARTIFACTS + (ARTIFACT_ANALYSIS,)
+ANALYSIS_VERSION_RE = re.compile(r'^analysis\.(?!draft\.)[\w.-]+\.md(\.zst|\.gz)?$')
+
+STORAGE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS access (
+    short_id TEXT PRIMARY KEY,
+    last_access REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    short_id TEXT NOT NULL,
+    artifact TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    PRIMARY KEY (short_id, artifact)
+);
+CREATE TABLE IF NOT EXISTS pins (
+    short_id TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+logger = logging.getLogger(__name__)
+
+def _db():
+    return get_connection(STORAGE_DB_FILE, STORAGE_SCHEMA)
+
+# --- Access tracking ---
+
+def touch(short_id):
+    """Records that a paper's files were just used, keeping them hot."""
+    try:
+        _db().execute("INSERT OR REPLACE INTO access (short_id, last_access) VALUES (?, ?)", (short_id, time.time()))
+    except Exception as e:
+        logger.error(f"Could not record access for {short_id}: {e}")
+
+def last_access(short_id):
+    row = _db().execute("SELECT last_access FROM access WHERE short_id = ?", (short_id,)).fetchone()
+    return row['last_access'] if row else None
+
+# --- Reading and writing ---
+
+def atomic_write(path, data, mode='w'):
+    """Writes a file via a temporary file and rename, so a crash never leaves it half-written."""
+    tmp_path = f"{path}.tmp"
+    encoding = 'utf-8' if 'b' not in mode else None
+    with open(tmp_path, mode, encoding=encoding) as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def _remove_compressed_variants(path):
+    for suffix in COMPRESSED_SUFFIXES:
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+def write_text(path, text):
+    """Writes a hot (uncompressed) text file, replacing any compressed copy."""
+    atomic_write(path, text)
+    _remove_compressed_variants(path)
+
+def exists(path):
+    """True if the file exists plain or compressed."""
+    return os.path.exists(path) or any(os.path.exists(path + suffix) for suffix in COMPRESSED_SUFFIXES)
+
+def read_bytes(path):
+    """Reads a file, decompressing it if only a compressed copy exists."""
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return f.read()
+    if os.path.exists(path + '.zst'):
+        if zstandard is None:
+            raise RuntimeError(f"{path}.zst needs the 'zstandard' package to be read.")
+        with open(path + '.zst', 'rb') as f:
+            return zstandard.ZstdDecompressor().decompress(f.read())
+    if os.path.exists(path + '.gz'):
+        with gzip.open(path + '.gz', 'rb') as f:
+            return f.read()
+    raise FileNotFoundError(path)
+
+def read_text(path):
+    return read_bytes(path).decode('utf-8')
+
+def read_json(path):
+    return json.loads(read_bytes(path))
+
+# --- Compaction ---
+
+def _compress(data):
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=19).compress(data), '.zst'
+    return gzip.compress(data, compresslevel=9), '.gz'
+
+def compress_file(path):
+    """Compresses one plain file in place. Returns (bytes_before, bytes_after)."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    compressed, suffix = _compress(data)
+    atomic_write(path + suffix, compressed, 'wb')
+    os.remove(path)
+    return len(data), len(compressed)
+
+def compact(results_dir, cold_after_days=None):
+    """
+    Compresses markdown of papers not accessed for `cold_after_days`.
+    Returns a report with the number of files compressed and the bytes saved.
+    """
+    if cold_after_days is None:
+        cold_after_days = float(os.getenv("STORAGE_COLD_AFTER_DAYS", "14"))
+    cold_before = time.time() - cold_after_days * 86400
+    report = {"files_compressed": 0, "bytes_before": 0, "bytes_after": 0, "started": time.time()}
+
+    if os.path.exists(results_dir):
+        for short_id in os.listdir(results_dir):
+            paper_dir = os.path.join(results_dir, short_id)
+            if not os.path.isdir(paper_dir):
+                continue
+            accessed = last_access(short_id) or os.path.getmtime(paper_dir)
+            if accessed > cold_before:
+                continue
+            # Keep the directory's mtime, which the warehouse uses to order recent analyses.
+            dir_stat = os.stat(paper_dir)
+            for filename in COMPRESSIBLE_FILENAMES:
+                path = os.path.join(paper_dir, filename)
+                if not os.path.exists(path):
+                    continue
+                try:
+                    before, after = compress_file(path)
+                except FileNotFoundError:
+                    continue  # Compacted concurrently by another process.
+                report["files_compressed"] += 1
+                report["bytes_before"] += before
+                report["bytes_after"] += after
+            os.utime(paper_dir, (dir_stat.st_atime, dir_stat.st_mtime))
+            refresh_paper(paper_dir)
+
+    report["bytes_saved"] = report["bytes_before"] - report["bytes_after"]
+    report["finished"] = time.time()
+    logger.info(f"Storage compaction compressed {report['files_compressed']} files, "
+                f"saving {report['bytes_saved'] / 1024 / 1024:.1f} MB.")
+    return report
+
+# --- Size index, quota and eviction ---
+# Sizes are kept in an index updated whenever a paper's files change, so usage
+# reports and eviction decisions never have to walk the results tree.
+
+def resolve_paper_dir(results_dir, short_id):
+    """
+    The directory of paper `short_id` under `results_dir`. Raises ValueError unless the id
+    is a plain name that resolves to a direct child of `results_dir`.
+    """
+    separators = [sep for sep in (os.sep, os.altsep, '/') if sep]
+    if not isinstance(short_id, str) or not short_id or '..' in short_id or \
+            any(sep in short_id for sep in separators):
+        raise ValueError(f"Invalid paper id: {short_id!r}")
+    root = os.path.realpath(results_dir)
+    path = os.path.realpath(os.path.join(root, short_id))
+    if os.path.commonpath([root, path]) != root or os.path.dirname(path) != root:
+        raise ValueError(f"Invalid paper id: {short_id!r}")
+    return path
+
+def is_stored_paper(results_dir, short_id):
+    """True if `short_id` is a valid id with an existing directory under `results_dir`."""
+    try:
+        return os.path.isdir(resolve_paper_dir(results_dir, short_id))
+    except ValueError:
+        return False
+
+def _artifact_paths(paper_dir, artifact):
+    def with_variants(filename):
+        path = os.path.join(paper_dir, filename)
+        return [path] + [path + suffix for suffix in COMPRESSED_SUFFIXES]
+
+    if artifact == 'source':
+        return [os.path.join(paper_dir, 'source.pdf')]
+    if artifact == 'images':
+        images_dir = os.path.join(paper_dir, 'images')
+        if not os.path.isdir(images_dir):
+            return []
+        return [os.path.join(images_dir, name) for name in os.listdir(images_dir)]
+    if artifact == 'raw_content':
+        return with_variants('raw_content.md')
+    # Earlier versions kept by re-analysis (analysis.<prompt version>.md) belong to the analysis too.
+    versions = [os.path.join(paper_dir, name) for name in os.listdir(paper_dir)
+                if ANALYSIS_VERSION_RE.match(name)] if os.path.isdir(paper_dir) else []
+    return (with_variants('analysis.md') + with_variants('analysis.draft.md') + versions +
+            [os.path.join(paper_dir, 'metadata.json')])
+
+def refresh_paper(paper_dir):
+    """Updates the size index for one paper directory after its files changed."""
+    short_id = os.path.basename(os.path.normpath(paper_dir))
+    conn = _db()
+    for artifact in ARTIFACTS:
+        size = sum(os.path.getsize(p) for p in _artifact_paths(paper_dir, artifact) if os.path.isfile(p))
+        if size:
+            conn.execute("INSERT OR REPLACE INTO artifacts (short_id, artifact, bytes) VALUES (?, ?, ?)",
+                         (short_id, artifact, size))
+        else:
+            conn.execute("DELETE FROM artifacts WHERE short_id = ? AND artifact = ?", (short_id, artifact))
+
+def ensure_index(results_dir):
+    """Builds the size index once for a warehouse created before it existed."""
+    conn = _db()
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'index_built'").fetchone():
+        return
+    logger.info("Building storage size index for the existing warehouse...")
+    if os.path.exists(results_dir):
+        for short_id in os.listdir(results_dir):
+            paper_dir = os.path.join(results_dir, short_id)
+            if os.path.isdir(paper_dir):
+                refresh_paper(paper_dir)
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('index_built', ?)", (str(time.time()),))
+
+def forget(short_id=None):
+    """Drops index, access and pin records of one paper, or of all papers."""
+    conn = _db()
+    for table in ('artifacts', 'access', 'pins'):
+        if short_id is None:
+            conn.execute(f"DELETE FROM {table}")
+        else:
+            conn.execute(f"DELETE FROM {table} WHERE short_id = ?", (short_id,))
+
+def pin(short_id):
+    _db().execute("INSERT OR IGNORE INTO pins (short_id) VALUES (?)", (short_id,))
+
+def unpin(short_id):
+    _db().execute("DELETE FROM pins WHERE short_id = ?", (short_id,))
+
+def is_pinned(short_id):
+    return _db().execute("SELECT 1 FROM pins WHERE short_id = ?", (short_id,)).fetchone() is not None
+
+def quota_bytes():
+    """Configured disk quota for RESULTS_DIR in bytes (0 means unlimited)."""
+    return int(float(os.getenv("STORAGE_QUOTA_MB", "0")) * 1024 * 1024)
+
+def usage(results_dir):
+    """Reports indexed disk usage per artifact type against the quota."""
+    ensure_index(results_dir)
+    conn = _db()
+    by_artifact = {row['artifact']: row['bytes'] for row in conn.execute(
+        "SELECT artifact, SUM(bytes) AS bytes FROM artifacts GROUP BY artifact")}
+    return {
+        "total_bytes": sum(by_artifact.values()),
+        "bytes_by_artifact": by_artifact,
+        "papers": conn.execute("SELECT COUNT(DISTINCT short_id) FROM artifacts").fetchone()[0],
+        "pinned": [row['short_id'] for row in conn.execute("SELECT short_id FROM pins ORDER BY short_id")],
+        "quota_bytes": quota_bytes(),
+    }
+
+def evict_artifact(results_dir, short_id, artifact, on_analysis_evicted=None):
+    """Deletes one artifact of a paper. Returns the number of bytes freed."""
+    # Never delete outside the results tree, whatever the caller passed.
+    paper_path = resolve_paper_dir(results_dir, short_id)
+    row = _db().execute("SELECT bytes FROM artifacts WHERE short_id = ? AND artifact = ?",
+                        (short_id, artifact)).fetchone()
+    freed = row['bytes'] if row else 0
+
+    if artifact == ARTIFACT_ANALYSIS:
+        if on_analysis_evicted is not None:
+            on_analysis_evicted(paper_path)
+        shutil.rmtree(paper_path, ignore_errors=True)
+        forget(short_id)
+    else:
+        if artifact == 'images':
+            shutil.rmtree(os.path.join(paper_path, 'images'), ignore_errors=True)
+        else:
+            for path in _artifact_paths(paper_path, artifact):
+                if os.path.exists(path):
+                    os.remove(path)
+        _db().execute("DELETE FROM artifacts WHERE short_id = ? AND artifact = ?", (short_id, artifact))
+    logger.info(f"Evicted {artifact} of {short_id} ({freed} bytes).")
+    return freed
+
+def evict(results_dir, target_bytes, on_analysis_evicted=None):
+    """
+    Evicts unpinned artifacts until usage is at most `target_bytes`.
+    Derived artifacts go first, least recently accessed (then largest) first;
+    whole analyses are only evicted once no derived artifacts are left.
+    Returns a report of what was removed.
+    """
+    ensure_index(results_dir)
+    conn = _db()
+    total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM artifacts").fetchone()[0]
+    report = {"bytes_before": total, "evicted": []}
+
+    for artifacts in (DERIVED_ARTIFACTS, (ARTIFACT_ANALYSIS,)):
+        if total <= target_bytes:
+            break
+        placeholders = ",".join("?" for _ in artifacts)
+        candidates = conn.execute(f"""
+            SELECT a.short_id, a.artifact, a.bytes
+            FROM artifacts a LEFT JOIN access x ON x.short_id = a.short_id
+            WHERE a.artifact IN ({placeholders})
+              AND a.short_id NOT IN (SELECT short_id FROM pins)
+            ORDER BY COALESCE(x.last_access, 0) ASC, a.bytes DESC
+        """, artifacts).fetchall()
+        for row in candidates:
+            if total <= target_bytes:
+                break
+            if row['artifact'] == ARTIFACT_ANALYSIS:
+                # The whole directory goes, including anything not yet evicted.
+                freed = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM artifacts WHERE short_id = ?",
+                                     (row['short_id'],)).fetchone()[0]
+                evict_artifact(results_dir, row['short_id'], row['artifact'], on_analysis_evicted)
+            else:
+                freed = evict_artifact(results_dir, row['short_id'], row['artifact'])
+            total -= freed
+            report["evicted"].append({"short_id": row['short_id'], "artifact": row['artifact'], "bytes": freed})
+
+    report["bytes_after"] = total
+    return report
+
+def enforce_quota(results_dir, on_analysis_evicted=None):
+    """Evicts down to 90% of STORAGE_QUOTA_MB when usage exceeds it. Cheap when under quota."""
+    quota = quota_bytes()
+    if quota <= 0:
+        return None
+    ensure_index(results_dir)
+    total = _db().execute("SELECT COALESCE(SUM(bytes), 0) FROM artifacts").fetchone()[0]
+    if total <= quota:
+        return None
+    return evict(results_dir, int(quota * 0.9), on_analysis_evicted)
@@ -0,0 +1,291 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import logging
+import threading
+from core import profiler, scheduler
+from core.db import get_connection, transaction
+from core.job_store import PIPELINE_DB_FILE
+
+# Local, broker-less work queue stored in SQLite. Pipeline jobs (fetch, analysis,
+# email) are enqueued by the web tier and consumed by worker threads or processes.
+# Every job has a priority class (core/scheduler.py); workers claim across classes
+# by weighted fair sharing, with the class passes kept in the queue_shares table so
+# that all worker processes share one schedule.
+
+QUEUED = 'queued'
+CLAIMED = 'claimed'
+DONE = 'done'
+FAILED = 'failed'
+
+# Claimed items whose worker stopped heartbeating for this long are requeued.
+STALE_AFTER_SECONDS = 120
+HEARTBEAT_INTERVAL_SECONDS = 30
+POLL_INTERVAL_SECONDS = 1.0
+
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    worker TEXT,
+    error TEXT,
+    enqueued REAL NOT NULL,
+    claimed REAL,
+    heartbeat REAL,
+    finished REAL,
+    priority TEXT NOT NULL DEFAULT 'bulk',
+    label TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_queue_status ON queue(status, id);
+CREATE TABLE IF NOT EXISTS queue_shares (
+    name TEXT PRIMARY KEY,
+    pass REAL NOT NULL
+);
+"""
+VIRTUAL_TIME = '_virtual_time'
+
+logger = logging.getLogger(__name__)
+
+_columns_checked = False
+
+def _db():
+    global _columns_checked
+    conn = get_connection(PIPELINE_DB_FILE, QUEUE_SCHEMA)
+    if not _columns_checked:
+        # Queues created before priority classes existed lack these columns.
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(queue)")}
+        for column, ddl in (('priority', "TEXT NOT NULL DEFAULT 'bulk'"), ('label', 'TEXT')):
+            if column not in columns:
+                try:
+                    conn.execute(f"ALTER TABLE queue ADD COLUMN {column} {ddl}")
+                except sqlite3.OperationalError:
+                    pass  # Added concurrently by another process.
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_queue_priority ON queue(status, priority, id)")
+        _columns_checked = True
+    return conn
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+def enqueue(kind, payload, label=None, priority_class=None):
+    """
+    Adds a job to the queue and returns its id. The priority class defaults to the
+    kind's class; `label` (e.g. a paper's short id) lets callers find the job again.
+    """
+    cursor = _db().execute(
+        "INSERT INTO queue (kind, payload, status, enqueued, priority, label) VALUES (?, ?, ?, ?, ?, ?)",
+        (kind, json.dumps(payload, ensure_ascii=False), QUEUED, time.time(),
+         priority_class or scheduler.class_for_kind(kind), label)
+    )
+    return cursor.lastrowid
+
+def _load_passes(conn):
+    passes = {row['name']: row['pass'] for row in conn.execute("SELECT name, pass FROM queue_shares")}
+    return passes, passes.pop(VIRTUAL_TIME, 0.0)
+
+def _pick_class(conn, heads):
+    """Chooses the class to serve from `heads` (rows of priority, enqueued) and advances its pass."""
+    oldest = min(heads, key=lambda head: head['enqueued'])
+    if time.time() - oldest['enqueued'] >= scheduler.max_wait_seconds():
+        # Starvation protection: a job waiting too long goes next whatever its class.
+        return oldest['priority']
+    passes, virtual_time = _load_passes(conn)
+    weights = scheduler.weights()
+    effective = {head['priority']: max(passes.get(head['priority'], 0.0), virtual_time) for head in heads}
+    chosen = min(effective, key=lambda cls: effective[cls] + 1.0 / weights.get(cls, 1.0))
+    conn.executemany("INSERT OR REPLACE INTO queue_shares (name, pass) VALUES (?, ?)", [
+        (VIRTUAL_TIME, effective[chosen]),
+        (chosen, effective[chosen] + 1.0 / weights.get(chosen, 1.0)),
+    ])
+    return chosen
+
+def claim(kinds=None):
+    """
+    Atomically claims the next queued job (optionally of the given kinds): the oldest
+    job of the class chosen by weighted fair sharing. Returns None if nothing is queued.
+    """
+    conn = _db()
+    now = time.time()
+    kind_clause, kind_params = "", ()
+    if kinds:
+        kind_clause = f" AND kind IN ({','.join('?' for _ in kinds)})"
+        kind_params = tuple(kinds)
+    with transaction(conn):
+        heads = conn.execute(
+            f"SELECT priority, MIN(enqueued) AS enqueued FROM queue WHERE status = ?{kind_clause} GROUP BY priority",
+            (QUEUED, *kind_params)
+        ).fetchall()
+        if not heads:
+            return None
+        priority_class = _pick_class(conn, heads) if len(heads) > 1 else heads[0]['priority']
+        row = conn.execute(
+            f"SELECT * FROM queue WHERE status = ? AND priority = ?{kind_clause} ORDER BY id LIMIT 1",
+            (QUEUED, priority_class, *kind_params)
+        ).fetchone()
+        conn.execute(
+            "UPDATE queue SET status = ?, worker = ?, claimed = ?, heartbeat = ? WHERE id = ?",
+            (CLAIMED, worker_id(), now, now, row['id'])
+        )
+    job = dict(row)
+    job['payload'] = json.loads(job['payload'])
+    return job
+
+def heartbeat(item_id):
+    _db().execute("UPDATE queue SET heartbeat = ? WHERE id = ? AND status = ?", (time.time(), item_id, CLAIMED))
+
+def complete(item_id):
+    _db().execute("UPDATE queue SET status = ?, finished = ? WHERE id = ?", (DONE, time.time(), item_id))
+
+def fail(item_id, error):
+    _db().execute("UPDATE queue SET status = ?, error = ?, finished = ? WHERE id = ?",
+                  (FAILED, str(error), time.time(), item_id))
+
+def has_pending(kind):
+    """True if a job of `kind` is queued or running."""
+    row = _db().execute("SELECT 1 FROM queue WHERE kind = ? AND status IN (?, ?) LIMIT 1",
+                        (kind, QUEUED, CLAIMED)).fetchone()
+    return row is not None
+
+def get_item(item_id):
+    row = _db().execute("SELECT * FROM queue WHERE id = ?", (item_id,)).fetchone()
+    if row is None:
+        return None
+    item = dict(row)
+    item['payload'] = json.loads(item['payload'])
+    return item
+
+def class_counts():
+    """Number of queued and running jobs per priority class."""
+    counts = {}
+    for row in _db().execute("SELECT priority, status, COUNT(*) AS n FROM queue WHERE status IN (?, ?) "
+                             "GROUP BY priority, status", (QUEUED, CLAIMED)):
+        counts.setdefault(row['priority'], {QUEUED: 0, CLAIMED: 0})[row['status']] = row['n']
+    return counts
+
+def find_queued(kind, label):
+    """Id of the oldest queued or running job of `kind` with `label`, or None."""
+    row = _db().execute("SELECT id FROM queue WHERE kind = ? AND label = ? AND status IN (?, ?) ORDER BY id LIMIT 1",
+                        (kind, label, QUEUED, CLAIMED)).fetchone()
+    return row['id'] if row else None
+
+def _average_durations(conn):
+    """Mean run time (seconds) of recently finished jobs, per priority class."""
+    rows = conn.execute(
+        "SELECT priority, AVG(finished - claimed) AS seconds FROM "
+        "(SELECT priority, finished, claimed FROM queue WHERE status IN (?, ?) AND claimed IS NOT NULL "
+        "ORDER BY id DESC LIMIT 200) GROUP BY priority",
+        (DONE, FAILED)
+    ).fetchall()
+    return {row['priority']: row['seconds'] for row in rows}
+
+def queue_position(item_id):
+    """
+    For a queued job: its class, how many queued jobs will be claimed before it, and
+    an estimated start time from recent run times. None if the job is not queued.
+    """
+    conn = _db()
+    item = conn.execute("SELECT id, priority, status FROM queue WHERE id = ?", (item_id,)).fetchone()
+    if item is None or item['status'] != QUEUED:
+        return None
+    counts = {row['priority']: row['n'] for row in conn.execute(
+        "SELECT priority, COUNT(*) AS n FROM queue WHERE status = ? GROUP BY priority", (QUEUED,))}
+    ahead_in_class = conn.execute("SELECT COUNT(*) FROM queue WHERE status = ? AND priority = ? AND id < ?",
+                                  (QUEUED, item['priority'], item_id)).fetchone()[0]
+    passes, virtual_time = _load_passes(conn)
+    weights = scheduler.weights()
+    served_before = {}
+    for cls in scheduler.stride_order({c: n for c, n in counts.items() if c in scheduler.CLASSES},
+                                      passes, weights, virtual_time):
+        if cls == item['priority']:
+            if ahead_in_class == 0:
+                break
+            ahead_in_class -= 1
+        served_before[cls] = served_before.get(cls, 0) + 1
+    position = sum(served_before.values())
+
+    now = time.time()
+    durations = _average_durations(conn)
+    fallback = sum(durations.values()) / len(durations) if durations else 0.0
+    running = conn.execute("SELECT priority, claimed FROM queue WHERE status = ?", (CLAIMED,)).fetchall()
+    # Work still ahead: the remainder of the running jobs plus the jobs served first,
+    # spread over as many workers as are busy now.
+    work = sum(max(0.0, durations.get(row['priority'], fallback) - (now - row['claimed'])) for row in running)
+    work += sum(n * durations.get(cls, fallback) for cls, n in served_before.items())
+    wait = work / max(1, len(running))
+    return {"class": item['priority'], "position": position,
+            "estimated_wait_seconds": round(wait, 1), "estimated_start": now + wait}
+
+def _worker_is_dead(worker):
+    """True if `worker` ran on this host in a process that no longer exists."""
+    try:
+        host, pid, _ = worker.rsplit(':', 2)
+        if host != socket.gethostname():
+            return False
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except (ValueError, OSError):
+        return False
+    return False
+
+def requeue_stale():
+    """Returns claimed jobs whose worker died to the queue so that they resume."""
+    conn = _db()
+    stale_before = time.time() - STALE_AFTER_SECONDS
+    requeued = 0
+    for row in conn.execute("SELECT id, worker, heartbeat FROM queue WHERE status = ?", (CLAIMED,)).fetchall():
+        if row['heartbeat'] < stale_before or _worker_is_dead(row['worker'] or ''):
+            cursor = conn.execute(
+                "UPDATE queue SET status = ?, worker = NULL WHERE id = ? AND status = ? AND worker IS ?",
+                (QUEUED, row['id'], CLAIMED, row['worker'])
+            )
+            requeued += cursor.rowcount
+    if requeued:
+        logger.info(f"Requeued {requeued} jobs from workers that stopped.")
+    return requeued
+
+def _run_with_heartbeat(item, handler):
+    stop = threading.Event()
+    def beat():
+        while not stop.wait(HEARTBEAT_INTERVAL_SECONDS):
+            heartbeat(item['id'])
+    beater = threading.Thread(target=beat, daemon=True)
+    beater.start()
+    try:
+        with scheduler.context(item.get('priority') or scheduler.class_for_kind(item['kind']), item.get('label')):
+            if profiler.enabled() and profiler.requested(item['payload'].get('profile')):
+                with profiler.capture(f"{item['kind']}-{item['id']}", kind='job'):
+                    handler(item['payload'])
+            else:
+                handler(item['payload'])
+    finally:
+        stop.set()
+
+def run_worker(handlers, stop_event=None):
+    """
+    Consumes queued jobs forever (or until stop_event is set).
+    `handlers` maps a job kind to a callable taking the job payload.
+    """
+    kinds = list(handlers.keys())
+    last_requeue = 0.0
+    while stop_event is None or not stop_event.is_set():
+        if time.time() - last_requeue > HEARTBEAT_INTERVAL_SECONDS:
+            requeue_stale()
+            last_requeue = time.time()
+
+        item = claim(kinds)
+        if item is None:
+            time.sleep(POLL_INTERVAL_SECONDS)
+            continue
+
+        logger.info(f"Worker {worker_id()} running job {item['id']} ({item['kind']}).")
+        try:
+            _run_with_heartbeat(item, handlers[item['kind']])
+            complete(item['id'])
+        except Exception as e:
+            logger.error(f"Job {item['id']} ({item['kind']}) failed:", exc_info=e)
+            fail(item['id'], e)
@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from core import (accounting, aio, arxiv_fetcher, analyzer, email_sender, job_store, prefetcher, scheduler, state_store, storage,
+                  task_queue, triage)
+from core.history_manager import save_processed_papers
+from core.analysis_manager import (RESULTS_DIR, get_full_text_analysis, get_full_text_analysis_async, build_email_file,
+                                   pending_stage_counts, reanalyze_paper, select_stored_papers)
+
+# Pipeline job handlers. They run on queue workers (threads inside the web process,
+# or separate worker processes) and report progress through the shared task status.
+
+logger = logging.getLogger(__name__)
+
+def fetch_task_wrapper(date_range=None, categories=None, keywords=None):
+    task_status = state_store.TaskStatus()
+    try:
+        papers_by_category = arxiv_fetcher.fetch_papers(date_range, categories, keywords)
+        all_papers = [p for papers in papers_by_category.values() for p in papers]
+        unique_papers = list({p['entry_id']: p for p in all_papers}.values())
+        total_unique_papers = len(unique_papers)
+        logger.info(f"Found {total_unique_papers} papers.")
+
+        if total_unique_papers > 0:
+            state_store.set_results(unique_papers)
+            task_status.update(status='review_ready', message=f"Found {total_unique_papers} papers. Ready for review.")
+            # Start downloading and parsing the likeliest picks while the user reviews.
+            prefetcher.schedule(keywords)
+        else:
+            task_status.update(status='success', message="Process finished. No new papers found.")
+    except Exception as e:
+        task_status.update(status='error', message=str(e))
+        logger.error("Exception in fetch_task_wrapper:", exc_info=e)
+    finally:
+        logger.info(f"Fetch task finished with status: {task_status['status']}")
+
+def run_analysis_for_paper(paper):
+    dummy_task_status = {'message': ''}
+    content = get_full_text_analysis(paper, dummy_task_status, logger)
+    if analyzer.is_failed_result(content):
+        logger.error(f"Background analysis failed for {paper.get('entry_id')}: {content}")
+    else:
+        save_processed_papers([paper])
+    logger.info(f"Background analysis finished for {paper.get('entry_id')}")
+
+def bulk_analysis_concurrency():
+    return max(1, int(os.getenv("BULK_ANALYSIS_CONCURRENCY", "4")))
+
+def _expected_stage_counts(papers, cascade=None):
+    stage_counts = pending_stage_counts(papers)
+    if cascade and papers:
+        # Only the papers expected to pass triage (by the recent pass rate) reach the full-text stages.
+        expected = len(papers) * triage.pass_rate()
+        if cascade.get('top_k'):
+            expected = min(expected, cascade['top_k'])
+        share = expected / len(papers)
+        stage_counts = {stage: round(count * share) for stage, count in stage_counts.items()}
+        stage_counts[accounting.STAGE_TRIAGE] = triage.batch_count(len(papers))
+    return stage_counts
+
+def estimate_bulk_analysis(papers, cascade=None):
+    """Predicted tokens, cost and duration of a bulk analysis, and its admission decision."""
+    estimate = accounting.estimate(_expected_stage_counts(papers, cascade), bulk_analysis_concurrency())
+    return estimate, accounting.admit(estimate)
+
+def _format_eta(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{seconds:02d}s"
+
+def analysis_task_wrapper(selected_papers, recipient_email=None, job_id=None, cascade=None):
+    """
+    Analyzes the selected papers and emails the results. With `cascade` (interests, threshold,
+    top_k) the abstracts are triaged first and only the papers passing triage are analyzed.
+    """
+    task_status = state_store.TaskStatus()
+    if job_id is None:
+        job_id = job_store.make_job_id('bulk_analysis', selected_papers, recipient_email or '')
+    try:
+        triage_report = None
+        if cascade:
+            triaged_papers = len(selected_papers)
+            task_status['message'] = f"Triaging {triaged_papers} abstracts..."
+            selected_papers, triage_results = triage.run(selected_papers, cascade['interests'], cascade.get('threshold'),
+                                                         cascade.get('top_k'), job_id)
+            triage_report = {'filename': 'triage_report.md',
+                             'content': triage.report_markdown(triage_results, cascade['interests'])}
+            if not selected_papers:
+                task_status.update(status='success',
+                                   message=f"None of the {triaged_papers} papers passed triage; nothing to analyze.")
+                return
+
+        total_papers = len(selected_papers)
+        finished = [0]
+        concurrency = bulk_analysis_concurrency()
+        started = time.time()
+
+        async def analyze_one(paper, slots):
+            async with slots:
+                # Jobs admitted as throttled pause here once the daily budget is used up.
+                await accounting.wait_for_budget_async(task_status)
+                # Papers whose stages were checkpointed by an earlier (interrupted) run resume from there.
+                with scheduler.context(scheduler.current_class(), paper['entry_id'].split('/')[-1]):
+                    content = await get_full_text_analysis_async(paper, task_status, logger)
+            finished[0] += 1
+            # ETA from the throughput measured so far in this job.
+            eta_seconds = (total_papers - finished[0]) * (time.time() - started) / finished[0]
+            task_status.update(eta_seconds=round(eta_seconds),
+                               message=f"Processed paper {finished[0]}/{total_papers}: {paper['title'][:40]}... "
+                                       f"(ETA {_format_eta(eta_seconds)})")
+            return content
+
+        async def analyze_all():
+            slots = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(*(analyze_one(paper, slots) for paper in selected_papers))
+
+        # Papers are processed concurrently (as tasks on the I/O loop, not threads) so that
+        # their PDFs can share batched parser requests.
+        estimate = accounting.estimate(pending_stage_counts(selected_papers), concurrency)
+        task_status.update(eta_seconds=round(estimate['seconds']),
+                           message=f"Processing {total_papers} papers (estimated {_format_eta(estimate['seconds'])}, "
+                                   f"~{estimate['tokens']} tokens)...")
+        contents = aio.run(analyze_all())
+
+        files_to_zip = [build_email_file(paper, content) for paper, content in zip(selected_papers, contents)
+                        if not analyzer.is_failed_result(content)]
+        failed_papers = total_papers - len(files_to_zip)
+        analyzed_papers = len(files_to_zip)
+        if analyzed_papers == 0:
+            raise RuntimeError(f"All {total_papers} papers failed to analyze.")
+
+        task_status['message'] = "Zipping and sending email..."
+        subject = f"Bulk Analysis Results for {analyzed_papers} Papers"
+        if triage_report:
+            files_to_zip.append(triage_report)
+        email_sent = email_sender.send_email(files_to_zip, analyzed_papers, recipient_email, subject)
+
+        if email_sent:
+            save_processed_papers(selected_papers)
+            message = f"Process complete. Emailed {analyzed_papers} analyzed papers."
+            if cascade:
+                message += f" {total_papers} of {triaged_papers} papers passed triage."
+            if failed_papers:
+                message += f" {failed_papers} papers failed and can be retried."
+            task_status.update(status='success', message=message)
+        else:
+            task_status.update(status='error', message="Email sending failed during bulk analysis stage.")
+
+    except Exception as e:
+        task_status.update(status='error', message=str(e))
+        logger.error("Exception in analysis_task_wrapper:", exc_info=e)
+    finally:
+        logger.info(f"Bulk analysis task finished with status: {task_status['status']}")
+
+def reanalysis_task(filters=None, job_id=None):
+    """Re-runs the LLM stage for every stored paper matching `filters`, at bounded concurrency."""
+    task_status = state_store.TaskStatus()
+    selected = select_stored_papers(filters)
+    if job_id is None:
+        job_id = job_store.make_job_id('reanalysis', [metadata for _, metadata in selected], json.dumps(filters or {}))
+    progress = {"total": len(selected), "reanalyzed": 0, "unchanged": 0, "missing_raw_content": 0, "failed": 0}
+    progress_lock = threading.Lock()
+    priority_class = scheduler.current_class()
+
+    def reanalyze_one(short_id):
+        try:
+            with scheduler.context(priority_class, short_id):
+                outcome = reanalyze_paper(short_id, task_status, logger)
+        except Exception as e:
+            logger.error(f"Re-analysis of {short_id} failed:", exc_info=e)
+            outcome = 'failed'
+        if outcome not in progress:
+            outcome = 'failed'
+        with progress_lock:
+            progress[outcome] += 1
+            done = sum(progress[key] for key in ('reanalyzed', 'unchanged', 'missing_raw_content', 'failed'))
+            state_store.set_value('reanalysis_progress', dict(progress, job_id=job_id))
+            task_status['message'] = (f"Re-analyzed {done}/{progress['total']} papers "
+                                      f"({progress['failed']} failed, {progress['missing_raw_content']} without raw content)...")
+
+    try:
+        state_store.set_value('reanalysis_progress', dict(progress, job_id=job_id))
+        concurrency = max(1, int(os.getenv("REANALYSIS_CONCURRENCY", "4")))
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(reanalyze_one, [short_id for short_id, _ in selected]))
+        message = (f"Re-analysis complete: {progress['reanalyzed']} updated, {progress['unchanged']} unchanged, "
+                   f"{progress['missing_raw_content']} without raw content, {progress['failed']} failed.")
+        task_status.update(status='success', message=message)
+    except Exception as e:
+        task_status.update(status='error', message=str(e))
+        logger.error("Exception in reanalysis_task:", exc_info=e)
+    finally:
+        logger.info(f"Re-analysis task finished with status: {task_status['status']}")
+
+def email_result_task(paper, recipient_email):
+    """Emails one stored analysis to a recipient."""
+    entry_id_short = paper['entry_id'].split('/')[-1]
+    file_path = os.path.join(RESULTS_DIR, entry_id_short, 'analysis.md')
+    file_to_send = build_email_file(paper, storage.read_text(file_path))
+    subject = paper.get('title', 'Single Paper Analysis')
+    if not email_sender.send_email([file_to_send], 1, recipient_email, subject):
+        raise RuntimeError("Failed to send email.")
+
+def compact_storage_task(cold_after_days=None):
+    """Compresses cold analyses and records the space savings."""
+    report = storage.compact(RESULTS_DIR, cold_after_days)
+    totals = state_store.get_value('storage_totals', {"files_compressed": 0, "bytes_saved": 0})
+    totals["files_compressed"] += report["files_compressed"]
+    totals["bytes_saved"] += report["bytes_saved"]
+    state_store.set_value('storage_totals', totals)
+    state_store.set_value('storage_last_compaction', report)
+
+def schedule_compaction(stop_event=None):
+    """Periodically enqueues a storage compaction job (STORAGE_COMPACTION_INTERVAL_HOURS, 0 disables)."""
+    interval_hours = float(os.getenv("STORAGE_COMPACTION_INTERVAL_HOURS", "24"))
+    if interval_hours <= 0:
+        return
+    while stop_event is None or not stop_event.is_set():
+        if not task_queue.has_pending('compact_storage'):
+            task_queue.enqueue('compact_storage', {})
+        time.sleep(interval_hours * 3600)
+
+# Queue job kind -> handler taking the job payload.
+HANDLERS = {
+    'fetch': lambda payload: fetch_task_wrapper(payload.get('date_range'), payload.get('categories'), payload.get('keywords')),
+    'single_analysis': lambda payload: run_analysis_for_paper(payload['paper']),
+    'bulk_analysis': lambda payload: analysis_task_wrapper(payload['papers'], payload.get('email'), payload.get('job_id'),
+                                                           payload.get('cascade')),
+    'email_result': lambda payload: email_result_task(payload['paper'], payload['email']),
+    'compact_storage': lambda payload: compact_storage_task(payload.get('cold_after_days')),
+    'reanalysis': lambda payload: reanalysis_task(payload.get('filters'), payload.get('job_id')),
+    'prefetch': lambda payload: prefetcher.run_prefetch(payload['generation'], payload.get('keywords')),
+}
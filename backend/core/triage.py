@@ -0,0 +1,229 @@
+import os
+import re
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from core import accounting, llm_cache, llm_router
+from core.db import get_connection
+from core.job_store import PIPELINE_DB_FILE
+
+# First tier of the bulk analysis cascade: a small, fast model scores each paper's
+# abstract against the user's stated interests, several papers per request. Only the
+# papers scoring at least the threshold (optionally capped to the top K) go on to the
+# expensive download -> parse -> full-text analysis pipeline. Every score and reason is
+# stored per job so the selection can be reviewed (/api/triage).
+#
+# The model comes from the 'triage' role (LLM_TRIAGE_PROVIDERS or DASHSCOPE_TRIAGE_*)
+# and falls back to the analysis model when no triage model is configured. Papers whose
+# batch fails are kept rather than silently dropped.
+
+PROMPT_TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), '..', 'prompts', 'triage_prompt.txt')
+
+TRIAGE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS triage_scores (
+    job_id TEXT NOT NULL,
+    entry_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    score REAL,
+    reason TEXT NOT NULL,
+    selected INTEGER NOT NULL,
+    model TEXT,
+    interests TEXT NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (job_id, entry_id)
+);
+CREATE INDEX IF NOT EXISTS idx_triage_scores_created ON triage_scores(created);
+"""
+
+logger = logging.getLogger(__name__)
+
+def _db():
+    return get_connection(PIPELINE_DB_FILE, TRIAGE_SCHEMA)
+
+def load_prompt_template():
+    with open(PROMPT_TEMPLATE_PATH, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def role():
+    return 'triage' if llm_router.get_providers('triage') else 'analysis'
+
+def enabled():
+    """Whether bulk analyses use the cascade unless the request says otherwise (needs TRIAGE_INTERESTS)."""
+    return os.getenv("TRIAGE_CASCADE", "false").lower() in ("1", "true", "yes") and bool(default_interests())
+
+def default_interests():
+    return os.getenv("TRIAGE_INTERESTS", "").strip()
+
+def default_threshold():
+    return float(os.getenv("TRIAGE_THRESHOLD", "6"))
+
+def default_top_k():
+    """0 = no cap on the number of papers passing triage."""
+    return int(os.getenv("TRIAGE_TOP_K", "0"))
+
+def batch_size():
+    return max(1, int(os.getenv("TRIAGE_BATCH_SIZE", "10")))
+
+def concurrency():
+    return max(1, int(os.getenv("TRIAGE_CONCURRENCY", "2")))
+
+def batch_count(paper_count):
+    return -(-paper_count // batch_size())
+
+# --- Scoring ---
+
+def _paper_text(paper):
+    return f"Title: {paper.get('title', '')}\nAbstract: {paper.get('summary', '')}"
+
+def _parse_scores(text, count):
+    """Maps batch position (1-based) -> {"score", "reason"} from the model's JSON answer."""
+    match = re.search(r"\[.*\]", text or '', re.DOTALL)
+    if not match:
+        raise ValueError("No JSON array in the triage response.")
+    scores = {}
+    for item in json.loads(match.group(0)):
+        try:
+            position = int(item['id'])
+            score = min(10.0, max(0.0, float(item['score'])))
+        except (KeyError, TypeError, ValueError):
+            continue
+        if 1 <= position <= count:
+            scores[position] = {"score": score, "reason": str(item.get('reason', '')).strip()}
+    return scores
+
+def _score_batch(batch, interests, prompt_template):
+    """Scores one batch in a single request. Returns entry_id -> {"score", "reason"} (None on failure)."""
+    accounting.wait_for_budget()
+    prompt = prompt_template.replace('{interests}', interests) + "\n\n---\n\n" + "\n\n".join(
+        f"[{position}]\n{_paper_text(paper)}" for position, paper in enumerate(batch, start=1))
+    try:
+        started = time.monotonic()
+        completion, provider = llm_router.complete_routed(role(), [{"role": "user", "content": prompt}])
+        accounting.record_completion(accounting.STAGE_TRIAGE, completion, time.monotonic() - started,
+                                     model=provider.model)
+        scores = _parse_scores(completion.choices[0].message.content, len(batch))
+    except Exception as e:
+        logger.error(f"Triage of a batch of {len(batch)} papers failed: {e}")
+        return {paper['entry_id']: None for paper in batch}
+    return {paper['entry_id']: scores.get(position) for position, paper in enumerate(batch, start=1)}
+
+def score_papers(papers, interests):
+    """
+    Scores every paper's abstract against `interests`. Returns entry_id -> {"score", "reason"},
+    or None for papers the model could not score. Scores are cached per paper.
+    """
+    prompt_template = load_prompt_template()
+    model_name = llm_router.route_id(role())
+    results, pending, cache_keys = {}, [], {}
+    for paper in papers:
+        key, prompt_hash = llm_cache.make_key(prompt_template, model_name, f"{interests}\0{_paper_text(paper)}")
+        cache_keys[paper['entry_id']] = (key, prompt_hash)
+        cached = llm_cache.get(key)
+        if cached is not None:
+            results[paper['entry_id']] = json.loads(cached)
+        else:
+            pending.append(paper)
+
+    size = batch_size()
+    batches = [pending[i:i + size] for i in range(0, len(pending), size)]
+    logger.info(f"Triaging {len(pending)} abstracts in {len(batches)} batches with {model_name} "
+                f"({len(papers) - len(pending)} cached).")
+    with ThreadPoolExecutor(max_workers=concurrency()) as executor:
+        for batch_scores in executor.map(lambda batch: _score_batch(batch, interests, prompt_template),
+                                         batches):
+            for entry_id, scored in batch_scores.items():
+                results[entry_id] = scored
+                if scored is not None:
+                    key, prompt_hash = cache_keys[entry_id]
+                    llm_cache.put(key, prompt_hash, model_name, json.dumps(scored, ensure_ascii=False))
+    return results
+
+def select(papers, scores, threshold, top_k=0):
+    """
+    The papers that continue to full-text analysis, in their original order: those scoring
+    at least `threshold`, capped to the `top_k` best (0 = no cap). Unscored papers pass the
+    threshold but rank last for the cap.
+    """
+    passing = [paper for paper in papers
+               if scores.get(paper['entry_id']) is None or scores[paper['entry_id']]['score'] >= threshold]
+    if top_k and len(passing) > top_k:
+        ranked = sorted(passing, key=lambda paper: -(scores.get(paper['entry_id']) or {"score": -1})['score'])
+        keep = {paper['entry_id'] for paper in ranked[:top_k]}
+        passing = [paper for paper in passing if paper['entry_id'] in keep]
+    return passing
+
+def run(papers, interests, threshold=None, top_k=None, job_id=None):
+    """Scores, selects and records a triage. Returns (selected papers, per-paper results)."""
+    threshold = default_threshold() if threshold is None else float(threshold)
+    top_k = default_top_k() if top_k is None else int(top_k)
+    scores = score_papers(papers, interests)
+    selected = select(papers, scores, threshold, top_k)
+    selected_ids = {paper['entry_id'] for paper in selected}
+    model_name = llm_router.route_id(role())
+    now = time.time()
+    results = []
+    for paper in papers:
+        scored = scores.get(paper['entry_id'])
+        results.append({
+            "entry_id": paper['entry_id'],
+            "title": paper.get('title', ''),
+            "score": scored['score'] if scored else None,
+            "reason": scored['reason'] if scored else "Triage failed.",
+            "selected": paper['entry_id'] in selected_ids,
+        })
+    _db().executemany(
+        "INSERT OR REPLACE INTO triage_scores (job_id, entry_id, title, score, reason, selected, model, interests, created) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [(job_id or '', r['entry_id'], r['title'], r['score'], r['reason'], int(r['selected']), model_name, interests, now)
+         for r in results]
+    )
+    logger.info(f"Triage kept {len(selected)} of {len(papers)} papers (threshold {threshold}, top_k {top_k or 'none'}).")
+    return selected, results
+
+# --- Review ---
+
+def get_results(job_id=None):
+    """Stored triage results of a job (the most recent one by default), best scores first."""
+    conn = _db()
+    if job_id is None:
+        row = conn.execute("SELECT job_id FROM triage_scores ORDER BY created DESC LIMIT 1").fetchone()
+        if row is None:
+            return None
+        job_id = row['job_id']
+    rows = conn.execute(
+        "SELECT entry_id, title, score, reason, selected, model, interests, created FROM triage_scores "
+        "WHERE job_id = ? ORDER BY score IS NULL, score DESC, title", (job_id,)
+    ).fetchall()
+    if not rows:
+        return None
+    return {
+        "job_id": job_id,
+        "interests": rows[0]['interests'],
+        "model": rows[0]['model'],
+        "created": rows[0]['created'],
+        "total": len(rows),
+        "selected": sum(row['selected'] for row in rows),
+        "papers": [{"entry_id": row['entry_id'], "title": row['title'], "score": row['score'],
+                    "reason": row['reason'], "selected": bool(row['selected'])} for row in rows],
+    }
+
+def pass_rate(window=500):
+    """Fraction of recently triaged papers that passed (1.0 without history), for estimates."""
+    row = _db().execute(
+        "SELECT COUNT(*) AS total, COALESCE(SUM(selected), 0) AS selected FROM "
+        "(SELECT selected FROM triage_scores ORDER BY created DESC LIMIT ?)", (window,)
+    ).fetchone()
+    return row['selected'] / row['total'] if row['total'] else 1.0
+
+def report_markdown(results, interests):
+    """A review table of the triage, attached to the results email."""
+    lines = ["# Triage Report", "", f"Interests: {interests}", "",
+             f"{sum(r['selected'] for r in results)} of {len(results)} papers passed to full-text analysis.", "",
+             "| Score | Selected | Title | Reason |", "| --- | --- | --- | --- |"]
+    for r in sorted(results, key=lambda r: -(r['score'] if r['score'] is not None else -1)):
+        score = '-' if r['score'] is None else f"{r['score']:g}"
+        title = r['title'].replace('|', '\\|')
+        reason = r['reason'].replace('|', '\\|').replace('\n', ' ')
+        lines.append(f"| {score} | {'yes' if r['selected'] else 'no'} | {title} | {reason} |")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,34 @@
+import sys
+import argparse
+import logging
+from core import exporter
+
+# Configure logging for the script (stderr, so that '--out -' can stream to stdout)
+logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+logger = logging.getLogger(__name__)
+
+if __name__ == '__main__':
+    """
+    Exports stored analyses to a zip or tar archive, streamed to disk as it is built.
+    """
+    parser = argparse.ArgumentParser(description="Export stored paper analyses to a zip or tar archive.")
+    parser.add_argument("--out", "-o", type=str, help="Output file, or '-' for stdout (default: arxiv_analyses_<date>.<ext>).")
+    parser.add_argument("--format", "-f", choices=list(exporter.FORMATS), default="zip", help="Archive format.")
+    parser.add_argument("--images", action="store_true", help="Include the extracted images.")
+    parser.add_argument("--from", dest="published_from", type=str, help="Earliest publication date (e.g. 2025-01 or 2025-01-15).")
+    parser.add_argument("--to", dest="published_to", type=str, help="Latest publication date, inclusive prefix.")
+    parser.add_argument("--categories", type=str, help="Comma-separated categories (any match), e.g. cs.LG,cs.AI.")
+    parser.add_argument("--query", "-q", type=str, help="Only papers whose title or entry id contains this text.")
+    parser.add_argument("--ids", type=str, help="Comma-separated short ids to export.")
+    args = parser.parse_args()
+
+    filters = {key: value for key, value in (('published_from', args.published_from),
+                                             ('published_to', args.published_to),
+                                             ('query', args.query)) if value}
+    for key, value in (('categories', args.categories), ('short_ids', args.ids)):
+        if value:
+            filters[key] = [item.strip() for item in value.split(',') if item.strip()]
+
+    out = args.out or exporter.archive_filename(args.format)
+    stats = exporter.export_to_file(out, filters, args.format, args.images)
+    logger.info(f"Wrote {stats['papers']} analyses to {out} ({stats['skipped']} skipped).")
@@ -0,0 +1,105 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+import statistics
+
+# Import-time benchmark for the backend entry points. Every run starts a fresh
+# interpreter (cold start, as for a cron run of main.py or a recycled worker), imports
+# the entry point and reports its import time and the slowest modules (from
+# `python -X importtime`). It fails when an entry point exceeds its budget or
+# imports one of the heavy client libraries that must only be loaded on first use.
+#
+#   python import_benchmark.py
+#   python import_benchmark.py --repeat 10 --top 15 main worker
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Entry point -> import budget in milliseconds (wall time of the import statement).
+DEFAULT_BUDGETS_MS = {
+    'main': 150,
+    'worker': 150,
+    'export': 150,
+    'app': 600,
+}
+
+# Libraries that no entry point may import at startup.
+LAZY_MODULES = ('openai', 'arxiv', 'requests', 'dateutil', 'httpx', 'smtplib')
+
+CHILD_SCRIPT = """
+import sys, time, json
+started = time.perf_counter()
+import {module}
+import_ms = (time.perf_counter() - started) * 1000
+loaded = sorted(name for name in {lazy!r} if name in sys.modules)
+print(json.dumps({{"import_ms": import_ms, "loaded": loaded}}))
+"""
+
+def _parse_importtime(stderr):
+    """(cumulative microseconds, module) pairs from `python -X importtime` output."""
+    rows = []
+    for line in stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), name.strip()))
+    return rows
+
+def measure(module, repeat):
+    """Runs `repeat` cold imports of `module`. Returns the measurements and the last importtime rows."""
+    # External mode keeps app.py from starting inline workers on import.
+    env = dict(os.environ, PIPELINE_MODE="external")
+    import_ms, loaded, rows = [], set(), []
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", CHILD_SCRIPT.format(module=module, lazy=LAZY_MODULES)],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit code {proc.returncode}"
+            return {"error": error}
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        import_ms.append(result["import_ms"])
+        loaded.update(result["loaded"])
+        rows = _parse_importtime(proc.stderr)
+    return {
+        "median_ms": statistics.median(import_ms),
+        "min_ms": min(import_ms),
+        "max_ms": max(import_ms),
+        "loaded": sorted(loaded),
+        "slowest": sorted(rows, reverse=True),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start import time of the backend entry points.")
+    parser.add_argument("targets", nargs="*", default=list(DEFAULT_BUDGETS_MS),
+                        help=f"Entry points to import (default: {', '.join(DEFAULT_BUDGETS_MS)}).")
+    parser.add_argument("--repeat", type=int, default=5, help="Cold imports per entry point (the median is reported).")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest modules to list per entry point.")
+    parser.add_argument("--budget-scale", type=float, default=1.0,
+                        help="Multiplies every budget, e.g. 2 on a slow CI machine.")
+    args = parser.parse_args()
+
+    failures = 0
+    for target in args.targets:
+        budget_ms = DEFAULT_BUDGETS_MS.get(target, DEFAULT_BUDGETS_MS['main']) * args.budget_scale
+        result = measure(target, max(1, args.repeat))
+        print(f"\n=== {target} ===")
+        if "error" in result:
+            print(f"Import failed: {result['error']} FAILED")
+            failures += 1
+            continue
+        print(f"import {result['median_ms']:.1f} ms median (min {result['min_ms']:.1f}, max {result['max_ms']:.1f}), "
+              f"budget {budget_ms:.0f} ms")
+        for cumulative_us, name in result["slowest"][:args.top]:
+            print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+        within_budget = result["median_ms"] <= budget_ms
+        print(f"Within budget: {'OK' if within_budget else 'FAILED'}")
+        print(f"No eager heavy imports: {'OK' if not result['loaded'] else 'FAILED (' + ', '.join(result['loaded']) + ')'}")
+        failures += (not within_budget) + bool(result["loaded"])
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
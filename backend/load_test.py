@@ -0,0 +1,251 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import threading
+import urllib.error
+import urllib.request
+
+# Load-test harness for the Flask backend. It seeds a synthetic warehouse of analyses
+# and simulates browser tabs polling the API the way the frontend does, then reports
+# throughput, latency percentiles and error rates per endpoint.
+#
+#   python load_test.py seed --papers 5000
+#   python load_test.py run --clients 40 --duration 60 --url http://localhost:5001
+#   python load_test.py clean
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULTS_DIR = os.path.join(BACKEND_DIR, 'data', 'analysis_results')
+
+# Synthetic short ids use the 9901.xxxxx prefix, which no real arXiv id can have
+# (new-style ids start at 0704), so they can be told apart and removed safely.
+SYNTHETIC_ID_RE = re.compile(r'^9901\.\d{5}v1$')
+SYNTHETIC_CATEGORIES = ['cs.LG', 'cs.AI', 'cs.CV', 'cs.CL', 'stat.ML', 'cs.RO', 'eess.IV', 'q-bio.NC']
+
+# Each simulated tab issues these requests periodically (seconds), like the frontend:
+# the status bar polls every 2 s, an open analysis page every 3 s, the recent list is
+# reloaded on focus and the warehouse page on navigation.
+REQUEST_MIX = [
+    ("status", "/api/status", 2.0),
+    ("analysis-status", "/api/analysis-status/{short_id}", 3.0),
+    ("recent-analyses", "/api/recent-analyses", 30.0),
+    ("all-analyses", "/api/all-analyses", 60.0),
+    ("results", "/api/results?page=1&per_page=50", 30.0),
+    ("facets", "/api/facets?category=cs.LG", 30.0),
+]
+
+# --- Seeding ---
+
+def synthetic_short_id(i):
+    return f"9901.{i:05d}v1"
+
+def _facets():
+    sys.path.append(BACKEND_DIR)
+    from core import facets
+    return facets
+
+def seed_warehouse(results_dir, count, analysis_kb=20, seed=0):
+    """Writes `count` synthetic analyses (metadata.json + analysis.md) into results_dir and indexes their facets."""
+    facets = _facets()
+    rng = random.Random(seed)
+    filler = ("Synthetic analysis paragraph with some **markdown** and a formula $E = mc^2$. " * 12 + "\n\n")
+    body = filler * max(1, analysis_kb * 1024 // len(filler))
+    for i in range(count):
+        short_id = synthetic_short_id(i)
+        paper_dir = os.path.join(results_dir, short_id)
+        os.makedirs(paper_dir, exist_ok=True)
+        metadata = {
+            "entry_id": f"http://arxiv.org/abs/{short_id}",
+            "title": f"Synthetic Paper {i}: Scaling Laws for Load Testing",
+            "summary": "A synthetic abstract used for load testing. " * 10,
+            "authors": [f"Author {rng.randint(1, 500)}" for _ in range(rng.randint(1, 8))],
+            "pdf_url": f"http://arxiv.org/pdf/{short_id}",
+            "published": f"20{rng.randint(20, 25)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00+00:00",
+            "categories": rng.sample(SYNTHETIC_CATEGORIES, rng.randint(1, 3)),
+            "extracted_image_filenames": [],
+        }
+        with open(os.path.join(paper_dir, 'metadata.json'), 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=4)
+        with open(os.path.join(paper_dir, 'analysis.md'), 'w', encoding='utf-8') as f:
+            f.write(f"# {metadata['title']}\n\n{body}")
+        facets.index_paper(short_id, metadata)
+    print(f"Seeded {count} synthetic analyses into {results_dir}")
+
+def seed_fetch_results(count):
+    """Stores `count` synthetic fetched papers so /api/results has something to page through."""
+    sys.path.append(BACKEND_DIR)
+    from core import state_store
+    papers = [{
+        "entry_id": f"http://arxiv.org/abs/{synthetic_short_id(i)}",
+        "title": f"Synthetic Paper {i}",
+        "summary": "A synthetic abstract used for load testing. " * 10,
+        "authors": [f"Author {i % 500}"],
+        "pdf_url": f"http://arxiv.org/pdf/{synthetic_short_id(i)}",
+        "published": "2025-01-01T00:00:00+00:00",
+        "categories": [SYNTHETIC_CATEGORIES[i % len(SYNTHETIC_CATEGORIES)]],
+    } for i in range(count)]
+    state_store.set_results(papers)
+    print(f"Seeded {count} synthetic fetch results")
+
+def clean_warehouse(results_dir):
+    facets = _facets()
+    removed = 0
+    if os.path.isdir(results_dir):
+        for name in os.listdir(results_dir):
+            if SYNTHETIC_ID_RE.match(name):
+                shutil.rmtree(os.path.join(results_dir, name), ignore_errors=True)
+                facets.remove_paper(name)
+                removed += 1
+    print(f"Removed {removed} synthetic analyses from {results_dir}")
+
+# --- Load generation ---
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.statuses = {}
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def run_client(base_url, mix, paper_count, deadline, speed, stats, lock, rng):
+    """One simulated browser tab: issues each request of the mix on its own period until the deadline."""
+    now = time.monotonic()
+    # Stagger the first requests so that tabs are not in lockstep.
+    next_due = {name: now + rng.uniform(0, period / speed) for name, _, period in mix}
+    short_id = synthetic_short_id(rng.randrange(paper_count)) if paper_count else "0000.00000"
+    while True:
+        name = min(next_due, key=next_due.get)
+        due = next_due[name]
+        if due >= deadline:
+            return
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        path, period = next(((p, per) for n, p, per in mix if n == name))
+        url = base_url + path.format(short_id=short_id)
+
+        started = time.perf_counter()
+        status, failed = None, False
+        try:
+            with urllib.request.urlopen(url, timeout=30) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status, failed = e.code, True
+        except Exception as e:
+            status, failed = type(e).__name__, True
+        elapsed = time.perf_counter() - started
+
+        with lock:
+            endpoint = stats[name]
+            endpoint.latencies.append(elapsed)
+            endpoint.statuses[status] = endpoint.statuses.get(status, 0) + 1
+            if failed:
+                endpoint.errors += 1
+        next_due[name] = due + period / speed
+
+def run_load(base_url, clients, duration, paper_count, speed=1.0, skip=(), seed=0):
+    mix = [entry for entry in REQUEST_MIX if entry[0] not in skip]
+    stats = {name: EndpointStats() for name, _, _ in mix}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    rng = random.Random(seed)
+    threads = [
+        threading.Thread(target=run_client,
+                         args=(base_url, mix, paper_count, deadline, speed, stats, lock, random.Random(rng.random())),
+                         daemon=True)
+        for _ in range(clients)
+    ]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats, time.monotonic() - started
+
+def summarize(stats, elapsed):
+    """Per-endpoint report: request count, throughput, latency percentiles (ms) and error rate."""
+    report = {}
+    for name, endpoint in stats.items():
+        latencies = sorted(endpoint.latencies)
+        count = len(latencies)
+        report[name] = {
+            "requests": count,
+            "rps": round(count / elapsed, 2) if elapsed else 0,
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+            "p90_ms": round(percentile(latencies, 0.90) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+            "max_ms": round((latencies[-1] if latencies else 0) * 1000, 1),
+            "error_rate": round(endpoint.errors / count, 4) if count else 0,
+            "statuses": {str(k): v for k, v in endpoint.statuses.items()},
+        }
+    return report
+
+def print_report(report, elapsed):
+    header = f"{'endpoint':<18}{'requests':>9}{'rps':>9}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}{'errors':>8}"
+    print(f"\nRan for {elapsed:.1f}s")
+    print(header)
+    print("-" * len(header))
+    total = 0
+    for name, row in report.items():
+        total += row["requests"]
+        print(f"{name:<18}{row['requests']:>9}{row['rps']:>9.1f}{row['p50_ms']:>9.1f}{row['p90_ms']:>9.1f}"
+              f"{row['p99_ms']:>9.1f}{row['max_ms']:>9.1f}{row['error_rate']:>8.1%}")
+    print("-" * len(header))
+    print(f"{'total':<18}{total:>9}{total / elapsed if elapsed else 0:>9.1f}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Seed a synthetic warehouse and load-test the backend API.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = subparsers.add_parser("seed", help="Write synthetic analyses (and optionally fetch results).")
+    seed_parser.add_argument("--papers", "-n", type=int, default=1000, help="Number of synthetic analyses.")
+    seed_parser.add_argument("--analysis-kb", type=int, default=20, help="Size of each analysis.md in KB.")
+    seed_parser.add_argument("--fetch-results", type=int, default=0,
+                             help="Also store this many synthetic fetch results for /api/results.")
+    seed_parser.add_argument("--results-dir", default=DEFAULT_RESULTS_DIR)
+
+    run_parser = subparsers.add_parser("run", help="Simulate concurrent clients against a running server.")
+    run_parser.add_argument("--url", default="http://localhost:5001", help="Base URL of the backend.")
+    run_parser.add_argument("--clients", "-m", type=int, default=20, help="Number of simulated browser tabs.")
+    run_parser.add_argument("--duration", "-d", type=float, default=30, help="Test duration in seconds.")
+    run_parser.add_argument("--papers", "-n", type=int, default=1000,
+                            help="Number of seeded papers the analysis pages are spread over.")
+    run_parser.add_argument("--speed", type=float, default=1.0,
+                            help="Multiplies every client's request rate (e.g. 10 = ten times the frontend's polling).")
+    run_parser.add_argument("--skip", default="", help="Comma-separated endpoint names to leave out of the mix.")
+    run_parser.add_argument("--json", dest="json_path", help="Also write the report to this JSON file.")
+    run_parser.add_argument("--seed", type=int, default=0, help="Random seed for reproducible runs.")
+
+    clean_parser = subparsers.add_parser("clean", help="Remove the synthetic analyses.")
+    clean_parser.add_argument("--results-dir", default=DEFAULT_RESULTS_DIR)
+
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        seed_warehouse(args.results_dir, args.papers, args.analysis_kb)
+        if args.fetch_results:
+            seed_fetch_results(args.fetch_results)
+    elif args.command == "clean":
+        clean_warehouse(args.results_dir)
+    else:
+        skip = {name.strip() for name in args.skip.split(',') if name.strip()}
+        print(f"Running {args.clients} clients against {args.url} for {args.duration}s (speed x{args.speed})...")
+        stats, elapsed = run_load(args.url.rstrip('/'), args.clients, args.duration, args.papers,
+                                  args.speed, skip, args.seed)
+        report = summarize(stats, elapsed)
+        print_report(report, elapsed)
+        if args.json_path:
+            with open(args.json_path, 'w', encoding='utf-8') as f:
+                json.dump({"url": args.url, "clients": args.clients, "duration": elapsed,
+                           "speed": args.speed, "endpoints": report}, f, indent=4)
+            print(f"Report written to {args.json_path}")
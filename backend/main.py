@@ -1,9 +1,8 @@
 import argparse
 import logging
-from core import arxiv_fetcher, email_sender
-from core.history_manager import save_processed_ids
-from core.analysis_manager import process_paper_for_email
-import os
+from core import analyzer, arxiv_fetcher, email_sender
+from core.history_manager import save_processed_papers
+from core.analysis_manager import build_email_file, get_full_text_analysis
 
 # Configure logging for the script
 logging.basicConfig(level=logging.INFO)
@@ -19,26 +18,35 @@ def run_subscription_service(date=None):
         logger.info("Fetching papers from arXiv...")
         papers_by_category = arxiv_fetcher.fetch_papers(date_range=date)
         
-        all_papers = [p for papers in papers_by_category.values() for p in papers]
+        # A paper listed under several categories is analyzed once.
+        all_papers = list({p['entry_id']: p for papers in papers_by_category.values() for p in papers}.values())
         total_papers = len(all_papers)
         logger.info(f"Found {total_papers} total papers.")
 
         if total_papers > 0:
             logger.info("Processing papers (with caching)... ")
             files_to_zip = []
+            analyzed_papers = []
             # A dummy task_status object for the analysis manager
             task_status = {'message': ''}
             for paper in all_papers:
                 # This will use the cache if available, or generate and save a new analysis
-                files_to_zip.append(process_paper_for_email(paper, task_status, logger))
-            
+                content = get_full_text_analysis(paper, task_status, logger)
+                if analyzer.is_failed_result(content):
+                    logger.error(f"Skipping {paper['entry_id']}: {content}")
+                    continue
+                files_to_zip.append(build_email_file(paper, content))
+                analyzed_papers.append(paper)
+            if not files_to_zip:
+                return {"status": "error", "message": f"All {total_papers} papers failed to analyze."}
+
             logger.info("Sending email notification with zip attachment...")
-            email_sent = email_sender.send_email(files_to_zip, total_papers)
+            email_sent = email_sender.send_email(files_to_zip, len(files_to_zip))
 
             if email_sent:
                 # Save all processed papers to the history
-                save_processed_ids(all_papers)
-                return {"status": "success", "message": f"Process finished. Found and emailed {total_papers} papers."}
+                save_processed_papers(analyzed_papers)
+                return {"status": "success", "message": f"Process finished. Found {total_papers} papers and emailed {len(files_to_zip)} analyses."}
             else:
                 return {"status": "error", "message": "Email sending failed."}
         else:
@@ -0,0 +1,133 @@
+import os
+import sys
+import threading
+import xml.etree.ElementTree as ET
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the parent directory to the sys.path to allow imports from core
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import arxiv_fetcher
+
+# --- Feed samples ---
+# Responses laid out as export.arxiv.org/api/query returns them: a multi-line title,
+# an abstract with surrounding whitespace, several authors with affiliations, the
+# abstract/pdf/doi links and a primary category that is repeated among the categories.
+
+FEED_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <link href="http://arxiv.org/api/query?search_query%3Dcat%3Acs.LG%26id_list%3D%26start%3D{start}%26max_results%3D2" rel="self" type="application/atom+xml"/>
+  <title type="html">ArXiv Query: search_query=cat:cs.LG&amp;id_list=&amp;start={start}&amp;max_results=2</title>
+  <id>http://arxiv.org/api/Cmx1YcuXRUQ6vAz3Bh2cvFVDnbE</id>
+  <updated>2025-03-04T00:00:00-05:00</updated>
+  <opensearch:totalResults xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">{total}</opensearch:totalResults>
+  <opensearch:startIndex xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">{start}</opensearch:startIndex>
+  <opensearch:itemsPerPage xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">2</opensearch:itemsPerPage>
+"""
+
+ENTRY_LG = """  <entry>
+    <id>http://arxiv.org/abs/2503.01234v2</id>
+    <updated>2025-03-03T18:59:58Z</updated>
+    <published>2025-03-01T17:04:12Z</published>
+    <title>Sparse Mixture-of-Experts Routing
+  for Long-Context Language Models</title>
+    <summary>  We study routing in sparse mixture-of-experts models.
+Our method scales to 1M tokens.
+</summary>
+    <author>
+      <name>Jane Doe</name>
+      <arxiv:affiliation xmlns:arxiv="http://arxiv.org/schemas/atom">Example University</arxiv:affiliation>
+    </author>
+    <author>
+      <name>John Smith</name>
+    </author>
+    <arxiv:doi xmlns:arxiv="http://arxiv.org/schemas/atom">10.1000/example.2025.01234</arxiv:doi>
+    <link title="doi" href="http://dx.doi.org/10.1000/example.2025.01234" rel="related"/>
+    <arxiv:comment xmlns:arxiv="http://arxiv.org/schemas/atom">12 pages, 4 figures</arxiv:comment>
+    <link href="http://arxiv.org/abs/2503.01234v2" rel="alternate" type="text/html"/>
+    <link title="pdf" href="http://arxiv.org/pdf/2503.01234v2" rel="related" type="application/pdf"/>
+    <arxiv:primary_category xmlns:arxiv="http://arxiv.org/schemas/atom" term="cs.LG" scheme="http://arxiv.org/schemas/atom"/>
+    <category term="cs.LG" scheme="http://arxiv.org/schemas/atom"/>
+    <category term="cs.CL" scheme="http://arxiv.org/schemas/atom"/>
+  </entry>
+"""
+
+ENTRY_CV = """  <entry>
+    <id>http://arxiv.org/abs/2503.00042v1</id>
+    <updated>2025-02-28T09:00:00Z</updated>
+    <published>2025-02-28T09:00:00Z</published>
+    <title>A Note on Image Tokenizers</title>
+    <summary>Short abstract.</summary>
+    <author>
+      <name>Ada Lovelace</name>
+    </author>
+    <link href="http://arxiv.org/abs/2503.00042v1" rel="alternate" type="text/html"/>
+    <link title="pdf" href="http://arxiv.org/pdf/2503.00042v1" rel="related" type="application/pdf"/>
+    <arxiv:primary_category xmlns:arxiv="http://arxiv.org/schemas/atom" term="cs.CV" scheme="http://arxiv.org/schemas/atom"/>
+    <category term="cs.CV" scheme="http://arxiv.org/schemas/atom"/>
+  </entry>
+"""
+
+def feed(start, total, *entries):
+    return (FEED_HEADER.format(start=start, total=total) + "".join(entries) + "</feed>\n").encode('utf-8')
+
+# Pages served by offset; the first request for offset 2 gets an empty page, as the API sometimes returns.
+PAGES = {0: [feed(0, 3, ENTRY_LG, ENTRY_CV)], 2: [feed(2, 3), feed(2, 3, ENTRY_LG.replace('2503.01234v2', '2503.09999v1'))]}
+requests_seen = []
+
+class FakeArxivHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        start = int(params['start'][0])
+        requests_seen.append(params)
+        pages = PAGES[start]
+        body = pages.pop(0) if len(pages) > 1 else pages[0]
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/atom+xml; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def test_parse_entry():
+    print("\n--- Parsing one feed entry ---")
+    entry = ET.fromstring(feed(0, 1, ENTRY_LG)).find(arxiv_fetcher.ATOM + 'entry')
+    record = arxiv_fetcher._parse_entry(entry)
+    print(f"entry_id: {'OK' if record.entry_id == 'http://arxiv.org/abs/2503.01234v2' else 'FAILED'} ({record.entry_id})")
+    print(f"Title whitespace collapsed: "
+          f"{'OK' if record.title == 'Sparse Mixture-of-Experts Routing for Long-Context Language Models' else 'FAILED'}")
+    summary = "We study routing in sparse mixture-of-experts models.\nOur method scales to 1M tokens."
+    print(f"Summary stripped: {'OK' if record.summary == summary else 'FAILED'}")
+    print(f"Authors: {'OK' if record['authors'] == ['Jane Doe', 'John Smith'] else 'FAILED'} ({record['authors']})")
+    print(f"PDF link, not the DOI link: {'OK' if record.pdf_url == 'http://arxiv.org/pdf/2503.01234v2' else 'FAILED'}")
+    print(f"Published as UTC ISO time: {'OK' if record.published == '2025-03-01T17:04:12+00:00' else 'FAILED'} "
+          f"({record.published})")
+    print(f"Categories: {'OK' if record['categories'] == ['cs.LG', 'cs.CL'] else 'FAILED'} ({record['categories']})")
+
+def test_fetch_pages():
+    print("\n--- Fetching across pages ---")
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeArxivHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    arxiv_fetcher.ARXIV_API_URL = f"http://127.0.0.1:{server.server_address[1]}/api/query"
+    arxiv_fetcher.PAGE_SIZE = 2
+    arxiv_fetcher.PAGE_DELAY_SECONDS = 0
+    try:
+        result = arxiv_fetcher.fetch_papers(categories=['cs.LG', 'cs.CL', 'cs.CV', 'cs.AI'])
+    finally:
+        server.shutdown()
+
+    ids = {category: [paper['entry_id'].split('/')[-1] for paper in papers] for category, papers in result.items()}
+    print(f"Papers by category: {ids}")
+    print(f"Empty page retried: {'OK' if [int(p['start'][0]) for p in requests_seen] == [0, 2, 2] else 'FAILED'}")
+    print(f"Query sorted by submission date: "
+          f"{'OK' if requests_seen[0]['sortBy'] == ['submittedDate'] and requests_seen[0]['sortOrder'] == ['descending'] else 'FAILED'}")
+    expected = {'cs.LG': ['2503.01234v2', '2503.09999v1'], 'cs.CL': ['2503.01234v2', '2503.09999v1'], 'cs.CV': ['2503.00042v1']}
+    print(f"Grouped by category, empty categories left out: {'OK' if ids == expected else 'FAILED'}")
+    print(f"Categories share one record: {'OK' if result['cs.LG'][0] is result['cs.CL'][0] else 'FAILED'}")
+
+if __name__ == "__main__":
+    test_parse_entry()
+    test_fetch_pages()
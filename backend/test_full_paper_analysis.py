@@ -25,39 +25,12 @@ PDF_PARSER_URL = os.getenv("PDF_PARSER_URL")
 def analyze_full_paper(markdown_content: str):
     """
     Analyzes the full markdown content of a paper using the project's analyzer.
+    Repeated runs on the same paper are answered from the LLM response cache.
     """
-    if not analyzer.client:
-        return "[Analysis Skipped: API client not initialized]"
-
     print("\n--- Starting Full Paper Analysis ---")
     print(f"Markdown content length: {len(markdown_content)} characters")
-
-    try:
-        # Use the same prompt template as the main application
-        prompt_template_path = os.path.join(os.path.dirname(__file__), 'prompts', 'analyzer_prompt.txt')
-        with open(prompt_template_path, 'r', encoding='utf-8') as f:
-            prompt_template = f.read()
-        
-        # We no longer have a separate title/abstract, so we adapt the prompt.
-        # We'll insert the full markdown where the abstract was expected.
-        prompt = prompt_template.format(title="Full Paper Analysis", abstract=markdown_content)
-
-        messages = [{"role": "user", "content": prompt}]
-        
-        print("Sending request to LLM API... (This may take a while)")
-        
-        completion = analyzer.client.chat.completions.create(
-            model="qwen-plus",
-            messages=messages
-        )
-        return completion.choices[0].message.content
-
-    except Exception as e:
-        print(f"\n---!!! An error occurred during LLM API call !!!---")
-        print(f"Error Type: {type(e).__name__}")
-        print(f"Error Details: {e}")
-        print("This might be due to the input context exceeding the model's maximum length.")
-        return f"[Analysis Failed]"
+    print("Sending request to LLM API... (This may take a while)")
+    return analyzer.analyze_full_text(markdown_content)
 
 def main():
     """Main function to run the test.
@@ -0,0 +1,122 @@
+import os
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the parent directory to the sys.path to allow imports from core
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# --- Configuration ---
+# Fake OpenAI-compatible endpoints, selected by URL prefix: /fast/v1, /slow/v1 and /broken/v1.
+FAST_LATENCY_SECONDS = 0.2
+SLOW_LATENCY_SECONDS = 5.0
+
+os.environ["LLM_MAX_RETRIES"] = "1"
+os.environ["LLM_CIRCUIT_FAILURES"] = "2"
+os.environ["LLM_CIRCUIT_COOLDOWN_SECONDS"] = "60"
+
+from core import accounting, llm_router
+
+stats = {"fast": 0, "slow": 0, "broken": 0, "slow_aborted": 0}
+stats_lock = threading.Lock()
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    """Mimics /chat/completions of providers with different speeds and health."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        provider = self.path.strip('/').split('/')[0]
+        with stats_lock:
+            stats[provider] += 1
+
+        if provider == 'broken':
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if provider == 'slow':
+            time.sleep(SLOW_LATENCY_SECONDS)
+        else:
+            time.sleep(FAST_LATENCY_SECONDS)
+
+        payload = json.dumps({
+            "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+            # Like real APIs, answer with a dated variant of the requested model.
+            "model": f"{body.get('model')}-2025-01-25",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": f"answer from {provider}"}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+        }).encode('utf-8')
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # The router cancelled this request after a hedge won.
+            with stats_lock:
+                stats["slow_aborted"] += 1
+
+def configure(base, providers):
+    """Points the 'analysis' role at the given fake providers and resets router state."""
+    os.environ["LLM_ANALYSIS_PROVIDERS"] = json.dumps([
+        dict({"name": name, "base_url": f"{base}/{name}/v1", "api_key": f"key-{name}", "model": f"model-{name}"}, **options)
+        for name, options in providers
+    ])
+    llm_router._providers.clear()
+
+def ask():
+    started = time.time()
+    try:
+        completion = llm_router.complete('analysis', [{"role": "user", "content": "hello"}])
+        return completion.choices[0].message.content, time.time() - started
+    except Exception as e:
+        return f"error: {e}", time.time() - started
+
+def main():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeProviderHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"Fake providers listening on {base}")
+
+    print("\n--- Hedging: slow primary, fast secondary, hedge after 0.5s ---")
+    configure(base, [("slow", {"hedge_after": 0.5}), ("fast", {})])
+    answer, elapsed = ask()
+    print(f"{answer!r} in {elapsed:.2f}s")
+    print(f"Hedged request won well before the slow one: {'OK' if answer.endswith('fast') and elapsed < 2 else 'FAILED'}")
+
+    print("\n--- Timeout: slow primary with a 1s budget, no hedging ---")
+    configure(base, [("slow", {"timeout": 1}), ("fast", {})])
+    answer, elapsed = ask()
+    print(f"{answer!r} in {elapsed:.2f}s")
+    print(f"Failed over after the timeout: {'OK' if answer.endswith('fast') and elapsed < 3 else 'FAILED'}")
+
+    print("\n--- Pricing: by the model of the provider that served the request ---")
+    configure(base, [("slow", {"timeout": 1}), ("fast", {})])
+    os.environ["LLM_PRICES"] = json.dumps({"model-fast": {"prompt": 0.001, "completion": 0.002}})
+    completion, provider = llm_router.complete_routed('analysis', [{"role": "user", "content": "hello"}])
+    cost = accounting.cost_of(provider.model, completion.usage.prompt_tokens, completion.usage.completion_tokens)
+    print(f"Served by {provider.name} ({provider.model}, API returned {completion.model!r}), cost {cost}")
+    print(f"Priced by the serving provider's model: {'OK' if provider.name == 'fast' and cost > 0 else 'FAILED'}")
+
+    print("\n--- Circuit breaker: broken primary ---")
+    configure(base, [("broken", {}), ("fast", {})])
+    for i in range(4):
+        answer, elapsed = ask()
+        print(f"Request {i + 1}: {answer!r} in {elapsed:.2f}s")
+    broken_requests = stats["broken"]
+    answer, elapsed = ask()
+    print(f"Request 5: {answer!r} in {elapsed:.2f}s; breaker states: {llm_router.health()['analysis']}")
+    print(f"Open circuit skips the broken provider: {'OK' if stats['broken'] == broken_requests else 'FAILED'}")
+
+    print(f"\nRequests per provider: {stats}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
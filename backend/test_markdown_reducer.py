@@ -0,0 +1,47 @@
+import os
+import sys
+
+# Add the parent directory to the sys.path to allow imports from core
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.markdown_reducer import reduce_markdown
+
+PAPER = """# A Paper
+
+# 1 Introduction
+We study things.
+
+## 1.1 Contributions
+We propose a new method and show it works.
+
+# 2 Method
+The method. ![](images/fig1.jpg)
+
+# 3 Checklist of Design Choices
+Every design choice is listed here.
+
+# Author Contributions
+A wrote the code.
+
+# Acknowledgements
+Thanks.
+
+# NeurIPS Paper Checklist
+1. Claims: yes.
+
+# References
+[1] Someone. A paper.
+"""
+
+def main():
+    reduced, report = reduce_markdown(PAPER)
+    print(f"Dropped sections: {report['dropped_sections']}")
+    print(f"'Contributions' subsection survives: {'OK' if 'We propose a new method' in reduced else 'FAILED'}")
+    print(f"Body section starting with 'Checklist' survives: {'OK' if 'Every design choice' in reduced else 'FAILED'}")
+    print(f"'Author Contributions' is dropped: {'OK' if 'A wrote the code' not in reduced else 'FAILED'}")
+    print(f"Paper checklist is dropped: {'OK' if 'Claims: yes' not in reduced else 'FAILED'}")
+    print(f"References are dropped: {'OK' if 'Someone. A paper' not in reduced else 'FAILED'}")
+    print(f"Figure references are kept: {'OK' if '![](images/fig1.jpg)' in reduced else 'FAILED'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import os
+import sys
+import json
+import time
+import uuid
+import base64
+import logging
+import tempfile
+import threading
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the parent directory to the sys.path to allow imports from core
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# --- Configuration ---
+DOWNLOAD_SECONDS = 1.0
+PARSE_SECONDS = 0.5
+LLM_SECONDS = 0.5
+RUN_ID = uuid.uuid4().hex[:8]
+
+stats = {"downloads": {}, "parsed": {}}
+stats_lock = threading.Lock()
+
+class FakeServicesHandler(BaseHTTPRequestHandler):
+    """Serves PDFs (GET), the miner-u /file_parse endpoint and an OpenAI-compatible chat endpoint."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        name = os.path.basename(self.path)
+        with stats_lock:
+            stats["downloads"][name] = stats["downloads"].get(name, 0) + 1
+        time.sleep(DOWNLOAD_SECONDS)
+        body = b"%PDF-1.4 fake " + name.encode('utf-8') * 1000
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path.endswith('/file_parse'):
+            message = BytesParser(policy=default_policy).parsebytes(
+                f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode('utf-8') + body
+            )
+            stems = [os.path.splitext(part.get_filename())[0] for part in message.iter_parts() if part.get_filename()]
+            with stats_lock:
+                for stem in stems:
+                    stats["parsed"][stem] = stats["parsed"].get(stem, 0) + 1
+            time.sleep(PARSE_SECONDS)
+            image = "data:image/png;base64," + base64.b64encode(b"png").decode('ascii')
+            self._send_json({"results": {
+                stem: {"md_content": f"# 1 Introduction\n{stem} run {RUN_ID}. ![](images/fig1.png)",
+                       "images": {"fig1.png": image}}
+                for stem in stems
+            }})
+        else:
+            time.sleep(LLM_SECONDS)
+            self._send_json({
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()), "model": "fake",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "## 分析\n\n![](images/fig1.png) ok"}}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+            })
+
+def make_paper(base, short_id):
+    return {"entry_id": f"http://arxiv.org/abs/{short_id}", "title": f"Paper {short_id}", "authors": ["A"],
+            "published": "2025-01-01", "categories": ["cs.LG"], "summary": "", "pdf_url": f"{base}/pdf/{short_id}"}
+
+def run_both(paper, prefetch_first, logger):
+    """Starts a prefetch and an analysis of `paper`, the second 0.2s after the first."""
+    outcomes = {}
+
+    def prefetch():
+        with scheduler.context(scheduler.BACKGROUND, paper['entry_id'].split('/')[-1]):
+            outcomes['prefetch'] = analysis_manager.prefetch_paper(paper, logger)
+
+    def analyze():
+        outcomes['analysis'] = analysis_manager.get_full_text_analysis(paper, {'message': ''}, logger)
+
+    first, second = (prefetch, analyze) if prefetch_first else (analyze, prefetch)
+    threads = [threading.Thread(target=first), threading.Thread(target=second)]
+    threads[0].start()
+    time.sleep(0.2)
+    threads[1].start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+def check(paper, outcomes, expected_prefetch, results_dir):
+    short_id = paper['entry_id'].split('/')[-1]
+    analysis = outcomes.get('analysis') or ''
+    leftovers = [name for name in os.listdir(os.path.join(results_dir, short_id)) if name.endswith('.tmp')]
+    print(f"Outcomes: prefetch={outcomes.get('prefetch')!r}, analysis={analysis[:40]!r}...")
+    print(f"Analysis succeeded: {'OK' if analysis.startswith('# Paper') else 'FAILED'}")
+    print(f"Prefetch outcome is '{expected_prefetch}': {'OK' if outcomes.get('prefetch') == expected_prefetch else 'FAILED'}")
+    print(f"Downloaded once: {'OK' if stats['downloads'].get(short_id) == 1 else 'FAILED'} "
+          f"({stats['downloads'].get(short_id)})")
+    print(f"Parsed once: {'OK' if stats['parsed'].get(short_id) == 1 else 'FAILED'} ({stats['parsed'].get(short_id)})")
+    print(f"No partial files left: {'OK' if not leftovers else 'FAILED'} {leftovers}")
+
+def main():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeServicesHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ.update(PDF_PARSER_URL=f"{base}/file_parse", PDF_PARSER_BATCH_WINDOW_SECONDS="0.1",
+                      DASHSCOPE_ANALYSIS_API_KEY="key", DASHSCOPE_ANALYSIS_BASE_URL=f"{base}/v1",
+                      DASHSCOPE_ANALYSIS_MODEL="fake")
+    os.environ.pop("LLM_ANALYSIS_PROVIDERS", None)
+
+    global analysis_manager, job_store, scheduler
+    from core import analysis_manager, job_store, scheduler
+    logging.basicConfig(level=logging.WARNING)
+    logger = logging.getLogger("test_paper_claims")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep the paper files, checkpoints and claims of this run out of the real data directory.
+        analysis_manager.RESULTS_DIR = os.path.join(tmp, 'analysis_results')
+        job_store.PIPELINE_DB_FILE = os.path.join(tmp, 'pipeline.sqlite3')
+        job_store.CLAIMS_DIR = os.path.join(tmp, 'claims')
+
+        print("\n--- Analysis started while a prefetch is downloading ---")
+        paper = make_paper(base, f"2599.{RUN_ID[:5]}v1")
+        check(paper, run_both(paper, True, logger), 'prefetched', analysis_manager.RESULTS_DIR)
+
+        print("\n--- Prefetch started while an analysis is downloading ---")
+        paper = make_paper(base, f"2599.{RUN_ID[:5]}v2")
+        check(paper, run_both(paper, False, logger), 'ready', analysis_manager.RESULTS_DIR)
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import threading
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the parent directory to the sys.path to allow imports from core
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import aio, scheduler
+from core.pdf_batcher import ParseBatcher
+
+# --- Configuration ---
+# The fake parser pays a fixed "model load" cost per request plus a small cost per file,
+# which is what makes batching worthwhile against the real miner-u service.
+FAKE_REQUEST_OVERHEAD_SECONDS = 1.0
+FAKE_PER_FILE_SECONDS = 0.1
+PAPER_COUNT = 8
+
+stats = {"requests": 0, "batch_sizes": []}
+stats_lock = threading.Lock()
+
+class FakeParserHandler(BaseHTTPRequestHandler):
+    """Mimics the miner-u /file_parse endpoint: a multipart `files` list in, `results` keyed per file out."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        message = BytesParser(policy=default_policy).parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode('utf-8') + body
+        )
+        filenames = [part.get_filename() for part in message.iter_parts() if part.get_filename()]
+        with stats_lock:
+            stats["requests"] += 1
+            stats["batch_sizes"].append(len(filenames))
+        time.sleep(FAKE_REQUEST_OVERHEAD_SECONDS + FAKE_PER_FILE_SECONDS * len(filenames))
+
+        if any(name.startswith('broken') for name in filenames):
+            # A corrupt PDF makes the whole batch fail, as miner-u does.
+            self.send_response(500)
+            self.end_headers()
+            return
+
+        results = {
+            os.path.splitext(name)[0]: {"md_content": f"# Parsed {name}\n\n![](images/fig1.jpg)", "images": {}}
+            for name in filenames
+        }
+        payload = json.dumps({"results": results}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+def make_pdfs(directory, names):
+    paths = []
+    for name in names:
+        path = os.path.join(directory, f"{name}.pdf")
+        with open(path, 'wb') as f:
+            f.write(b"%PDF-1.4 fake " + name.encode('utf-8'))
+        paths.append(path)
+    return paths
+
+def parse_concurrently(batcher, paths):
+    """Submits all PDFs from separate threads, like a bulk analysis job does."""
+    results = {}
+    def worker(path):
+        name = os.path.basename(path)
+        try:
+            with scheduler.context(scheduler.BULK):
+                future = batcher.submit(path, name)
+            results[name] = future.result()
+        except Exception as e:
+            results[name] = e
+    threads = [threading.Thread(target=worker, args=(path,)) for path in paths]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+async def parse_with_cancellations(batcher, paths):
+    """Cancels the last waiter before its batch is sent and the first one while it is in flight."""
+    # Bulk submissions wait for the batching window (interactive ones would be sent at once).
+    with scheduler.context(scheduler.BULK):
+        waiters = [asyncio.ensure_future(asyncio.wrap_future(batcher.submit(path, os.path.basename(path))))
+                   for path in paths]
+    waiters[-1].cancel()
+    await asyncio.sleep(batcher.window_seconds + FAKE_REQUEST_OVERHEAD_SECONDS / 2)
+    waiters[0].cancel()
+    return await asyncio.gather(*waiters, return_exceptions=True)
+
+def parse_interactive_during_bulk(batcher, bulk_paths, interactive_path):
+    """Submits a full bulk batch, then an interactive PDF while the bulk batch is at the parser."""
+    finished = {}
+    def wait(name, future):
+        future.result()
+        finished[name] = time.time()
+    with scheduler.context(scheduler.BULK):
+        bulk = [batcher.submit(path, os.path.basename(path)) for path in bulk_paths]
+    time.sleep(FAKE_REQUEST_OVERHEAD_SECONDS / 4)
+    with scheduler.context(scheduler.INTERACTIVE):
+        interactive = batcher.submit(interactive_path, os.path.basename(interactive_path))
+    threads = [threading.Thread(target=wait, args=('bulk', future)) for future in bulk]
+    threads.append(threading.Thread(target=wait, args=('interactive', interactive)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return finished
+
+def main():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeParserHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    parser_url = f"http://127.0.0.1:{server.server_address[1]}/file_parse"
+    print(f"Fake parser listening on {parser_url}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_pdfs(tmp, [f"2501.{i:05d}v1" for i in range(PAPER_COUNT)])
+
+        print("\n--- Batched parsing ---")
+        batcher = ParseBatcher(parser_url, window_seconds=0.5, max_files=4)
+        started = time.time()
+        results = parse_concurrently(batcher, paths)
+        batched_seconds = time.time() - started
+        routed = all(
+            isinstance(result, dict) and f"Parsed {name}" in result["md_content"]
+            for name, result in results.items()
+        )
+        print(f"{PAPER_COUNT} PDFs in {stats['requests']} requests (batch sizes {stats['batch_sizes']}), {batched_seconds:.1f}s")
+        print(f"Every paper received its own result: {'OK' if routed else 'FAILED'}")
+        print(f"Fewer requests than PDFs: {'OK' if stats['requests'] < PAPER_COUNT else 'FAILED'}")
+
+        print("\n--- One request per PDF (previous behaviour) ---")
+        stats.update(requests=0, batch_sizes=[])
+        unbatched = ParseBatcher(parser_url, window_seconds=0, max_files=1)
+        started = time.time()
+        parse_concurrently(unbatched, paths[:4])
+        unbatched_seconds = time.time() - started
+        print(f"4 PDFs in {stats['requests']} requests, {unbatched_seconds:.1f}s "
+              f"(each request pays the parser overhead)")
+
+        print("\n--- A broken PDF in a batch ---")
+        stats.update(requests=0, batch_sizes=[])
+        mixed = make_pdfs(tmp, ["broken", "2502.00001v1", "2502.00002v1"])
+        results = parse_concurrently(ParseBatcher(parser_url, window_seconds=0.5, max_files=4), mixed)
+        good = [name for name, result in results.items() if isinstance(result, dict)]
+        print(f"Batch sizes {stats['batch_sizes']}; succeeded: {sorted(good)}")
+        print(f"Neighbours of a broken PDF still parse: {'OK' if len(good) == 2 else 'FAILED'}")
+
+        print("\n--- Waiters cancelled before and during a batch ---")
+        stats.update(requests=0, batch_sizes=[])
+        # Room for one more file, so the batch waits out the window rather than being sent once full.
+        batcher = ParseBatcher(parser_url, window_seconds=0.5, max_files=5)
+        results = aio.run(parse_with_cancellations(batcher, paths[:4]))
+        cancelled = [isinstance(result, asyncio.CancelledError) for result in results]
+        print(f"Batch sizes {stats['batch_sizes']}; cancelled: {cancelled}")
+        print(f"Cancelled waiters do not fail the rest: "
+              f"{'OK' if cancelled == [True, False, False, True] and all(isinstance(r, dict) for r in results[1:3]) else 'FAILED'}")
+        print(f"A file cancelled before sending is skipped: {'OK' if stats['batch_sizes'] == [3] else 'FAILED'}")
+        try:
+            batcher.submit(paths[4], os.path.basename(paths[4])).result(timeout=10)
+            alive = True
+        except Exception:
+            alive = False
+        print(f"The dispatcher keeps serving later files: {'OK' if alive else 'FAILED'}")
+
+        print("\n--- An interactive PDF while a bulk batch is in flight ---")
+        stats.update(requests=0, batch_sizes=[])
+        batcher = ParseBatcher(parser_url, window_seconds=0.5, max_files=4, max_batches=2)
+        finished = parse_interactive_during_bulk(batcher, paths[:4], paths[4])
+        print(f"Batch sizes {stats['batch_sizes']}")
+        print(f"The interactive PDF does not wait for the bulk batch: "
+              f"{'OK' if stats['batch_sizes'] == [4, 1] and finished['interactive'] < finished['bulk'] else 'FAILED'}")
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import os
+import sys
+import time
+import tempfile
+import threading
+
+# Add the parent directory to the sys.path to allow imports from core
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import aio, profiler, scheduler
+
+# --- Configuration ---
+BUSY_SECONDS = 0.3
+
+def _busy(seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        sum(range(1000))
+
+def blocking_step_of_profiled_work():
+    _busy(BUSY_SECONDS)
+
+def blocking_step_of_other_work():
+    _busy(BUSY_SECONDS)
+
+async def profiled_workload():
+    # CPU time on the loop thread itself, then a blocking call on the pool.
+    _busy(BUSY_SECONDS)
+    await aio.to_thread(blocking_step_of_profiled_work)
+
+async def other_workload():
+    await aio.to_thread(blocking_step_of_other_work)
+
+def main():
+    profiler.PROFILES_DIR = tempfile.mkdtemp()
+    # Another caller keeps the shared I/O threads busy during the capture.
+    other = threading.Thread(target=lambda: aio.run(other_workload()))
+    other.start()
+    with profiler.capture("aio-workload", kind='manual') as current:
+        with scheduler.context(scheduler.BULK, "2401.00001v1"):
+            aio.run(profiled_workload())
+    other.join()
+
+    stacks = list(current._samples)
+    print(f"Samples: {sum(current._samples.values())} in {len(stacks)} stacks")
+    loop_samples = [s for s in stacks if "profiled_workload" in s and "blocking_step" not in s]
+    pool_samples = [s for s in stacks if "blocking_step_of_profiled_work" in s]
+    print(f"Work on the loop thread is sampled: {'OK' if loop_samples else 'FAILED'}")
+    print(f"Work on the blocking pool is sampled: {'OK' if pool_samples else 'FAILED'}")
+    labelled = all(s.startswith("[2401.00001v1];") for s in loop_samples + pool_samples)
+    print(f"Samples are rooted at the scheduler label: {'OK' if loop_samples and labelled else 'FAILED'}")
+    leaked = [s for s in stacks if "other_workload" in s or "blocking_step_of_other_work" in s]
+    print(f"Other callers' work is not sampled: {'OK' if not leaked else 'FAILED'}")
+    saved = sorted(os.listdir(profiler.PROFILES_DIR))
+    print(f"Capture saved: {'OK' if any(f.endswith('.folded') for f in saved) else 'FAILED'} ({saved})")
+
+if __name__ == "__main__":
+    main()
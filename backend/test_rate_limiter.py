@@ -0,0 +1,122 @@
+import os
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the parent directory to the sys.path to allow imports from core
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# --- Configuration ---
+# The fake endpoint accepts at most FAKE_MAX_IN_FLIGHT concurrent requests and answers
+# everything above that with 429 + Retry-After, like a throttling provider would.
+FAKE_MAX_IN_FLIGHT = 2
+FAKE_LATENCY_SECONDS = 0.3
+PARALLEL_REQUESTS = 8
+
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ["LLM_MAX_CONCURRENCY"] = str(PARALLEL_REQUESTS)
+os.environ["LLM_REQUESTS_PER_MINUTE"] = "600"
+os.environ["LLM_MAX_RETRIES"] = "8"
+
+from core import analyzer, llm_router
+from core.rate_limiter import get_governor
+
+stats = {"in_flight": 0, "max_in_flight": 0, "ok": 0, "throttled": 0, "server_errors": 0, "terminal": 0}
+stats_lock = threading.Lock()
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    """Mimics an OpenAI-compatible /chat/completions endpoint with provider-side limits."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        if self.path.startswith('/terminal/'):
+            with stats_lock:
+                stats["terminal"] += 1
+            self._send_json(400, {"error": {"message": "Invalid request", "type": "invalid_request_error"}})
+            return
+
+        with stats_lock:
+            if stats["ok"] + stats["throttled"] + stats["server_errors"] == 0:
+                # The very first request hits a transient server error.
+                stats["server_errors"] += 1
+                self._send_json(503, {"error": {"message": "Service unavailable"}})
+                return
+            if stats["in_flight"] >= FAKE_MAX_IN_FLIGHT:
+                stats["throttled"] += 1
+                self._send_json(429, {"error": {"message": "Rate limit exceeded"}}, {"Retry-After": "1"})
+                return
+            stats["in_flight"] += 1
+            stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+
+        time.sleep(FAKE_LATENCY_SECONDS)
+        with stats_lock:
+            stats["in_flight"] -= 1
+            stats["ok"] += 1
+        self._send_json(200, {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "fake-model",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "Fake analysis."}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+        })
+
+def main():
+    """Runs parallel analyses against a throttling fake endpoint and checks the governor's behaviour."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeLLMHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    os.environ["DASHSCOPE_ANALYSIS_API_KEY"] = "fake-key"
+    os.environ["DASHSCOPE_ANALYSIS_BASE_URL"] = f"{base}/throttle/v1"
+    os.environ["DASHSCOPE_ANALYSIS_MODEL"] = "fake-model"
+
+    print(f"--- Sending {PARALLEL_REQUESTS} parallel analyses to a fake endpoint (limit {FAKE_MAX_IN_FLIGHT} in flight) ---")
+    results = [None] * PARALLEL_REQUESTS
+    def worker(i):
+        results[i] = analyzer.analyze_paper(f"Paper {i}", "An abstract.")
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(PARALLEL_REQUESTS)]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - start
+
+    failures = [r for r in results if analyzer.is_failed_result(r)]
+    governor = get_governor("fake-key")
+    print(f"Finished in {elapsed:.1f}s. Server stats: {stats}")
+    print(f"Concurrency limit after run: {governor.concurrency.limit:.2f}")
+    print("Throttled requests were retried:", "OK" if stats["throttled"] > 0 and not failures else "FAILED")
+    print("Transient 5xx was retried:", "OK" if stats["server_errors"] == 1 and not failures else "FAILED")
+
+    print("\n--- Sending a request that fails terminally (HTTP 400) ---")
+    os.environ["DASHSCOPE_ANALYSIS_API_KEY"] = "fake-key-terminal"
+    os.environ["DASHSCOPE_ANALYSIS_BASE_URL"] = f"{base}/terminal/v1"
+    llm_router._providers.clear()
+    result = analyzer.analyze_paper("Bad paper", "An abstract.")
+    print(f"Result: {result}")
+    print("Terminal error was not retried:", "OK" if stats["terminal"] == 1 and analyzer.is_failed_result(result) else "FAILED")
+    print("Terminal error is distinct from transient:", "OK" if not result.startswith(analyzer.TRANSIENT_FAILURE_PREFIX) else "FAILED")
+
+    server.shutdown()
+    print("\n--- Test Finished ---")
+
+if __name__ == '__main__':
+    main()
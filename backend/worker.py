@@ -0,0 +1,47 @@
+import argparse
+import logging
+import threading
+import multiprocessing
+from core import task_queue, tasks
+
+# Configure logging for the worker processes
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(message)s")
+logger = logging.getLogger(__name__)
+
+def run_worker_process(kinds):
+    """Consumes pipeline jobs of the given kinds from the shared queue."""
+    handlers = {kind: tasks.HANDLERS[kind] for kind in kinds}
+    task_queue.run_worker(handlers)
+
+if __name__ == '__main__':
+    """
+    Runs pipeline workers outside the web process. Start the web tier with
+    PIPELINE_MODE=external so that it only enqueues jobs.
+    """
+    parser = argparse.ArgumentParser(description="Run pipeline worker processes for the arXiv backend.")
+    parser.add_argument("--processes", "-p", type=int, default=2, help="Number of worker processes to start.")
+    parser.add_argument("--kinds", type=str, default=",".join(tasks.HANDLERS.keys()),
+                        help=f"Comma-separated job kinds to consume (default: all of {', '.join(tasks.HANDLERS.keys())}).")
+    args = parser.parse_args()
+
+    kinds = [kind.strip() for kind in args.kinds.split(',') if kind.strip()]
+    unknown = [kind for kind in kinds if kind not in tasks.HANDLERS]
+    if unknown:
+        parser.error(f"Unknown job kinds: {', '.join(unknown)}")
+
+    processes = []
+    for i in range(args.processes):
+        process = multiprocessing.Process(target=run_worker_process, args=(kinds,), name=f"worker-{i + 1}")
+        process.start()
+        processes.append(process)
+    logger.info(f"Started {len(processes)} worker processes for job kinds: {', '.join(kinds)}")
+    if 'compact_storage' in kinds:
+        threading.Thread(target=tasks.schedule_compaction, daemon=True).start()
+
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        logger.info("Stopping workers...")
+        for process in processes:
+            process.terminate()